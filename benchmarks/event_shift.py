@@ -0,0 +1,76 @@
+"""
+Micro-benchmark : cost of shifting events.
+
+Compares Event.shifted with the deep copy based shift it replaces, both on single events and on the full shift of a
+generated pattern as done by Generator._fill_event_stack.
+Run from the repository root with:
+    python -m benchmarks.event_shift
+"""
+import json
+import timeit
+from copy import deepcopy
+
+from docs.examples.create_env.env_info import all_event_types, all_event_attributes, all_noise_types, \
+    all_noise_attributes
+from docs.examples.create_env.instructions import instructions
+from openthechests.src.elements.Event import Event
+from openthechests.src.elements.Parser import Parser
+
+
+def deepcopy_shifted(event, delta):
+    """
+    Reference implementation of the shift, copying the whole event including its attributes.
+
+    :param event: The event to shift.
+    :param delta: The value by which to shift the event.
+    :return: A copy of the event with new start and end times.
+    """
+    new = deepcopy(event)
+    new.start += delta
+    new.end += delta
+    return new
+
+
+def time_per_call(statement, number):
+    """
+    Measure the best time per call of a statement over several repetitions.
+
+    :param statement: Callable to measure.
+    :param number: Number of calls per repetition.
+    :return: The best time per call in microseconds.
+    """
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1e6
+
+
+def run(number=20000):
+    """
+    Run the benchmark and print one JSON line per measure.
+
+    :param number: Number of calls per repetition.
+    :return: The list of measures.
+    """
+    event = Event("A", {"fg": "blue", "bg": "red"}, 0, 5)
+    parser = Parser(all_event_types, all_noise_types, all_event_attributes, all_noise_attributes)
+    pattern = parser.instantiate_pattern(instructions[0][2:])
+
+    cases = {"single_event": (lambda: deepcopy_shifted(event, 3.5),
+                              lambda: event.shifted(3.5)),
+             "pattern": (lambda: [deepcopy_shifted(e, 3.5) for e in pattern],
+                         lambda: [e.shifted(3.5) for e in pattern])}
+
+    results = []
+    for case, (reference, shifted) in cases.items():
+        reference_us = time_per_call(reference, number)
+        shifted_us = time_per_call(shifted, number)
+        result = {"benchmark": "event_shift",
+                  "case": case,
+                  "deepcopy_us": round(reference_us, 3),
+                  "shifted_us": round(shifted_us, 3),
+                  "speedup": round(reference_us / shifted_us, 2)}
+        print(json.dumps(result))
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    run()
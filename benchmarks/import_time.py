@@ -0,0 +1,101 @@
+"""
+Benchmark : cold start import time of the package modules.
+
+Each module is imported in fresh Python processes, as done by every subprocess worker, measuring the wall time of the
+whole process and of the import statement alone, and listing the heavy dependencies loaded by the import. The core
+environment (OpenTheChests, Generator, Parser, Event) is expected to load none of them.
+Run from the repository root with:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --modules openthechests.src.OpenTheChests --repeats 20
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+MODULES = ["numpy",
+           "openthechests.src.elements.Event",
+           "openthechests.src.elements.Parser",
+           "openthechests.src.elements.Generator",
+           "openthechests.src.OpenTheChests",
+           "openthechests.src.OpenTheChestsVec",
+           "openthechests.src.utils.evaluators",
+           "openthechests.src.utils.modified_plotting",
+           "openthechests.src.OpenTheChestsGym",
+           "openthechests.src.OpenTheChestsSubprocVec"]
+HEAVY_PACKAGES = ["gym", "gymnasium", "yaml", "pandas", "matplotlib", "stable_baselines3", "torch", "plotly"]
+
+# code run by each process, printing the duration of the import and the heavy packages it loaded
+IMPORT_CODE = """
+import json, sys, time
+start = time.perf_counter_ns()
+import {module}
+duration = time.perf_counter_ns() - start
+print(json.dumps({{"import_ns": duration,
+                   "heavy": sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy}))}}))
+"""
+
+
+def measure(module, repeats):
+    """
+    Import a module in fresh processes.
+
+    :param module: The name of the module.
+    :param repeats: The number of processes.
+    :return: The process durations and the import durations in nanoseconds, and the heavy packages loaded.
+    """
+    code = IMPORT_CODE.format(module=module, heavy=HEAVY_PACKAGES)
+    process_durations = []
+    import_durations = []
+    heavy = []
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        process_durations.append(time.perf_counter_ns() - start)
+        result = json.loads(output.strip().splitlines()[-1])
+        import_durations.append(result["import_ns"])
+        heavy = result["heavy"]
+    return process_durations, import_durations, heavy
+
+
+def summarize(durations):
+    """
+    Summarize a list of durations.
+
+    :param durations: The durations in nanoseconds.
+    :return: Dictionary with the median and 90th percentile in milliseconds.
+    """
+    p50, p90 = np.percentile(np.asarray(durations) / 1e6, [50, 90])
+    return {"p50_ms": round(p50, 2), "p90_ms": round(p90, 2)}
+
+
+def run(modules=tuple(MODULES), repeats=10):
+    """
+    Run the benchmark on every module and print one JSON line per module.
+
+    :param modules: The names of the modules.
+    :param repeats: The number of fresh processes per module.
+    :return: The list of measures.
+    """
+    results = []
+    for module in modules:
+        process_durations, import_durations, heavy = measure(module, repeats)
+        result = {"benchmark": "import_time",
+                  "module": module,
+                  "process": summarize(process_durations),
+                  "import": summarize(import_durations),
+                  "heavy_packages": heavy}
+        print(json.dumps(result), flush=True)
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--modules", nargs="+", default=MODULES)
+    arg_parser.add_argument("--repeats", type=int, default=10)
+    args = arg_parser.parse_args()
+    run(modules=args.modules, repeats=args.repeats)
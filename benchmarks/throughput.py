@@ -0,0 +1,193 @@
+"""
+Benchmark : reset and step throughput of the environments.
+
+Measures the throughput and latency percentiles of reset() and step() for OpenTheChests and OpenTheChestsGym,
+sweeping the number of boxes, the pattern length, the noise ratio and the action encoding.
+Environments are built from the instructions of docs/examples/create_env/instructions.py and from the example YAML
+configuration, which are repeated to reach the number of boxes and extended to reach the pattern length.
+Run from the repository root with:
+    python -m benchmarks.throughput
+    python -m benchmarks.throughput --boxes 3 30 --noise 0 --steps 5000
+"""
+import argparse
+import copy
+import itertools
+import json
+import time
+
+import numpy as np
+
+from docs.examples.create_env.env_info import all_event_types, all_event_attributes, all_noise_types, \
+    all_noise_attributes
+from docs.examples.create_env.instructions import instructions
+from openthechests.src.OpenTheChests import OpenTheChests
+from openthechests.src.OpenTheChestsGym import OpenTheChestsGym
+from openthechests.src.utils.action_codecs import ACTION_CODECS
+from openthechests.src.utils.helper_functions import parse_config_file
+
+CONFIG_FILE = "docs/examples/create_env/example_config/multiple_per_box.yaml"
+ENV_CLASSES = {"OpenTheChests": OpenTheChests, "OpenTheChestsGym": OpenTheChestsGym}
+
+
+def load_configs():
+    """
+    Load the example configurations used as seeds of the sweep.
+
+    :return: Dictionary mapping each configuration name to the parameters of the environment.
+    """
+    return {"instructions": {"instructions": instructions,
+                             "all_event_types": all_event_types,
+                             "all_event_attributes": all_event_attributes,
+                             "all_noise_types": all_noise_types,
+                             "all_noise_attributes": all_noise_attributes},
+            "multiple_per_box": parse_config_file(CONFIG_FILE)}
+
+
+def make_instruction(instruction, num_events, noise):
+    """
+    Adapt the instruction of a box to the requested pattern length and noise ratio.
+    Missing events are copies of the first instantiated event, each one placed after the previous last variable.
+    Patterns that are longer than requested are kept as they are.
+
+    :param instruction: The list of commands of the box.
+    :param num_events: The requested number of events in the pattern.
+    :param noise: The noise ratio of the pattern.
+    :return: The new list of commands.
+    """
+    instruction = [dict(command, parameters=noise) if command["command"] == "noise" else dict(command)
+                   for command in instruction]
+    instantiations = [command for command in instruction if command["command"] == "instantiate"]
+    last_variable = instruction[-1]["variable_name"]
+    for idx in range(len(instantiations), num_events):
+        variable = f"extra_{idx}"
+        instruction.append({"command": "instantiate",
+                            "parameters": instantiations[0]["parameters"],
+                            "variable_name": variable})
+        instruction.append({"command": "after",
+                            "parameters": [variable, last_variable],
+                            "variable_name": variable,
+                            "other": {"gap_dist": {"mu": 2, "sigma": 1}}})
+        last_variable = variable
+    return instruction
+
+
+def make_env(env_class, config, num_boxes, num_events, noise, action_encoding):
+    """
+    Build an environment from a configuration, repeating its instructions until num_boxes boxes are defined.
+
+    :param env_class: OpenTheChests or OpenTheChestsGym.
+    :param config: The parameters of the environment given by load_configs.
+    :param num_boxes: The number of boxes.
+    :param num_events: The number of events of each pattern.
+    :param noise: The noise ratio of each pattern.
+    :param action_encoding: The form of the actions, see ACTION_CODECS.
+    :return: The environment.
+    """
+    box_instructions = [make_instruction(instruction, num_events, noise)
+                        for instruction in itertools.islice(itertools.cycle(config["instructions"]), num_boxes)]
+    params = {key: copy.deepcopy(value) for key, value in config.items() if key != "instructions"}
+    return env_class(instructions=box_instructions, action_encoding=action_encoding, verbose=False, **params)
+
+
+def summarize(durations):
+    """
+    Summarize a list of call durations.
+
+    :param durations: The durations in nanoseconds.
+    :return: Dictionary with the throughput in calls per second and the latency percentiles in microseconds.
+    """
+    durations = np.asarray(durations) / 1e3
+    p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+    return {"per_s": round(1e6 / durations.mean(), 1),
+            "p50_us": round(p50, 2),
+            "p90_us": round(p90, 2),
+            "p99_us": round(p99, 2)}
+
+
+def measure(env, num_resets, num_steps, seed):
+    """
+    Time each reset and step call of an environment, with uniformly random actions.
+    Resets needed to start new episodes during the steps are not counted.
+
+    :param env: The environment to measure.
+    :param num_resets: The number of timed resets.
+    :param num_steps: The number of timed steps.
+    :param seed: Seed of the environment and of the actions.
+    :return: The durations of the resets and steps in nanoseconds.
+    """
+    rng = np.random.default_rng(seed)
+    num_boxes = env.env.get_num_boxes() if isinstance(env, OpenTheChestsGym) else env.get_num_boxes()
+    action_codec = env.env.action_codec if isinstance(env, OpenTheChestsGym) else env.action_codec
+    actions = list(action_codec.encode_batch(rng.integers(0, 2, (num_steps, num_boxes))))
+
+    env.reset(seed=seed)
+    reset_durations = []
+    for _ in range(num_resets):
+        start = time.perf_counter_ns()
+        env.reset()
+        reset_durations.append(time.perf_counter_ns() - start)
+
+    env.reset()
+    step_durations = []
+    for action in actions:
+        start = time.perf_counter_ns()
+        _, _, done, _ = env.step(action)
+        step_durations.append(time.perf_counter_ns() - start)
+        if done:
+            env.reset()
+    return reset_durations, step_durations
+
+
+def run(boxes=(3, 12, 48), events=(0, 8), noise=(0, 0.5), envs=tuple(ENV_CLASSES), configs=None,
+        actions=("multibinary", "discrete"), num_resets=200, num_steps=2000, seed=0):
+    """
+    Run the benchmark on every combination of parameters and print one JSON line per combination.
+
+    :param boxes: The numbers of boxes.
+    :param events: The numbers of events of each pattern, 0 keeping the patterns of the configuration.
+    :param noise: The noise ratios.
+    :param envs: The names of the environment classes.
+    :param configs: The names of the configurations, defaults to all configurations.
+    :param actions: The action encodings.
+    :param num_resets: The number of timed resets per combination.
+    :param num_steps: The number of timed steps per combination.
+    :param seed: Seed of the environments and actions.
+    :return: The list of measures.
+    """
+    all_configs = load_configs()
+    configs = list(all_configs) if configs is None else configs
+    results = []
+    for config, env_name, num_boxes, num_events, noise_ratio, action_encoding in itertools.product(
+            configs, envs, boxes, events, noise, actions):
+        env = make_env(ENV_CLASSES[env_name], all_configs[config], num_boxes, num_events, noise_ratio,
+                       action_encoding)
+        reset_durations, step_durations = measure(env, num_resets, num_steps, seed)
+        result = {"benchmark": "throughput",
+                  "config": config,
+                  "env": env_name,
+                  "boxes": num_boxes,
+                  "events": num_events,
+                  "noise": noise_ratio,
+                  "actions": action_encoding,
+                  "reset": summarize(reset_durations),
+                  "step": summarize(step_durations)}
+        print(json.dumps(result), flush=True)
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--boxes", type=int, nargs="+", default=[3, 12, 48])
+    arg_parser.add_argument("--events", type=int, nargs="+", default=[0, 8],
+                            help="number of events per pattern, 0 keeps the configured patterns")
+    arg_parser.add_argument("--noise", type=float, nargs="+", default=[0, 0.5])
+    arg_parser.add_argument("--envs", nargs="+", default=list(ENV_CLASSES), choices=list(ENV_CLASSES))
+    arg_parser.add_argument("--configs", nargs="+", default=None, choices=["instructions", "multiple_per_box"])
+    arg_parser.add_argument("--actions", nargs="+", default=["multibinary", "discrete"], choices=list(ACTION_CODECS))
+    arg_parser.add_argument("--resets", type=int, default=200)
+    arg_parser.add_argument("--steps", type=int, default=2000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    run(boxes=args.boxes, events=args.events, noise=args.noise, envs=args.envs, configs=args.configs,
+        actions=args.actions, num_resets=args.resets, num_steps=args.steps, seed=args.seed)
@@ -34,9 +34,9 @@ print(f"Expected events to be generated: {expected_events}")
 
 # Get the 5 next events from the generator
 for i in range(5):
-    next_event, signal = generator.next_event()
+    next_event, satisfied, active = generator.next_event()
     expected_event = expected_events[pattern_id][i]
-    print(f"Next event: {next_event}, Signal: {signal}")
+    print(f"Next event: {next_event}, Satisfied: {satisfied}, Active: {active}")
     assert expected_event == next_event
 
     # Get the current timeline of events
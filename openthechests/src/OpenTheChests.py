@@ -1,8 +1,16 @@
+import numpy as np
+
+from openthechests.src.elements.BoxBank import BoxBank
 from openthechests.src.elements.Generator import Generator
 from openthechests.src.elements.Parser import Parser
 from openthechests.src.elements.InteractiveBox import InteractiveBox
 from openthechests.src.elements.Pattern import Pattern
-from openthechests.src.utils.helper_functions import to_stb3_obs_format
+from openthechests.src.elements.ReplayGenerator import ReplayGenerator
+from openthechests.src.utils.action_codecs import make_action_codec
+from openthechests.src.utils.event_log import EventLog, EventLogRecorder
+from openthechests.src.utils.observations import ObservationBuffer, FlatObservationBuffer
+from openthechests.src.utils.profiling import StepProfiler
+from openthechests.src.utils.tracing import PrintTracer, get_box_states, get_box_transitions
 
 
 class OpenTheChests:
@@ -14,18 +22,34 @@ class OpenTheChests:
     -----------
     discrete : bool
         Flag to determine if actions are in integer format.
+    action_codec : ActionCodec
+        The codec transforming the given actions into binary vectors of pressed buttons.
     verbose : bool
-        Flag to enable detailed print statements for debugging.
+        Flag to enable detailed print statements for debugging, done by attaching a PrintTracer.
+    tracer : Tracer
+        The tracer attached to the environment, or None.
+    profiler : StepProfiler
+        The counters of the time spent in each phase of a step when profiling is enabled, or None.
     done : bool
         Flag to indicate if the environment episode is done.
     patterns : list
         The list of patterns used to define the behavior of the boxes.
+    box_bank : BoxBank
+        The states of all boxes, stored in arrays.
     boxes : list
-        The list of InteractiveBox objects in the environment.
+        The list of InteractiveBox objects in the environment, each one being a view on the box bank.
     parser : Parser
         The parser used to interpret event and noise information.
     generator : Generator
         The generator used to create event stacks based on patterns.
+    obs_mode : str
+        The form of the returned observations, "dict", "buffer" or "flat".
+    macro_step : bool
+        Flag to skip the events that need no decision, resets and steps only returning once a decision is needed.
+    reset_skipped_events : int
+        The number of events skipped by the last reset when macro steps are used, 0 otherwise.
+    decision_condition : callable
+        Function of the environment returning True when a decision is needed even if no box is ready, or None.
 
     Hidden Attributes:
     ------------------
@@ -41,6 +65,8 @@ class OpenTheChests:
         The current time in the environment.
     _num_boxes : int
         The number of boxes in the environment.
+    _obs_buffer : ObservationBuffer or FlatObservationBuffer
+        The preallocated observation arrays, used when obs_mode is "buffer" or "flat".
 
     Methods:
     --------
@@ -50,7 +76,23 @@ class OpenTheChests:
         Returns a list of all event and noise types.
     get_num_boxes():
         Returns the number of boxes in the environment.
-    reset():
+    get_observation_buffer():
+        Returns the preallocated observation buffer, if any.
+    attach_tracer(tracer):
+        Attaches a tracer receiving the internal evolution of the environment.
+    detach_tracer():
+        Removes the attached tracer.
+    enable_profiling():
+        Starts accumulating the time spent in each phase of a step.
+    disable_profiling():
+        Stops profiling.
+    get_profile():
+        Returns the profiling counters.
+    replay(event_log):
+        Replays the episodes of an event log instead of sampling events.
+    seed(seed=None):
+        Seeds the random streams used to generate events.
+    reset(seed=None):
         Resets the environment to its initial state.
     step(action):
         Advances the environment by one step using the selected action.
@@ -58,6 +100,10 @@ class OpenTheChests:
         Returns the current observations of the environment.
     check_end():
         Verifies if it is time to send a done signal indicating the end of the game.
+    get_state():
+        Returns a snapshot of the environment state, used to branch rollouts.
+    set_state(state):
+        Restores a snapshot returned by get_state.
 
     Hidden Methods:
     ---------------
@@ -65,10 +111,16 @@ class OpenTheChests:
         Executes one internal step to advance the environment timeline and update context.
     _advance_timeline():
         Advances the internal environment evolution by getting the next event.
-    _update_boxes(signal):
+    _reset_boxes():
+        Resets all boxes and activates them.
+    _update_boxes(satisfied, active):
         Updates the states of all boxes based on the current environment time and evolution.
     _apply_action(action):
         Applies the given action to the system and updates the environment according to action effects.
+    _needs_decision():
+        Verifies if the agent should choose the next action, when macro steps are used.
+    _skip_events():
+        Advances the timeline until a decision is needed, when macro steps are used.
     """
     def __init__(self,
                  instructions: list,
@@ -79,7 +131,15 @@ class OpenTheChests:
                  verbose: bool,
                  timeout_threshold: int = 30,
                  stb3: bool = False,
-                 discrete: bool = False):
+                 discrete: bool = False,
+                 scheduler: str = "scan",
+                 batch_size: int = None,
+                 obs_mode: str = "dict",
+                 copy_obs: bool = False,
+                 flat_encoding: str = "onehot",
+                 macro_step: bool = False,
+                 decision_condition=None,
+                 action_encoding=None):
         """
         Initializes the OpenTheChests environment with the given parameters.
 
@@ -94,44 +154,98 @@ class OpenTheChests:
         :param all_noise_attributes: dict
             Dictionary of all possible types to be used for noise generation only.
         :param verbose: bool
-            Flag to enable detailed print statements for debugging.
+            Flag to enable detailed print statements for debugging, by attaching a PrintTracer.
+            Other tracers can be attached with attach_tracer.
         :param timeout_threshold: int, optional
             The threshold for the number of times boxes can be collectively deactivated before ending the game (default is 30).
         :param stb3: bool, optional
             Flag to determine if the environment should be compatible with Stable Baselines 3 (default is False).
         :param discrete: bool, optional
             Flag to determine if actions are in integer format (default is False).
+        :param scheduler: str, optional
+            Strategy used by the generator to select the next event, "scan" or "heap" (default is "scan").
+            The "heap" scheduler is faster for environments with many boxes.
+        :param batch_size: int, optional
+            Number of pattern instances sampled at once by the generator to serve refills (default is None,
+            sampling one instance per refill).
+        :param obs_mode: str, optional
+            The form of the returned observations (default is "dict"):
+                - "dict": dictionaries built at each step, following the _stb3 parameter.
+                - "buffer": one-level dictionary of preallocated arrays matching OpenTheChestsGym.observation_space,
+                  updated in place at each step.
+                - "flat": preallocated float32 vector built directly from the environment state, see
+                  FlatObservationBuffer for its layout.
+        :param copy_obs: bool, optional
+            Flag to return copies of the preallocated arrays when obs_mode is "buffer" or "flat" (default is False).
+            Without copy, a returned observation is overwritten by the next step or reset.
+        :param flat_encoding: str, optional
+            Encoding of the context type and attributes when obs_mode is "flat", "onehot" or "integer"
+            (default is "onehot").
+        :param macro_step: bool, optional
+            Flag to skip the events after which no box is ready (default is False). Pressing no button is then the
+            only action that gives no penalty, so resets and steps keep advancing the timeline until a box is ready,
+            the decision condition is met or the game ends. The number of events skipped by a step is returned in
+            the step info dictionary under "skipped_events", the number of events skipped by the last reset is kept
+            in reset_skipped_events.
+        :param decision_condition: callable, optional
+            Function taking the environment and returning True when control should be given back to the agent
+            even though no box is ready, for example to observe some event types (default is None).
+        :param action_encoding: str or ActionCodec, optional
+            The form of the accepted actions, "multibinary", "discrete", "multidiscrete" (boxes split into groups
+            encoded by integers) or "sparse" (lists of box IDs), or an ActionCodec to set the parameters of the
+            encoding (default is None, using "discrete" when discrete is set and "multibinary" otherwise).
+            See action_codecs for the details of each encoding.
 
         Note: When accepting integer actions, each value will be transformed into its corresponding binary number.
         """
 
         self._timeout_threshold = timeout_threshold
-        self.discrete = discrete
         self._action = None
         self._context = None
         self._stb3 = stb3
         self._time = 0
         self.verbose = verbose
+        self.tracer = None
+        self.profiler = None
         self.done = False
         self._num_boxes = len(instructions)
-
-        self.patterns = [Pattern(id=idx, instruction=instr) for idx, instr in enumerate(instructions)]
-        self.boxes = [InteractiveBox(id=pattern.id, verbose=self.verbose) for pattern in self.patterns]
+        self.action_codec = make_action_codec(action_encoding, self._num_boxes, discrete=discrete)
+        self.discrete = self.action_codec.name == "discrete"
+        assert obs_mode in ["dict", "buffer", "flat"], f"Unknown observation mode {obs_mode}."
+        self.obs_mode = obs_mode
+        self.macro_step = macro_step
+        self.reset_skipped_events = 0
+        self.decision_condition = decision_condition
 
         self.parser = Parser(all_event_types=all_event_types,
                              all_noise_types=all_noise_types,
                              all_event_attributes=all_event_attributes,
                              all_noise_attributes=all_noise_attributes)
-        self.generator = Generator(parser=self.parser, patterns=self.patterns, verbose=self.verbose)
+
+        self.patterns = [Pattern(id=idx, instruction=instr, parser=self.parser) for idx, instr in enumerate(instructions)]
+        self.box_bank = BoxBank(num_boxes=self._num_boxes)
+        self.boxes = [InteractiveBox(id=pattern.id, bank=self.box_bank) for pattern in self.patterns]
+
+        self.generator = Generator(parser=self.parser,
+                                   patterns=self.patterns,
+                                   scheduler=scheduler,
+                                   batch_size=batch_size)
+        self._obs_buffer = None
+        if self.obs_mode == "buffer":
+            self._obs_buffer = ObservationBuffer(all_attributes=self.parser.all_attributes,
+                                                 num_boxes=self._num_boxes,
+                                                 copy=copy_obs)
+        elif self.obs_mode == "flat":
+            self._obs_buffer = FlatObservationBuffer(all_types=self.parser.all_types,
+                                                     all_attributes=self.parser.all_attributes,
+                                                     num_boxes=self._num_boxes,
+                                                     encoding=flat_encoding,
+                                                     copy=copy_obs)
         # self.GUI = BoxEventGUI(num_patterns=self._num_boxes,
         #                      attr_to_color=self.parser.all_attributes)
 
         if self.verbose:
-            print(f"All event types : {all_event_types}")
-            print(f"All noise types : {all_noise_types}")
-            print(f"All event attributes : {all_event_attributes}")
-            print(f"All noise attributes : {all_noise_attributes}")
-            print(f"Initialising {self._num_boxes} boxes with patterns")
+            self.attach_tracer(PrintTracer())
 
     def uses_discrete_actions(self):
         return self.discrete
@@ -142,73 +256,168 @@ class OpenTheChests:
     def get_num_boxes(self):
         return self._num_boxes
 
-    def reset(self):
+    def get_observation_buffer(self):
+        return self._obs_buffer
+
+    def attach_tracer(self, tracer):
+        """
+        Attaches a tracer receiving the internal evolution of the environment: steps, events, signals,
+        box transitions and sampled patterns.
+        The environment methods are replaced by traced versions on this instance only, so that environments without
+        tracer do not check for one. When profiling is enabled, the timed methods are rebuilt around the traced ones.
+        Tracers cannot be changed while an EventLogRecorder records the environment.
+
+        :param tracer: Tracer
+            The tracer to attach, replacing the previous one.
+        """
+        self._check_no_recorder()
+        profiling = self._suspend_profiling()
+        self._remove_tracer()
+        self.tracer = tracer
+        self.reset = self._traced_reset
+        self.step = self._traced_step
+        self._internal_step = self._traced_internal_step
+        self._apply_action = self._traced_apply_action
+        self._reset_boxes = self._traced_reset_boxes
+        self.generator.attach_tracer(tracer)
+        if profiling:
+            self.enable_profiling()
+        tracer.attached(self)
+
+    def detach_tracer(self):
+        """
+        Removes the attached tracer and restores the untraced methods.
+        Use EventLogRecorder.detach to stop a recording.
+        """
+        self._check_no_recorder()
+        profiling = self._suspend_profiling()
+        self._remove_tracer()
+        if profiling:
+            self.enable_profiling()
+
+    def enable_profiling(self):
+        """
+        Starts accumulating the wall time and number of calls of each phase of a step, as well as the number of
+        generated events and refills, see StepProfiler. The profiled methods are replaced by timed versions on this
+        instance only, so that environments without profiling do not pay for it.
+        Counters of a previous profiling are kept, use StepProfiler.clear to restart from zero.
+
+        :return: StepProfiler
+            The profiler holding the counters.
+        """
+        if self.profiler is None:
+            self.profiler = StepProfiler(num_boxes=self._num_boxes)
+        self.profiler.attach(self)
+        return self.profiler
+
+    def disable_profiling(self):
+        """
+        Stops profiling and restores the untimed methods, the counters can still be read with get_profile.
+        """
+        if self.profiler is not None:
+            self.profiler.detach()
+
+    def get_profile(self):
+        """
+        Returns the profiling counters, see StepProfiler.summary.
+
+        :return: dict
+            The counters, or None if profiling has never been enabled.
+        """
+        if self.profiler is None:
+            return None
+        return self.profiler.summary()
+
+    def replay(self, event_log):
+        """
+        Replaces the generator by a ReplayGenerator, so that the following resets start the episodes recorded in an
+        event log one after the other, see EventLogRecorder. The attached tracer and profiler are moved to the new
+        generator.
+
+        :param event_log: EventLog or str
+            The event log, or the folder holding it.
+        """
+        if isinstance(event_log, str):
+            event_log = EventLog(event_log)
+        tracer = self.tracer
+        profiling = self._suspend_profiling()
+        self._remove_tracer()
+        self.generator = ReplayGenerator(event_log=event_log, parser=self.parser, patterns=self.patterns)
+        if tracer is not None:
+            self.attach_tracer(tracer)
+        if profiling:
+            self.enable_profiling()
+
+    def seed(self, seed=None):
+        """
+        Seeds the random streams used to generate events, each pattern getting its own stream spawned from the seed.
+        Environments that are never seeded use the global random generators.
+
+        :param seed: int or np.random.SeedSequence, optional
+            The seed of the environment (default is None, drawing fresh entropy from the system).
+        """
+        self.generator.seed(seed)
+
+    def reset(self, seed=None):
         """
         Resets the environment to its initial state.
         Restarts time, resets each box and its pattern, and refills the timeline of events.
-        Gets one observation of the newly reset environment.
+        Gets one observation of the newly reset environment. When macro steps are used, the events skipped before the
+        first decision are counted in reset_skipped_events.
 
         Note: The observation form may vary depending on the _stb3 parameter.
 
+        :param seed: int or np.random.SeedSequence, optional
+            Seed given to seed() before resetting, so that the episode and the following ones can be reproduced
+            (default is None, continuing the current random streams).
         :return: dict
             The first observation of the newly reset environment.
         """
+        if seed is not None:
+            self.seed(seed)
 
-        if self.verbose:
-            print("Starting Reset")
         self._time = 0
 
         self.generator.reset()
 
-        for box in self.boxes:
-            box.reset()
-            # TODO priority 2: should boxes be active from the beginning?
-            box._activate()
+        self._reset_boxes()
 
         self._internal_step()
+        self.reset_skipped_events = self._skip_events() if self.macro_step else 0
 
-        obs = self.get_observations()
-
-        if self.verbose:
-            print("Reset Done")
-
-        return obs
+        return self.get_observations()
 
     def step(self, action):
         """
         Moves the environment forward by one step using the selected action.
         The forward move consists of three steps:
          - Apply the action to the environment
-         - Advance the environment's internal interactions
+         - Advance the environment's internal interactions, until a decision is needed when macro steps are used
          - Extract observation and return it to the user
 
         :param action: list or int
-            List of box ids to attempt to open, or an integer action if discrete actions are used.
+            Binary list marking the boxes to attempt to open, or an action of the selected action encoding.
         :return: tuple
-            A tuple containing the observation, reward, done flag, and an empty dictionary.
+            A tuple containing the observation, reward, done flag, and an info dictionary, which holds the number of
+            skipped events when macro steps are used and is empty otherwise.
         """
-
-        if self.verbose:
-            print("\nStart Step")
-
-        # if action is discrete turn it into a vector
-        if self.discrete:
-            action = [int(x) for x in bin(action)[2:]]
-            action = (self._num_boxes - len(action)) * [0] + action
+        # turn encoded actions into binary vectors, binary actions are left untouched
+        action = self.action_codec.decode(action)
         # apply action and collect reward
         reward = self._apply_action(action=action)
 
         # advance environment and collect context
         self._internal_step()
+        info = dict()
+        if self.macro_step:
+            # skipped events give no reward since no box is ready
+            info["skipped_events"] = self._skip_events()
         obs = self.get_observations()
 
         self.done = self.check_end()
 
-        if self.verbose:
-            print("Step Done \n")
-
         # TODO (priority 2) fill info dict? use it somehow?
-        return obs, reward, self.done, dict()
+        return obs, reward, self.done, info
 
     def get_observations(self):
         """
@@ -225,42 +434,42 @@ class OpenTheChests:
         }
 
         Note: Depending on the _stb3 parameter, the returned dictionary can have different forms:
-            - _stb3 == True: one-level dictionary with entries for each information
+            - _stb3 == True: one-level dictionary with entries for each information, following to_stb3_obs_format
             - otherwise: two-level dictionary
         This is because stable baselines do not accept multiple-level dictionaries as input,
-        so the output is transformed into a one-level dictionary with multiple values.
+        so the output is given as a one-level dictionary with multiple values.
+        When obs_mode is "buffer", the one-level dictionary is written into preallocated arrays instead,
+        and when obs_mode is "flat" the information is written into a single preallocated vector.
 
-        :return: dict
-            Dictionary containing environment information.
+        :return: dict or np.ndarray
+            Dictionary containing environment information, or flat vector when obs_mode is "flat".
         """
-        active = []
-        open = []
-
-        # TODO (priority 3) this can be optimised
-        for box_id in range(self._num_boxes):
-            active.append(self.boxes[box_id].is_active())
-            open.append(self.boxes[box_id].is_open())
-
-        box_states = {"active": active, "open": open}
-
-        # TODO priority 3: rethink labeling
-        obs = {"state": box_states, "context": self.parser.event_to_labelled(self._context
-                                                                             )}
+        if self._obs_buffer is not None:
+            return self._obs_buffer.write(box_bank=self.box_bank,
+                                          context=self._context,
+                                          labels=self.parser.label(self._context))
 
         if self._stb3:
-            obs = to_stb3_obs_format(observation=obs)
-        return obs
+            # build the one-level dictionary directly from the codes carried by the context
+            e_type, attributes = self.parser.label(self._context)
+            return {"active": self.box_bank.active.astype(int),
+                    "open": self.box_bank.open.astype(int),
+                    "e_type": e_type,
+                    **attributes,
+                    "start": np.array([self._context.start]),
+                    "end": np.array([self._context.end]),
+                    "duration": np.array([self._context.end - self._context.start])}
+
+        box_states = {"active": self.box_bank.active.tolist(), "open": self.box_bank.open.tolist()}
+        return {"state": box_states, "context": self.parser.event_to_labelled(self._context)}
 
     def _internal_step(self):
         """
         Executes one internal step to advance the environment timeline and update context.
         Update box states to take into account new information.
         """
-        if self.verbose:
-            print("Making one internal step to get context and advance timeline")
-
-        signal = self._advance_timeline()
-        self._update_boxes(signal=signal)
+        satisfied, active = self._advance_timeline()
+        self._update_boxes(satisfied=satisfied, active=active)
 
     def _advance_timeline(self):
         """
@@ -270,35 +479,33 @@ class OpenTheChests:
         Add this event as the current context and advance the current time to the end of the event.
         Check if any other boxes are satisfied by this event.
 
-        :return: dict
-            Signal dictionary indicating which boxes are satisfied or active.
+        :return: tuple
+            Boolean arrays indicating which boxes are satisfied and active.
         """
-
-        if self.verbose:
-            print(f"Active timeline {self.generator.get_timeline()}")
-
-        next_event, signal = self.generator.next_event()
-        # bug_print(signal)
+        next_event, satisfied, active = self.generator.next_event()
         if next_event.type != "Empty":
             self._context = next_event
             self._time = self._context.end
 
-        if self.verbose:
-            print(f"Finding closes end value {self._time}")
-            print(f"Advancing _time to {self._time}")
-            print(f"Observing context {self._context}")
+        return satisfied, active
 
-        return signal
+    def _reset_boxes(self):
+        """
+        Resets all boxes and activates them.
+        """
+        # TODO priority 2: should boxes be active from the beginning?
+        self.box_bank.reset(active=True)
 
-    def _update_boxes(self, signal=[]):
+    def _update_boxes(self, satisfied, active):
         """
         Updates the states of all boxes based on the current environment time and evolution.
 
-        :param signal: list
-            Signal list indicating which boxes are satisfied or active.
+        :param satisfied: np.ndarray
+            Boolean array indicating which boxes have their pattern satisfied.
+        :param active: np.ndarray
+            Boolean array indicating which boxes are active.
         """
-        for box in self.boxes:
-            box.update(signal=[] if box.id not in signal else signal[box.id])
+        self.box_bank.update(satisfied=satisfied, active=active)
 
     def _apply_action(self, action):
         """
@@ -315,26 +522,40 @@ class OpenTheChests:
         """
         assert len(action) == self._num_boxes, f"Got action of size {len(action)} while boxes are {self._num_boxes}."
 
-        # TODO (priority 3) make code prettier reduce all ifs and separate press and reward if possible
         self._action = action
-        if self.verbose:
-            print(f"Applying action {action}")
-        reward = []
-        for box_id in range(len(action)):
-            current_box = self.boxes[box_id]
-            if action[box_id] == 1:
-                opened = current_box.press_button()
-                if opened:
-                    self.generator.disable_timeline(pattern_id=box_id)
-                    reward.append(1)
-                else:
-                    reward.append(-1)
-            else:
-                if current_box.is_ready():
-                    reward.append(-1)
-                else:
-                    reward.append(0)
-        return sum(reward)
+        pressed = np.asarray(action) == 1
+        num_ignored = np.count_nonzero(self.box_bank.ready & ~pressed)
+        opened = self.box_bank.press(pressed)
+        num_opened = np.count_nonzero(opened)
+        if num_opened:
+            for box_id in np.flatnonzero(opened):
+                self.generator.disable_timeline(pattern_id=int(box_id))
+        # opened boxes give 1, other pressed buttons and ignored ready boxes give -1
+        return int(2 * num_opened - np.count_nonzero(pressed) - num_ignored)
+
+    def _needs_decision(self):
+        """
+        Verifies if the agent should choose the next action: when a box is ready, or when the decision condition is met.
+
+        :return: bool
+            Boolean indicating that control should be given back to the agent.
+        """
+        return bool(self.box_bank.ready.any()) or \
+            (self.decision_condition is not None and bool(self.decision_condition(self)))
+
+    def _skip_events(self):
+        """
+        Advances the timeline until a decision is needed or the game ends.
+        Boxes can only time out once they are ready, so skipped events never give rewards nor deactivations.
+
+        :return: int
+            The number of skipped events.
+        """
+        skipped = 0
+        while not self._needs_decision() and not self.check_end():
+            self._internal_step()
+            skipped += 1
+        return skipped
 
     def check_end(self):
         """
@@ -346,9 +567,97 @@ class OpenTheChests:
         :return: bool
             Boolean indicating the end of the game.
         """
-        all_end = all([box.is_open() for box in self.boxes])
-        all_deactivations = sum([b.num_deactivations for b in self.boxes])
-        return all_end or (all_deactivations >= self._timeout_threshold)
+        return bool(self.box_bank.all_open() or self.box_bank.get_total_deactivations() >= self._timeout_threshold)
+
+    def get_state(self):
+        """
+        Returns a compact snapshot of the environment state: time, context, box states and the generator state
+        (remaining event stacks, random streams and duration statistics of the parser). Static structures such as the
+        compiled patterns are not part of the snapshot, which allows forking an episode many times without copying
+        the environment.
+
+        Note: Random draws can only be reproduced after restoring a snapshot of a seeded environment, see seed().
+
+        :return: dict
+            The snapshot, which can be pickled.
+        """
+        return {"time": self._time,
+                "context": self._context,
+                "done": self.done,
+                "boxes": self.box_bank.get_state(),
+                "generator": self.generator.get_state()}
+
+    def set_state(self, state):
+        """
+        Restores a snapshot returned by get_state, taken on this environment or on one built from the same
+        configuration. The same snapshot can be restored any number of times.
+        The observation of the restored state is given by get_observations().
+
+        :param state: dict
+            The snapshot to restore.
+        """
+        self._time = state["time"]
+        self._context = state["context"]
+        self.done = state["done"]
+        self.box_bank.set_state(state["boxes"])
+        self.generator.set_state(state["generator"])
+
+    def _check_no_recorder(self):
+        assert not isinstance(self.tracer, EventLogRecorder), \
+            "Cannot change the tracer while an EventLogRecorder records the environment, please detach the recorder " \
+            "first."
+
+    def _suspend_profiling(self):
+        # timed methods wrap the methods found when profiling was enabled, so they are removed before changing them
+        profiling = self.profiler is not None and self.profiler.is_attached()
+        self.disable_profiling()
+        return profiling
+
+    def _remove_tracer(self):
+        if self.tracer is None:
+            return
+        for name in ["reset", "step", "_internal_step", "_apply_action", "_reset_boxes"]:
+            delattr(self, name)
+        self.generator.detach_tracer()
+        self.tracer = None
+
+    def _traced_reset(self, seed=None):
+        self.tracer.reset_started()
+        obs = OpenTheChests.reset(self, seed)
+        self.tracer.reset_done(obs)
+        return obs
+
+    def _traced_step(self, action):
+        self.tracer.step_started(action)
+        obs, reward, done, info = OpenTheChests.step(self, action)
+        self.tracer.step_done(obs, reward, done)
+        return obs, reward, done, info
+
+    def _traced_internal_step(self):
+        self.tracer.internal_step_started(self.generator.get_timeline())
+        satisfied, active = self._advance_timeline()
+        self.tracer.event_observed(self._context, satisfied, active, self._time)
+        before = get_box_states(self.box_bank)
+        self._update_boxes(satisfied=satisfied, active=active)
+        self._trace_box_transitions(before)
+
+    def _traced_apply_action(self, action):
+        before = get_box_states(self.box_bank)
+        reward = OpenTheChests._apply_action(self, action)
+        self.tracer.action_applied(action, reward)
+        self._trace_box_transitions(before)
+        return reward
+
+    def _traced_reset_boxes(self):
+        OpenTheChests._reset_boxes(self)
+        for box in self.boxes:
+            self.tracer.box_transition(box.id, "activate")
+
+    def _trace_box_transitions(self, before):
+        for box, box_before, box_after in zip(self.boxes, before, get_box_states(self.box_bank)):
+            if box_before != box_after:
+                for transition in get_box_transitions(box_before, box_after):
+                    self.tracer.box_transition(box.id, transition)
 
     def render(self):
         """
@@ -1,10 +1,10 @@
 import numpy as np
 import gym
-import yaml
 from gym.spaces import Dict, MultiBinary, Discrete, Box
 
 from openthechests.src.OpenTheChests import OpenTheChests
-from openthechests.src.utils.helper_functions import boxes_to_discrete, parse_yaml_file
+from openthechests.src.utils.config_cache import load_config
+from openthechests.src.utils.helper_functions import parse_config_file
 
 
 class OpenTheChestsGym(gym.Env):
@@ -16,7 +16,15 @@ class OpenTheChestsGym(gym.Env):
                  all_noise_attributes,
                  discrete=False,
                  verbose=False,
-                 stb3=True):
+                 stb3=True,
+                 scheduler="scan",
+                 batch_size=None,
+                 obs_mode="dict",
+                 copy_obs=False,
+                 flat_encoding="onehot",
+                 macro_step=False,
+                 decision_condition=None,
+                 action_encoding=None):
         """
         Defines a gym compatible wrapper for the box event environment.
         Allows defining observation and action spaces used for model setup.
@@ -29,6 +37,17 @@ class OpenTheChestsGym(gym.Env):
         :param discrete: Accept actions under integer format instead of binary vector
         :param verbose: Print details when executing for debugging
         :param stb3: Use environment with stable baselines 3
+        :param scheduler: Strategy used to select the next event, "scan" or "heap" (faster for many boxes)
+        :param batch_size: Number of pattern instances sampled at once to serve refills, None to sample one at a time
+        :param obs_mode: Use "buffer" to write observations into preallocated arrays matching the observation space,
+                         or "flat" to observe a single float32 vector suited for MLP policies
+        :param copy_obs: Return copies of the preallocated observation arrays
+        :param flat_encoding: Encoding of the context type and attributes in flat observations, "onehot" or "integer"
+        :param macro_step: Skip the events after which no box is ready, only returning when a decision is needed
+        :param decision_condition: Function of the base environment returning True when a decision is needed even
+                                   though no box is ready
+        :param action_encoding: Form of the actions, "multibinary", "discrete", "multidiscrete" or "sparse", or an
+                                ActionCodec, defaults to "discrete" or "multibinary" depending on discrete
         """
         super(OpenTheChestsGym, self).__init__()
 
@@ -41,28 +60,39 @@ class OpenTheChestsGym(gym.Env):
                                  all_noise_attributes=all_noise_attributes,
                                  verbose=verbose,
                                  discrete=discrete,
-                                 stb3=stb3)
-
-        # define action space depending on usage of discrete actions or not
-        if discrete:
-            self.action_space = Discrete(boxes_to_discrete(self.env.get_num_boxes()))
-        else:
-            self.action_space = MultiBinary(self.env.get_num_boxes())
+                                 stb3=stb3,
+                                 scheduler=scheduler,
+                                 batch_size=batch_size,
+                                 obs_mode=obs_mode,
+                                 copy_obs=copy_obs,
+                                 flat_encoding=flat_encoding,
+                                 macro_step=macro_step,
+                                 decision_condition=decision_condition,
+                                 action_encoding=action_encoding)
+
+        # define action space depending on the action encoding
+        self.action_space = self.env.action_codec.get_space()
 
         # Define a space for observations using environment information
-        num_event_types = len(self.env.parser.all_types)
-        attr_space = {attr_name: Discrete(len(attr_values)) for (attr_name, attr_values) in
-                      self.env.parser.all_attributes.items()}
-
-        self.observation_space = Dict({
-            "active": MultiBinary(self.env.get_num_boxes()),
-            "open": MultiBinary(self.env.get_num_boxes()),
-            "e_type": Discrete(num_event_types),
-            **attr_space,
-            "start": Box(low=0, high=np.inf, shape=(1,)),
-            "end": Box(low=0, high=np.inf, shape=(1,)),
-            "duration": Box(low=0, high=np.inf, shape=(1,))
-        })
+        if obs_mode == "flat":
+            # the position of each information in the vector is documented by the layout
+            obs_buffer = self.env.get_observation_buffer()
+            self.observation_layout = obs_buffer.layout
+            self.observation_space = Box(low=0, high=obs_buffer.high, dtype=np.float32)
+        else:
+            num_event_types = len(self.env.parser.all_types)
+            attr_space = {attr_name: Discrete(len(attr_values)) for (attr_name, attr_values) in
+                          self.env.parser.all_attributes.items()}
+
+            self.observation_space = Dict({
+                "active": MultiBinary(self.env.get_num_boxes()),
+                "open": MultiBinary(self.env.get_num_boxes()),
+                "e_type": Discrete(num_event_types),
+                **attr_space,
+                "start": Box(low=0, high=np.inf, shape=(1,)),
+                "end": Box(low=0, high=np.inf, shape=(1,)),
+                "duration": Box(low=0, high=np.inf, shape=(1,))
+            })
 
     @classmethod
     def from_config_file(cls,
@@ -70,7 +100,16 @@ class OpenTheChestsGym(gym.Env):
                          pattern_configs_folder: str = None,
                          verbose=False,
                          stb3=True,
-                         discrete=False):
+                         discrete=False,
+                         scheduler="scan",
+                         batch_size=None,
+                         obs_mode="dict",
+                         copy_obs=False,
+                         flat_encoding="onehot",
+                         macro_step=False,
+                         decision_condition=None,
+                         action_encoding=None,
+                         config_cache=None):
         """
         Use a YAML configuration file to define an environment.
 
@@ -79,36 +118,37 @@ class OpenTheChestsGym(gym.Env):
         :param env_config_file: The configuration file.
         :param verbose: Give information during environment execution.
         :param discrete: Use discrete actions.
+        :param scheduler: Strategy used to select the next event, "scan" or "heap".
+        :param batch_size: Number of pattern instances sampled at once to serve refills.
+        :param obs_mode: Form of the returned observations, "dict", "buffer" or "flat".
+        :param copy_obs: Return copies of the preallocated observation arrays.
+        :param flat_encoding: Encoding of the context type and attributes in flat observations.
+        :param macro_step: Skip the events after which no box is ready.
+        :param decision_condition: Function of the base environment returning True when a decision is needed.
+        :param action_encoding: Form of the actions, "multibinary", "discrete", "multidiscrete" or "sparse".
+        :param config_cache: Folder caching the parsed configuration, True for the default folder, see load_config.
         :return: The newly defined environment.
         """
-        with open(env_config_file, "r") as f:
-            conf = yaml.safe_load(f)
-
-        all_event_types = conf["EVENT_TYPES"]["NORMAL"]
-        all_event_attributes = conf["EVENT_ATTRIBUTES"]["NORMAL"]
-
-        all_noise_types = []
-        if "NOISE" in conf["EVENT_TYPES"]:
-            all_noise_types = conf["EVENT_TYPES"]["NOISE"]
-        all_noise_attributes = []
-        if "NOISE" in conf["EVENT_ATTRIBUTES"]:
-            all_noise_attributes = conf["EVENT_ATTRIBUTES"]["NOISE"]
-
-        all_instructions = []
-        if pattern_configs_folder is None:
-            pattern_configs_folder = "/".join(env_config_file.split("/")[:-1])
-        for pattern_conf_file in conf["INSTRUCTIONS"]:
-            instr = parse_yaml_file(pattern_configs_folder + "/" + pattern_conf_file)
-            all_instructions.append(instr)
-
-        env = cls(instructions=all_instructions,
-                  all_event_types=all_event_types,
-                  all_event_attributes=all_event_attributes,
-                  all_noise_types=all_noise_types,
-                  all_noise_attributes=all_noise_attributes,
+        if config_cache:
+            config = load_config(env_config_file=env_config_file,
+                                 pattern_configs_folder=pattern_configs_folder,
+                                 cache_dir=None if config_cache is True else config_cache)
+        else:
+            config = parse_config_file(env_config_file=env_config_file,
+                                       pattern_configs_folder=pattern_configs_folder)
+
+        env = cls(**config,
                   verbose=verbose,
                   stb3=stb3,
-                  discrete=discrete)
+                  discrete=discrete,
+                  scheduler=scheduler,
+                  batch_size=batch_size,
+                  obs_mode=obs_mode,
+                  copy_obs=copy_obs,
+                  flat_encoding=flat_encoding,
+                  macro_step=macro_step,
+                  decision_condition=decision_condition,
+                  action_encoding=action_encoding)
 
         return env
 
@@ -116,8 +156,8 @@ class OpenTheChestsGym(gym.Env):
         obs, reward, done, info = self.env.step(action)
         return obs, reward, done, info
 
-    def reset(self):
-        return self.env.reset()
+    def reset(self, seed=None):
+        return self.env.reset(seed=seed)
 
     # TODO (priority 3) add different rendering modes of possible
     def render(self, mode="human"):
@@ -0,0 +1,334 @@
+import multiprocessing
+import multiprocessing.connection
+import threading
+
+import numpy as np
+
+from openthechests.src.OpenTheChestsGym import OpenTheChestsGym
+
+# commands sent to the workers through the shared memory block
+STEP = 0
+RESET = 1
+CLOSE = 2
+
+
+def _make_views(block, layout):
+    """
+    Creates NumPy views on the arrays stored in a shared memory block.
+
+    :param block: The shared memory block.
+    :param layout: List of (name, shape, dtype, offset) describing each array.
+    :return: Dictionary mapping each array name to its view.
+    """
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    views = dict()
+    for name, shape, dtype, offset in layout:
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        views[name] = buffer[offset:offset + size].view(dtype).reshape(shape)
+    return views
+
+
+def _write_observation(views, prefix, env_id, obs):
+    """
+    Copies the observation of one environment into the shared arrays.
+
+    :param views: The shared arrays.
+    :param prefix: The prefix of the arrays to write into, "obs" or "terminal".
+    :param env_id: The index of the environment.
+    :param obs: The observation, either a dictionary of arrays or a flat vector.
+    """
+    if isinstance(obs, dict):
+        for key, value in obs.items():
+            views[f"{prefix}/{key}"][env_id] = value
+    else:
+        views[prefix][env_id] = obs
+
+
+def _worker(env_ids, env_config_file, env_kwargs, block, layout, barrier, env_seeds):
+    """
+    Worker process stepping a group of environments.
+    Environments are built from the configuration file inside the worker. At each command, the worker reads the
+    actions from the shared memory block and writes back observations, rewards and done flags, environments that are
+    done being reset right away.
+
+    :param env_ids: The indices of the environments handled by the worker.
+    :param env_config_file: The configuration file used to build the environments.
+    :param env_kwargs: Other parameters given to OpenTheChestsGym.from_config_file.
+    :param block: The shared memory block.
+    :param layout: The layout of the arrays stored in the shared memory block.
+    :param barrier: Barrier used to start and end each command.
+    :param env_seeds: The np.random.SeedSequence of each environment.
+    """
+    views = _make_views(block, layout)
+    try:
+        envs = [OpenTheChestsGym.from_config_file(env_config_file=env_config_file, **env_kwargs) for _ in env_ids]
+        for env, env_seed in zip(envs, env_seeds):
+            env.env.seed(env_seed)
+        while True:
+            barrier.wait()
+            command = views["command"][0]
+            if command == CLOSE:
+                break
+            for env_id, env in zip(env_ids, envs):
+                if command == RESET:
+                    obs = env.reset()
+                else:
+                    obs, reward, done, _ = env.step(views["actions"][env_id])
+                    views["rewards"][env_id] = reward
+                    views["dones"][env_id] = done
+                    if done:
+                        _write_observation(views, "terminal", env_id, obs)
+                        obs = env.reset()
+                _write_observation(views, "obs", env_id, obs)
+            barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    except BaseException:
+        barrier.abort()
+        raise
+
+
+class OpenTheChestsSubprocVec:
+    """
+    Vectorized environment stepping OpenTheChestsGym environments in worker processes.
+    Each worker builds its environments from the configuration file, so that only the file name and parameters are
+    sent to it. Actions, observations, rewards and done flags are exchanged through one shared memory block, the
+    processes only synchronise on a barrier at the beginning and end of each step, without pickling observations.
+    Environments are reset automatically once done, their last observation being returned in the info dictionary
+    under "terminal_observation", as done by Stable Baselines 3 vectorized environments.
+
+    Attributes:
+    -----------
+    num_envs : int
+        The number of environments.
+    num_workers : int
+        The number of worker processes.
+    observation_space : gym.Space
+        The observation space of a single environment.
+    action_space : gym.Space
+        The action space of a single environment.
+    copy_obs : bool
+        Flag to return copies of the observations instead of views on the shared memory.
+
+    Hidden Attributes:
+    ------------------
+    _block : multiprocessing.RawArray
+        The shared memory block.
+    _views : dict
+        NumPy views on the arrays stored in the shared memory block.
+    _barrier : multiprocessing.Barrier
+        Barrier shared with the workers to start and end each command.
+    _processes : list
+        The worker processes.
+    _closed : bool
+        Flag indicating that the workers were stopped.
+
+    Methods:
+    --------
+    reset():
+        Resets all environments and returns their observations.
+    step(actions):
+        Steps all environments using the selected actions.
+    step_async(actions):
+        Sends the actions to the workers without waiting for the results.
+    step_wait():
+        Waits for the workers and returns the results of the step.
+    close():
+        Stops the worker processes.
+    """
+    def __init__(self,
+                 env_config_file: str,
+                 num_envs: int,
+                 num_workers: int = None,
+                 seed: int = None,
+                 copy_obs: bool = False,
+                 start_method: str = None,
+                 **env_kwargs):
+        """
+        Starts the worker processes and allocates the shared memory block.
+
+        :param env_config_file: str
+            The YAML configuration file used by each worker to build its environments.
+        :param num_envs: int
+            The total number of environments.
+        :param num_workers: int, optional
+            The number of worker processes, environments being split evenly between them
+            (default is the number of CPUs, up to num_envs).
+        :param seed: int or np.random.SeedSequence, optional
+            Seed from which one independent seed is spawned per environment, so that results do not depend on the
+            number of workers (default is None, drawing fresh entropy from the system so that environments are not
+            correlated).
+        :param copy_obs: bool, optional
+            Flag to return copies of the observations (default is False). Without copy, the returned arrays are views
+            on the shared memory and are overwritten by the next step or reset.
+        :param start_method: str, optional
+            The multiprocessing start method, for example "fork" or "spawn" (default is the platform default).
+        :param env_kwargs:
+            Other parameters given to OpenTheChestsGym.from_config_file, for example obs_mode="flat".
+            The "dict" observation mode is replaced by "buffer", since observations are stored in fixed arrays.
+        """
+        if env_kwargs.get("obs_mode", "dict") == "dict":
+            env_kwargs["obs_mode"] = "buffer"
+        env_kwargs["copy_obs"] = False
+        self.num_envs = num_envs
+        self.num_workers = min(num_workers or multiprocessing.cpu_count(), num_envs)
+        self.copy_obs = copy_obs
+
+        # build one environment locally to get the spaces and the observation arrays
+        template = OpenTheChestsGym.from_config_file(env_config_file=env_config_file, **env_kwargs)
+        self.observation_space = template.observation_space
+        self.action_space = template.action_space
+        template_obs = template.env.get_observation_buffer().observation
+
+        arrays = [("command", (1,), np.int64),
+                  ("rewards", (num_envs,), np.float32),
+                  ("dones", (num_envs,), np.bool_),
+                  ("actions", (num_envs,) + self.action_space.shape, np.int64)]
+        if isinstance(template_obs, dict):
+            for prefix in ["obs", "terminal"]:
+                arrays += [(f"{prefix}/{key}", (num_envs,) + value.shape, value.dtype)
+                           for key, value in template_obs.items()]
+        else:
+            arrays += [(prefix, (num_envs,) + template_obs.shape, template_obs.dtype) for prefix in ["obs", "terminal"]]
+
+        layout = []
+        offset = 0
+        for name, shape, dtype in arrays:
+            layout.append((name, shape, np.dtype(dtype).str, offset))
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            offset += size + (-size) % 8
+
+        context = multiprocessing.get_context(start_method)
+        self._block = context.RawArray("b", max(offset, 1))
+        self._views = _make_views(self._block, layout)
+        self._obs_keys = list(template_obs) if isinstance(template_obs, dict) else None
+        self._barrier = context.Barrier(self.num_workers + 1)
+
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        env_seeds = seed.spawn(num_envs)
+
+        self._processes = []
+        for env_ids in np.array_split(np.arange(num_envs), self.num_workers):
+            process = context.Process(target=_worker,
+                                      args=(env_ids.tolist(), env_config_file, env_kwargs, self._block, layout,
+                                            self._barrier, [env_seeds[env_id] for env_id in env_ids]),
+                                      daemon=True)
+            process.start()
+            self._processes.append(process)
+        self._closed = False
+        threading.Thread(target=self._watch_workers, daemon=True).start()
+
+    def reset(self):
+        """
+        Resets all environments.
+
+        :return: dict or np.ndarray
+            The stacked observations of all environments.
+        """
+        self._send(RESET)
+        self._wait()
+        return self._get_observations("obs")
+
+    def step(self, actions):
+        """
+        Steps all environments using the selected actions.
+
+        :param actions: np.ndarray
+            The actions of all environments, stacked along the first dimension.
+        :return: tuple
+            The stacked observations, rewards, done flags and a list of info dictionaries.
+        """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def step_async(self, actions):
+        """
+        Writes the actions into the shared memory block and starts the workers.
+
+        :param actions: np.ndarray
+            The actions of all environments, stacked along the first dimension.
+        """
+        self._views["actions"][:] = np.asarray(actions).reshape(self._views["actions"].shape)
+        self._send(STEP)
+
+    def step_wait(self):
+        """
+        Waits for the workers to finish the step and reads the results from the shared memory block.
+
+        :return: tuple
+            The stacked observations, rewards, done flags and a list of info dictionaries.
+        """
+        self._wait()
+        dones = self._views["dones"].copy()
+        infos = [dict() for _ in range(self.num_envs)]
+        if dones.any():
+            terminal = self._get_observations("terminal")
+            for env_id in np.flatnonzero(dones):
+                if self._obs_keys is None:
+                    infos[env_id]["terminal_observation"] = terminal[env_id].copy()
+                else:
+                    infos[env_id]["terminal_observation"] = {key: value[env_id].copy()
+                                                             for key, value in terminal.items()}
+        return self._get_observations("obs"), self._views["rewards"].copy(), dones, infos
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._send(CLOSE)
+        except RuntimeError:
+            pass
+        for process in self._processes:
+            process.join()
+
+    def _send(self, command):
+        """
+        Writes a command into the shared memory block and releases the workers.
+
+        :param command: int
+            The command to execute.
+        """
+        self._views["command"][0] = command
+        self._wait()
+
+    def _wait(self):
+        """
+        Waits on the barrier shared with the workers.
+        """
+        try:
+            self._barrier.wait()
+        except threading.BrokenBarrierError:
+            raise RuntimeError("A worker process failed, see its traceback for details.")
+
+    def _watch_workers(self):
+        """
+        Breaks the barrier when a worker process stops before the environment is closed,
+        so that the parent raises an error instead of waiting forever.
+        """
+        multiprocessing.connection.wait([process.sentinel for process in self._processes])
+        if not self._closed:
+            self._barrier.abort()
+
+    def _get_observations(self, prefix):
+        """
+        Returns the observations stored in the shared memory block.
+
+        :param prefix: str
+            "obs" for the current observations, "terminal" for the last observations of finished episodes.
+        :return: dict or np.ndarray
+            The stacked observations.
+        """
+        if self._obs_keys is None:
+            obs = self._views[prefix]
+            return obs.copy() if self.copy_obs else obs
+        obs = {key: self._views[f"{prefix}/{key}"] for key in self._obs_keys}
+        return {key: value.copy() for key, value in obs.items()} if self.copy_obs else obs
+
+    def __del__(self):
+        if not getattr(self, "_closed", True):
+            self.close()
@@ -0,0 +1,371 @@
+import numpy as np
+
+from openthechests.src.elements.BoxBank import BoxBank
+from openthechests.src.elements.Generator import Generator
+from openthechests.src.elements.Parser import Parser
+from openthechests.src.elements.Pattern import Pattern
+from openthechests.src.utils.action_codecs import make_action_codec
+from openthechests.src.utils.config_cache import load_config
+from openthechests.src.utils.helper_functions import parse_config_file
+
+
+class OpenTheChestsVec:
+    """
+    Batched version of the OpenTheChests environment that steps several independent environments at once.
+    Box states, deactivation counters and the start and end times of the next event of each pattern are stored in
+    arrays of shape (num_envs, num_boxes), so that actions, rewards, box updates and end checks are computed for all
+    environments with array operations. Only event sampling is done separately by each environment's generator.
+    The environment rules are the same as the ones of OpenTheChests, the returned observations have the
+    Stable Baselines 3 format stacked over all environments, as done by a DummyVecEnv of OpenTheChestsGym.
+
+    Attributes:
+    -----------
+    num_envs : int
+        The number of environments stepped together.
+    discrete : bool
+        Flag to determine if actions are in integer format.
+    action_codec : ActionCodec
+        The codec transforming the given actions into binary vectors of pressed buttons.
+    auto_reset : bool
+        Flag to reset environments automatically once they are done.
+    parser : Parser
+        The parser used to interpret event and noise information, shared by all environments.
+    patterns : list
+        The compiled patterns defining the behavior of the boxes. Each generator samples its own copies of them,
+        sharing the compiled programs.
+    generators : list
+        One Generator per environment used to create event stacks based on patterns.
+    box_bank : BoxBank
+        The box states of all environments, stored in arrays of shape (num_envs, num_boxes).
+    dones : np.ndarray
+        Flags indicating which environments have ended.
+
+    Hidden Attributes:
+    ------------------
+    _timeout_threshold : int
+        The threshold for the number of times boxes can be collectively deactivated before ending the game.
+    _num_boxes : int
+        The number of boxes in each environment.
+    _next_start, _next_end : np.ndarray
+        Start and end times of the next event of each pattern, set to infinity for disabled timelines.
+    _time : np.ndarray
+        The current time of each environment.
+    _contexts : list
+        The record of the last observed event of each environment, following Parser.event_dtype.
+
+    Methods:
+    --------
+    from_config_file(num_envs, env_config_file, pattern_configs_folder=None, ...):
+        Defines a batched environment using a YAML configuration file.
+    get_num_boxes():
+        Returns the number of boxes in each environment.
+    reset(mask=None, seed=None):
+        Resets the selected environments and returns the observations of all environments.
+    step(actions):
+        Advances all environments by one step using the selected actions.
+    get_observations():
+        Returns the current observations of all environments.
+    check_end():
+        Verifies which environments should send a done signal.
+
+    Hidden Methods:
+    ---------------
+    _internal_step(rows):
+        Advances the timeline of the selected environments and updates their boxes.
+    _apply_actions(actions):
+        Applies the actions to all environments and returns the rewards.
+    """
+    def __init__(self,
+                 num_envs: int,
+                 instructions: list,
+                 all_event_types: list,
+                 all_event_attributes: dict,
+                 all_noise_types: list,
+                 all_noise_attributes: dict,
+                 timeout_threshold: int = 30,
+                 discrete: bool = False,
+                 auto_reset: bool = True,
+                 batch_size: int = None,
+                 action_encoding=None):
+        """
+        Initializes num_envs OpenTheChests environments sharing the same instructions.
+
+        :param num_envs: int
+            The number of environments to step together.
+        :param instructions: list
+            List of commands allowing to define behavior for each box.
+        :param all_event_types: list
+            List of all possible event types that can take place.
+        :param all_event_attributes: dict
+            Dictionary of all event types with a corresponding list of possible values.
+        :param all_noise_types: list
+            List of all possible types to be used for noise generation only.
+        :param all_noise_attributes: dict
+            Dictionary of all possible types to be used for noise generation only.
+        :param timeout_threshold: int, optional
+            The threshold for the number of times boxes can be collectively deactivated before ending the game (default is 30).
+        :param discrete: bool, optional
+            Flag to determine if actions are in integer format (default is False).
+        :param auto_reset: bool, optional
+            Flag to reset environments as soon as they are done, as done by vectorized environments (default is True).
+        :param batch_size: int, optional
+            Number of pattern instances sampled at once by each generator to serve refills (default is None,
+            sampling one instance per refill).
+        :param action_encoding: str or ActionCodec, optional
+            The form of the accepted actions, see OpenTheChests (default is None, using "discrete" when discrete is
+            set and "multibinary" otherwise).
+        """
+        self.num_envs = num_envs
+        self.action_codec = make_action_codec(action_encoding, len(instructions), discrete=discrete)
+        self.discrete = self.action_codec.name == "discrete"
+        self.auto_reset = auto_reset
+        self._timeout_threshold = timeout_threshold
+        self._num_boxes = len(instructions)
+
+        self.parser = Parser(all_event_types=all_event_types,
+                             all_noise_types=all_noise_types,
+                             all_event_attributes=all_event_attributes,
+                             all_noise_attributes=all_noise_attributes)
+        # instructions are compiled once, each generator gets copies of the parser and of the patterns sharing the
+        # compiled programs, so that the duration statistics and the full patterns of each environment are separate
+        self.patterns = [Pattern(id=idx, instruction=instr, parser=self.parser)
+                         for idx, instr in enumerate(instructions)]
+        self.generators = [Generator(parser=self.parser.copy(),
+                                     patterns=[pattern.copy() for pattern in self.patterns],
+                                     batch_size=batch_size)
+                           for _ in range(num_envs)]
+
+        shape = (num_envs, self._num_boxes)
+        self.box_bank = BoxBank(num_boxes=self._num_boxes, num_envs=num_envs)
+        self._next_start = np.full(shape, np.inf)
+        self._next_end = np.full(shape, np.inf)
+        self._time = np.zeros(num_envs)
+        self._contexts = [None] * num_envs
+        self.dones = np.zeros(num_envs, dtype=bool)
+
+        # labelled context of each environment, kept in arrays to build observations
+        self._e_type = np.zeros(num_envs, dtype=np.int64)
+        self._attributes = {attr: np.zeros(num_envs, dtype=np.int64) for attr in self.parser.all_attributes}
+        self._start = np.zeros((num_envs, 1))
+        self._end = np.zeros((num_envs, 1))
+        self._duration = np.zeros((num_envs, 1))
+
+    @classmethod
+    def from_config_file(cls,
+                         num_envs: int,
+                         env_config_file: str,
+                         pattern_configs_folder: str = None,
+                         timeout_threshold: int = 30,
+                         discrete: bool = False,
+                         auto_reset: bool = True,
+                         batch_size: int = None,
+                         action_encoding=None,
+                         config_cache=None):
+        """
+        Use a YAML configuration file to define a batched environment.
+
+        :param num_envs: The number of environments to step together.
+        :param env_config_file: The configuration file.
+        :param pattern_configs_folder: The folder containing the pattern files, defaults to the configuration folder.
+        :param timeout_threshold: Number of collective deactivations before ending the game.
+        :param discrete: Use discrete actions.
+        :param auto_reset: Reset environments as soon as they are done.
+        :param batch_size: Number of pattern instances sampled at once to serve refills.
+        :param action_encoding: Form of the actions, "multibinary", "discrete", "multidiscrete" or "sparse".
+        :param config_cache: Folder caching the parsed configuration, True for the default folder, see load_config.
+        :return: The newly defined batched environment.
+        """
+        if config_cache:
+            config = load_config(env_config_file=env_config_file,
+                                 pattern_configs_folder=pattern_configs_folder,
+                                 cache_dir=None if config_cache is True else config_cache)
+        else:
+            config = parse_config_file(env_config_file=env_config_file,
+                                       pattern_configs_folder=pattern_configs_folder)
+        return cls(num_envs=num_envs,
+                   **config,
+                   timeout_threshold=timeout_threshold,
+                   discrete=discrete,
+                   auto_reset=auto_reset,
+                   batch_size=batch_size,
+                   action_encoding=action_encoding)
+
+    def get_num_boxes(self):
+        return self._num_boxes
+
+    def reset(self, mask=None, seed=None):
+        """
+        Resets the selected environments to their initial state.
+        Each selected environment restarts time, resets and activates its boxes and refills its timeline of events,
+        before making one internal step to get its first context.
+
+        :param mask: np.ndarray, optional
+            Boolean array of size num_envs selecting the environments to reset (default is all environments).
+        :param seed: int, np.random.SeedSequence or list, optional
+            Seed from which one independent seed is spawned per environment, environment i always receiving the i-th
+            child whatever the mask, or list of num_envs seeds giving the seed of each environment
+            (default is None, continuing the current random streams).
+        :return: dict
+            The observations of all environments.
+        """
+        rows = np.arange(self.num_envs) if mask is None else np.flatnonzero(mask)
+
+        if seed is not None:
+            if isinstance(seed, (list, tuple)):
+                env_seeds = seed
+            else:
+                if not isinstance(seed, np.random.SeedSequence):
+                    seed = np.random.SeedSequence(seed)
+                env_seeds = seed.spawn(self.num_envs)
+            for env_id in rows:
+                self.generators[env_id].seed(env_seeds[env_id])
+
+        for env_id in rows:
+            generator = self.generators[env_id]
+            generator.reset()
+            for pattern_id, stack in generator.event_stacks.items():
+                self._next_start[env_id, pattern_id] = stack.next_start()
+                self._next_end[env_id, pattern_id] = stack.next_end()
+
+        self._time[rows] = 0
+        self.box_bank.reset(rows=rows, active=True)
+        self.dones[rows] = False
+
+        self._internal_step(rows)
+
+        return self.get_observations()
+
+    def step(self, actions):
+        """
+        Moves all environments forward by one step using the selected actions.
+        When auto_reset is set, the environments that are done are reset and the last observation of their
+        episode is returned under the "terminal_observation" key of their info dictionary.
+
+        :param actions: np.ndarray
+            Binary actions of shape (num_envs, num_boxes), or the actions of the selected action encoding stacked
+            along a first dimension of size num_envs.
+        :return: tuple
+            A tuple containing the observations, rewards, done flags and a list of info dictionaries.
+        """
+        actions = self.action_codec.decode_batch(actions)
+        assert actions.shape == self._next_end.shape, \
+            f"Got actions of shape {actions.shape} while expecting {self._next_end.shape}."
+
+        rewards = self._apply_actions(actions)
+
+        self._internal_step(slice(None))
+        obs = self.get_observations()
+
+        dones = self.check_end()
+        self.dones[:] = dones
+        infos = [dict() for _ in range(self.num_envs)]
+
+        if self.auto_reset and dones.any():
+            for env_id in np.flatnonzero(dones):
+                infos[env_id]["terminal_observation"] = {key: value[env_id].copy() for key, value in obs.items()}
+            obs = self.reset(mask=dones)
+
+        return obs, rewards, dones, infos
+
+    def get_observations(self):
+        """
+        Returns the last observation of all environments under the Stable Baselines 3 format,
+        where each entry is stacked along a first dimension of size num_envs.
+
+        Note: attributes that are not defined for the context event of an environment are set to 0.
+
+        :return: dict
+            Dictionary containing the information of all environments.
+        """
+        return {"active": self.box_bank.active.astype(np.int64),
+                "open": self.box_bank.open.astype(np.int64),
+                "e_type": self._e_type.copy(),
+                **{attr: values.copy() for attr, values in self._attributes.items()},
+                "start": self._start.copy(),
+                "end": self._end.copy(),
+                "duration": self._duration.copy()}
+
+    def check_end(self):
+        """
+        Verifies which environments should send a done signal.
+        An environment is done when all of its boxes have been opened, or when its boxes have been
+        collectively deactivated more than _timeout_threshold times.
+
+        :return: np.ndarray
+            Boolean array indicating the end of each game.
+        """
+        return self.box_bank.all_open() | (self.box_bank.get_total_deactivations() >= self._timeout_threshold)
+
+    def _internal_step(self, rows):
+        """
+        Advances the timeline of the selected environments and updates their boxes.
+        For each environment the next event is taken from the pattern whose next event ends first, and patterns
+        whose next event has already started are marked active. Patterns that have been completely played are
+        marked satisfied and active.
+
+        :param rows: np.ndarray or slice
+            The environments to advance.
+        """
+        next_end = self._next_end[rows]
+        pattern_ids = np.argmin(next_end, axis=1)
+        env_ids = np.arange(self.num_envs)[rows]
+        has_event = np.isfinite(next_end[np.arange(len(env_ids)), pattern_ids])
+        event_ends = np.zeros(len(env_ids))
+        satisfied = np.zeros(next_end.shape, dtype=bool)
+
+        stepped_rows = np.flatnonzero(has_event)
+        stepped_envs = env_ids[stepped_rows]
+        stepped_patterns = pattern_ids[stepped_rows]
+        records = np.empty(len(stepped_rows), dtype=self.parser.event_dtype)
+        next_starts = np.empty(len(stepped_rows))
+        next_ends = np.empty(len(stepped_rows))
+        refills = np.zeros(len(stepped_rows), dtype=bool)
+        for idx, (env_id, pattern_id) in enumerate(zip(stepped_envs.tolist(), stepped_patterns.tolist())):
+            generator = self.generators[env_id]
+            record, refills[idx] = generator._pop_event(pattern_id)
+            stack = generator.event_stacks[pattern_id]
+            next_starts[idx] = stack.next_start()
+            next_ends[idx] = stack.next_end()
+            records[idx] = record
+            self._contexts[env_id] = record
+
+        # contexts are labelled from the codes of their records, without building Event objects
+        self._next_start[stepped_envs, stepped_patterns] = next_starts
+        self._next_end[stepped_envs, stepped_patterns] = next_ends
+        satisfied[stepped_rows, stepped_patterns] = refills
+        event_ends[stepped_rows] = records["end"]
+        self._time[stepped_envs] = records["end"]
+        self._e_type[stepped_envs] = records["type_code"]
+        for attr, values in self._attributes.items():
+            values[stepped_envs] = np.maximum(records[f"attr/{attr}"], 0)
+        self._start[stepped_envs, 0] = records["start"]
+        self._end[stepped_envs, 0] = records["end"]
+        self._duration[stepped_envs, 0] = records["end"] - records["start"]
+
+        active = (event_ends[:, None] >= self._next_start[rows]) | satisfied
+        active &= has_event[:, None]
+        self.box_bank.update(satisfied=satisfied, active=active, rows=rows)
+
+    def _apply_actions(self, actions):
+        """
+        Applies the actions to all environments, following the rules of OpenTheChests._apply_action.
+        Pressing the button of a ready box opens it, disables its timeline and gives a reward of 1.
+        Pressing any other button, or ignoring a ready box, gives a reward of -1.
+
+        :param actions: np.ndarray
+            Binary actions of shape (num_envs, num_boxes).
+        :return: np.ndarray
+            The reward obtained by each environment.
+        """
+        pressed = actions == 1
+        ignored = ~pressed & self.box_bank.ready
+        opened = self.box_bank.press(pressed)
+
+        rewards = opened.sum(axis=1) - (pressed & ~opened).sum(axis=1) - ignored.sum(axis=1)
+
+        self._next_start[opened] = np.inf
+        self._next_end[opened] = np.inf
+        for env_id, pattern_id in zip(*np.nonzero(opened)):
+            self.generators[env_id].disable_timeline(pattern_id=pattern_id)
+
+        return rewards.astype(np.float32)
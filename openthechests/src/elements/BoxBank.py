@@ -0,0 +1,167 @@
+import numpy as np
+
+
+class BoxBank:
+    """
+    The states of a group of boxes, stored in boolean arrays so that all boxes are pressed and updated at once.
+    Arrays have shape (num_boxes,) for a single environment, or (num_envs, num_boxes) for batched environments,
+    in which case the operations below apply to every environment.
+    The rules are the ones of InteractiveBox, which can be used as a view on one box of the bank.
+
+    Note: Unlike InteractiveBox, the bank does not check its transitions. Signals produced by the Generator always
+    mark satisfied patterns as active, which keeps the states valid: a ready box is always active and not open.
+
+    Attributes:
+    -----------
+    active : np.ndarray
+        Flags indicating which boxes are active.
+    ready : np.ndarray
+        Flags indicating which boxes are ready to be opened.
+    open : np.ndarray
+        Flags indicating which boxes have been opened.
+    num_deactivations : np.ndarray
+        The number of times each box has been deactivated.
+
+    Methods:
+    --------
+    reset(rows=None, active=False):
+        Resets the boxes to their initial conditions.
+    press(pressed):
+        Presses the buttons of the selected boxes, opening the ones that are ready.
+    update(satisfied, active, rows=None):
+        Updates the box states using the signals sent by the patterns.
+    all_open():
+        Checks if all boxes have been opened.
+    get_total_deactivations():
+        Returns the number of deactivations summed over all boxes.
+    get_state():
+        Returns a copy of the state arrays.
+    set_state(state):
+        Restores state arrays returned by get_state.
+
+    Hidden Methods:
+    ---------------
+    _update(is_active, is_ready, is_open, num_deactivations, satisfied, active):
+        Applies the update rules in place on the given state arrays.
+    """
+    def __init__(self,
+                 num_boxes: int,
+                 num_envs: int = None):
+        """
+        Allocates the state arrays of the boxes, initially not opened, not ready and not active.
+
+        :param num_boxes: int
+            The number of boxes of an environment.
+        :param num_envs: int, optional
+            The number of environments, adding a first dimension to the arrays (default is None, for a single
+            environment).
+        """
+        shape = (num_boxes,) if num_envs is None else (num_envs, num_boxes)
+        self.active = np.zeros(shape, dtype=bool)
+        self.ready = np.zeros(shape, dtype=bool)
+        self.open = np.zeros(shape, dtype=bool)
+        self.num_deactivations = np.zeros(shape, dtype=np.int64)
+
+    def reset(self, rows=None, active=False):
+        """
+        Resets the boxes to their initial conditions, not opened and not ready.
+
+        :param rows: np.ndarray or slice, optional
+            The environments to reset when the bank holds several environments (default is all boxes).
+        :param active: bool, optional
+            Flag to activate the boxes right away (default is False).
+        """
+        rows = slice(None) if rows is None else rows
+        self.open[rows] = False
+        self.ready[rows] = False
+        self.active[rows] = active
+        self.num_deactivations[rows] = 0
+
+    def press(self, pressed):
+        """
+        Presses the buttons of the selected boxes.
+        Boxes that are active and ready are opened, they are then no longer active nor ready.
+
+        :param pressed: np.ndarray
+            Boolean array indicating which buttons are pressed, with the shape of the bank.
+        :return: np.ndarray
+            Boolean array indicating which boxes have been opened.
+        """
+        opened = pressed & self.active & self.ready & ~self.open
+        self.open |= opened
+        self.active &= ~opened
+        self.ready &= ~opened
+        return opened
+
+    def update(self, satisfied, active, rows=None):
+        """
+        Updates the box states using the signals sent by the patterns, following InteractiveBox.update:
+        unopened boxes that were ready are deactivated, inactive boxes receiving an active signal are activated,
+        and boxes whose pattern has been satisfied become ready.
+
+        :param satisfied: np.ndarray
+            Boolean array indicating which patterns have been satisfied.
+        :param active: np.ndarray
+            Boolean array indicating which patterns are active.
+        :param rows: np.ndarray or slice, optional
+            The environments to update when the bank holds several environments, the signals then only cover these
+            environments (default is all boxes).
+        """
+        if rows is None or (isinstance(rows, slice) and rows == slice(None)):
+            self._update(self.active, self.ready, self.open, self.num_deactivations, satisfied, active)
+            return
+        is_active = self.active[rows]
+        is_ready = self.ready[rows]
+        num_deactivations = self.num_deactivations[rows]
+        self._update(is_active, is_ready, self.open[rows], num_deactivations, satisfied, active)
+        self.active[rows] = is_active
+        self.ready[rows] = is_ready
+        self.num_deactivations[rows] = num_deactivations
+
+    @staticmethod
+    def _update(is_active, is_ready, is_open, num_deactivations, satisfied, active):
+        # ready boxes are active and not open, so all of them time out
+        num_deactivations += is_ready
+        is_active ^= is_ready
+        is_ready[...] = False
+
+        closed = ~is_open
+        is_active |= (active | satisfied) & closed
+        is_ready |= satisfied & closed
+
+    def all_open(self):
+        """
+        Checks if all boxes have been opened.
+
+        :return: bool or np.ndarray
+            True if all boxes are open, given for each environment when the bank holds several environments.
+        """
+        return self.open.all(axis=-1)
+
+    def get_total_deactivations(self):
+        """
+        Returns the number of deactivations summed over all boxes.
+
+        :return: int or np.ndarray
+            The number of deactivations, given for each environment when the bank holds several environments.
+        """
+        return self.num_deactivations.sum(axis=-1)
+
+    def get_state(self):
+        """
+        Returns a copy of the state arrays.
+
+        :return: tuple
+            Copies of the active, ready, open and num_deactivations arrays.
+        """
+        return self.active.copy(), self.ready.copy(), self.open.copy(), self.num_deactivations.copy()
+
+    def set_state(self, state):
+        """
+        Restores state arrays returned by get_state.
+        Arrays are copied in place, so that views on the bank such as InteractiveBox stay valid.
+
+        :param state: tuple
+            The active, ready, open and num_deactivations arrays to restore.
+        """
+        self.active[...], self.ready[...], self.open[...], self.num_deactivations[...] = state
@@ -1,5 +1,4 @@
 import math
-from copy import deepcopy
 
 
 class Event:
@@ -18,6 +17,12 @@ class Event:
         The end time of the event.
     duration : float
         The duration of the event, calculated as t_end - t_start.
+    codes : tuple
+        The integer codes of the type and attributes of the event as (type_code, {'attribute_name': value_code}),
+        given by the parser that generated the event, or None if they are unknown.
+
+    Note: Events only store the slots listed above. The attributes dictionary can be shared between several events,
+    for example between an event and its shifted copies, and should therefore never be modified in place.
 
     Methods:
     --------
@@ -28,7 +33,7 @@ class Event:
     set_time(t_start, t_end):
         Sets the start and end times of the event, ensuring that t_end >= t_start.
     shifted(delta):
-        Shifts the event's start and end times by a fixed value.
+        Returns a copy of the event with start and end times shifted by a fixed value.
     to_dict():
         Returns a dictionary representation of the event.
 
@@ -49,11 +54,14 @@ class Event:
     __repr__():
         Returns a string representation of the event for debugging purposes.
     """
+    __slots__ = ("type", "attributes", "start", "end", "duration", "codes")
+
     def __init__(self,
                  e_type: str,
                  e_attributes: dict,
                  t_start: float,
-                 t_end: float) -> object:
+                 t_end: float,
+                 codes: tuple = None) -> object:
         """
         Initializes an event object with a type, attributes, a beginning, and an end.
 
@@ -65,6 +73,8 @@ class Event:
             The start time of the event.
         :param t_end: float
             The end time of the event.
+        :param codes: tuple, optional
+            The integer codes of the type and attributes of the event, as given by Parser.label (default is None).
 
         Note: Event end time should be superior to event beginning: t_end >= t_start
         """
@@ -73,6 +83,7 @@ class Event:
         self.start = None
         self.type = e_type
         self.attributes = e_attributes
+        self.codes = codes
         self.set_time(t_start, t_end)
 
     def get_type(self):
@@ -90,6 +101,7 @@ class Event:
     def shifted(self, delta):
         """
         Shifts the event's start and end times by a fixed value.
+        The copy shares the attributes dictionary and codes of the original event instead of copying them.
 
         :param delta: float
             The value by which to shift the event.
@@ -99,9 +111,13 @@ class Event:
         assert self.start + delta >= 0, f"Cannot start event sooner than 0, shifting by {delta} would lead to " \
                                         f"starting at {self.start + delta} "
 
-        new = deepcopy(self)
-        new.start += delta
-        new.end += delta
+        new = self.__class__.__new__(self.__class__)
+        new.type = self.type
+        new.attributes = self.attributes
+        new.start = self.start + delta
+        new.end = self.end + delta
+        new.duration = self.duration
+        new.codes = self.codes
         return new
 
     def to_dict(self):
@@ -113,7 +129,7 @@ class Event:
         return self.end < other.end
 
     def __le__(self, other):
-        return self.end <= other.endpass
+        return self.end <= other.end
 
     def __gt__(self, other):
         return self.end > other.end
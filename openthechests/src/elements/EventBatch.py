@@ -0,0 +1,102 @@
+import numpy as np
+
+from openthechests.src.elements.Event import Event
+
+
+class EventBatch:
+    """
+    Several instances of the same event, sampled together.
+    Start and end times of all instances are stored in arrays, while types and attributes are either shared by all
+    instances or given per instance. Batches follow the time interface of Event (start, end, duration and shifted),
+    so that Allen functions can place all instances at once.
+
+    Attributes:
+    -----------
+    type : str or list
+        The type shared by all instances, or the list of types of each instance.
+    attributes : dict or list
+        The attributes shared by all instances, or the list of attribute dictionaries of each instance.
+    start : np.ndarray
+        The start times of the instances.
+    end : np.ndarray
+        The end times of the instances.
+    duration : np.ndarray
+        The durations of the instances.
+    codes : tuple or list
+        The integer codes shared by all instances, or the list of codes of each instance (see Event.codes).
+
+    Methods:
+    --------
+    shifted(delta):
+        Returns a copy of the batch with start and end times shifted by fixed values.
+    get_event(idx, delta=0):
+        Returns one instance of the batch as an Event.
+    """
+    __slots__ = ("type", "attributes", "start", "end", "duration", "codes")
+
+    def __init__(self,
+                 e_type,
+                 e_attributes,
+                 t_start: np.ndarray,
+                 t_end: np.ndarray,
+                 codes=None):
+        """
+        Initializes a batch of events from its types, attributes and time arrays.
+
+        :param e_type: str or list
+            The type shared by all instances, or the list of types of each instance.
+        :param e_attributes: dict or list
+            The attributes shared by all instances, or the list of attribute dictionaries of each instance.
+        :param t_start: np.ndarray
+            The start times of the instances.
+        :param t_end: np.ndarray
+            The end times of the instances.
+        :param codes: tuple or list, optional
+            The integer codes shared by all instances, or the list of codes of each instance (default is None).
+        """
+        assert np.all(t_start <= t_end), "Event beginning must be inferior to event end."
+        self.type = e_type
+        self.attributes = e_attributes
+        self.codes = codes
+        self.start = t_start
+        self.end = t_end
+        self.duration = t_end - t_start
+
+    def __len__(self):
+        return len(self.start)
+
+    def shifted(self, delta):
+        """
+        Shifts the start and end times of all instances.
+
+        :param delta: float or np.ndarray
+            The value by which to shift each instance.
+        :return: EventBatch
+            A copy of the batch with new start and end times, sharing types and attributes with the original.
+        """
+        assert np.all(self.start + delta >= 0), "Cannot start event sooner than 0."
+
+        new = self.__class__.__new__(self.__class__)
+        new.type = self.type
+        new.attributes = self.attributes
+        new.start = self.start + delta
+        new.end = self.end + delta
+        new.duration = self.duration
+        new.codes = self.codes
+        return new
+
+    def get_event(self, idx, delta=0):
+        """
+        Returns one instance of the batch as an Event.
+
+        :param idx: int
+            The index of the instance.
+        :param delta: float, optional
+            The value by which to shift the returned event (default is 0).
+        :return: Event
+            The selected instance.
+        """
+        e_type = self.type[idx] if isinstance(self.type, list) else self.type
+        attributes = self.attributes[idx] if isinstance(self.attributes, list) else self.attributes
+        codes = self.codes[idx] if isinstance(self.codes, list) else self.codes
+        return Event(e_type, attributes, float(self.start[idx]) + delta, float(self.end[idx]) + delta, codes)
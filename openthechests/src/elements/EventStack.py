@@ -0,0 +1,81 @@
+import numpy as np
+
+
+class EventStack:
+    """
+    The events of a pattern instance that remain to be played, stored as records of a NumPy structured array sorted
+    by end time, along with a cursor pointing to the next event.
+    Records follow Parser.event_dtype: start and end times, type and attribute codes, a noise flag and the ID of the
+    pattern. Playing an event only moves the cursor, and Event objects are only materialized when events are accessed
+    by index or iteration, so that stacks of many environments take little memory.
+
+    Attributes:
+    -----------
+    events : np.ndarray
+        The records of all events of the instance, including the ones already played. Records are never modified.
+    cursor : int
+        The index of the next event in events.
+    parser : Parser
+        The parser used to materialize events.
+
+    Methods:
+    --------
+    pop():
+        Returns the record of the next event and moves the cursor forward.
+    next_start():
+        Returns the start time of the next event.
+    next_end():
+        Returns the end time of the next event.
+
+    Hidden Methods:
+    ---------------
+    __len__():
+        Returns the number of remaining events.
+    __getitem__(idx):
+        Returns the remaining event at index idx as an Event, 0 being the next event.
+    __iter__():
+        Iterates over the remaining events as Event objects.
+    """
+    __slots__ = ("events", "cursor", "parser")
+
+    def __init__(self, events: np.ndarray, parser, cursor: int = 0):
+        """
+        Initializes a stack from records sorted by end time.
+
+        :param events: np.ndarray
+            The records of the events, following Parser.event_dtype.
+        :param parser: Parser
+            The parser used to materialize events.
+        :param cursor: int, optional
+            The index of the next event (default is 0).
+        """
+        self.events = events
+        self.cursor = cursor
+        self.parser = parser
+
+    def pop(self):
+        record = self.events[self.cursor]
+        self.cursor += 1
+        return record
+
+    def next_start(self):
+        return self.events["start"].item(self.cursor)
+
+    def next_end(self):
+        return self.events["end"].item(self.cursor)
+
+    def __len__(self):
+        return len(self.events) - self.cursor
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("Event stack index out of range.")
+        return self.parser.decode_event(self.events[self.cursor + idx])
+
+    def __iter__(self):
+        return (self.parser.decode_event(record) for record in self.events[self.cursor:])
+
+    def __repr__(self):
+        return f"EventStack({list(self)})"
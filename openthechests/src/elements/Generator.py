@@ -1,11 +1,14 @@
+import heapq
 import random
 from typing import List, Dict
 
 import numpy as np
 
 from openthechests.src.elements.Event import Event
+from openthechests.src.elements.EventStack import EventStack
 from openthechests.src.elements.Parser import Parser
 from openthechests.src.elements.Pattern import Pattern
+from openthechests.src.elements.PatternBatch import PatternBatch
 
 
 class Generator:
@@ -18,49 +21,141 @@ class Generator:
         The parser structure used for sampling events.
     patterns : Dict[int, Pattern]
         A dictionary mapping pattern IDs to their respective Pattern objects.
-    verbose : bool
-        A flag to enable verbose output for debugging purposes.
+    tracer : Tracer
+        The tracer notified of each taken event and sampled pattern instance, or None.
+    scheduler : str
+        The strategy used to select the next event, either "scan" or "heap".
+    batch_size : int
+        The number of pattern instances sampled at once to serve refills, or None to sample one instance per refill.
     event_stacks : dict
-        A dictionary storing event stacks for each pattern.
+        A dictionary storing the EventStack of each pattern, holding the records of its remaining events.
+    satisfied : np.ndarray
+        Boolean array indexed by pattern ID, marking the patterns satisfied by the last retrieved event.
+    active : np.ndarray
+        Boolean array indexed by pattern ID, marking the patterns active after the last retrieved event.
+
+    Hidden Attributes:
+    ------------------
+    _end_heap : list
+        Priority queue of (end, pattern_id, version) entries for the next event of each pattern (heap scheduler only).
+    _start_heap : list
+        Priority queue of (start, pattern_id, version) entries for next events that have not started yet
+        (heap scheduler only).
+    _versions : dict
+        Version of the next event of each pattern, used to lazily ignore outdated queue entries (heap scheduler only).
+    _started : set
+        IDs of the patterns whose next event has already started (heap scheduler only).
+    _batches : dict
+        The buffer of pre-sampled instances of each pattern (batched sampling only).
+    _batch_cursors : dict
+        The index of the next unused instance in each pattern buffer (batched sampling only).
+    _rngs : dict
+        The random generator of each pattern, empty until the generator is seeded, in which case the global random
+        generators are used.
 
     Methods:
     --------
+    seed(seed=None):
+        Gives each pattern its own random stream derived from the seed.
     reset():
         Resets the event stacks and fills them with generated events based on patterns.
     next_event():
-        Retrieves the next event to be processed and updates the event stacks.
+        Retrieves the next event to be processed, updates the event stacks and the pattern signals.
     disable_timeline(pattern_id: int):
         Disables the timeline for a specific pattern by removing its event stack.
     get_timeline():
         Returns the current timeline of events.
+    attach_tracer(tracer):
+        Notifies a tracer of each taken event and sampled pattern instance.
+    detach_tracer():
+        Removes the attached tracer.
+    get_state():
+        Returns a snapshot of the event stacks, scheduler and random streams.
+    set_state(state):
+        Restores a snapshot returned by get_state.
 
     Hidden Methods
     --------------
     _generate_noise_events(pattern_noise, pattern_end, pattern_len):
         Generates a list of noise events proportional to the list of normal events for the pattern.
     _fill_event_stack(t, pattern, last_generated_event=None):
-        Fills the pattern stack starting at time t with generated events.
+        Fills the pattern stack starting at time t with the records of generated events.
+    _sample_pattern_batch(pattern):
+        Samples batch_size instances of a pattern at once.
+    _take_batched_instance(t, pattern):
+        Takes the next pre-sampled instance of a pattern, replenishing its buffer when needed.
+    _pop_event(pattern_id):
+        Removes the next event record from a pattern's stack and refills the stack once it is exhausted.
+    _scan_next_event():
+        Retrieves the next event by comparing the next events of all patterns.
+    _heap_next_event():
+        Retrieves the next event using priority queues ordered by event end and start times.
+    _push_next_event(pattern_id):
+        Registers the next event of a pattern in the priority queues.
     """
 
     def __init__(self,
                  parser: Parser,
                  patterns: List[Pattern],
-                 verbose: bool = False):
+                 scheduler: str = "scan",
+                 batch_size: int = None):
         """
-        Initializes the Generator with a parser, patterns, and an optional verbosity flag.
+        Initializes the Generator with a parser and patterns.
 
         :param parser: Parser
             The parser structure used for sampling events.
         :param patterns: List[Pattern]
-            A list of patterns used to generate events.
-        :param verbose: bool, optional
-            A flag to enable verbose output for debugging purposes (default is False).
+            A list of patterns used to generate events. Patterns that have not been compiled yet are compiled here.
+        :param scheduler: str, optional
+            The strategy used to select the next event (default is "scan"):
+                - "scan": compares the next events of all patterns at each step.
+                - "heap": keeps the next events in priority queues, ties are broken using the pattern IDs.
+                  This is faster for environments with many boxes.
+        :param batch_size: int, optional
+            When given, refills are served from a buffer of pattern instances sampled batch_size at a time using
+            array operations, which greatly reduces the number of random draws (default is None, sampling each
+            instance separately).
         """
+        assert scheduler in ["scan", "heap"], f"Unknown scheduler {scheduler}, please select \"scan\" or \"heap\"."
         self.parser: Parser = parser
         self.patterns: Dict[(int, Pattern)] = {pattern.id: pattern for pattern in patterns}
-        self.verbose: bool = verbose
+        self.tracer = None
+        for pattern in self.patterns.values():
+            if pattern.program is None:
+                pattern.compile(parser)
+        self.scheduler: str = scheduler
+        self.batch_size: int = batch_size
 
         self.event_stacks = dict()
+        num_signals = max(self.patterns, default=-1) + 1
+        self.satisfied = np.zeros(num_signals, dtype=bool)
+        self.active = np.zeros(num_signals, dtype=bool)
+        self._end_heap = []
+        self._start_heap = []
+        self._versions = dict()
+        self._started = set()
+        self._batches = dict()
+        self._batch_cursors = dict()
+        self._rngs = dict()
+        # fields of the record placed before the events of the first instance of a pattern
+        self._free_record = np.zeros((), dtype=parser.event_dtype).item()
+
+    def seed(self, seed=None):
+        """
+        Gives each pattern its own random stream, spawned from the seed using np.random.SeedSequence, so that
+        patterns are sampled independently of each other and of the global random generators.
+        Pre-sampled batches are discarded so that all following events come from the new streams.
+
+        :param seed: int or np.random.SeedSequence, optional
+            The seed of the streams (default is None, drawing fresh entropy from the system).
+        """
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        pattern_ids = sorted(self.patterns)
+        self._rngs = {pattern_id: np.random.default_rng(child)
+                      for pattern_id, child in zip(pattern_ids, seed.spawn(len(pattern_ids)))}
+        self._batches = dict()
+        self._batch_cursors = dict()
 
     def reset(self):
         """
@@ -69,10 +164,19 @@ class Generator:
         self.event_stacks = dict()
         for pattern in self.patterns.values():
             pattern.reset()
-            generated_stack = self._fill_event_stack(random.uniform(0, pattern.timeout), pattern)
-            self.event_stacks[pattern.id] = generated_stack
+            rng = self._rngs.get(pattern.id)
+            start = random.uniform(0, pattern.timeout) if rng is None else rng.uniform(0, pattern.timeout)
+            self.event_stacks[pattern.id] = self._fill_event_stack(start, pattern)
 
-    def _generate_noise_events(self, pattern_noise, pattern_end, pattern_len):
+        if self.scheduler == "heap":
+            self._end_heap = []
+            self._start_heap = []
+            self._versions = {pattern_id: 0 for pattern_id in self.event_stacks}
+            self._started = set()
+            for pattern_id in self.event_stacks:
+                self._push_next_event(pattern_id)
+
+    def _generate_noise_events(self, pattern_noise, pattern_end, pattern_len, rng=None):
         """
         Generates a list of noise events proportional to the list of normal events for the pattern.
         Ensures noise events are generated before the pattern end time.
@@ -83,90 +187,326 @@ class Generator:
             The end time of the pattern.
         :param pattern_len: int
             The length of the pattern used to track noise to event ratio.
+        :param rng: np.random.Generator, optional
+            The random generator of the pattern (default is None, using the global random generators).
         :return: List[Event]
             A list of noise events.
         """
 
-        noise_list = [self.parser.make_noise(before=pattern_end)
-                      for _ in range(np.random.binomial(pattern_len, pattern_noise))]
+        noise_list = [self.parser.make_noise(before=pattern_end, rng=rng)
+                      for _ in range((np.random if rng is None else rng).binomial(pattern_len, pattern_noise))]
         return noise_list
 
     def _fill_event_stack(self, t, pattern, last_generated_event=None):
         """
         Fills the pattern stack starting at time t with events generated following the pattern's instructions.
-        Events are generated using the parser.
+        Events are generated using the parser and stored as records shifted to t, in one array holding the last
+        generated event, the generated events and the noise events, so that the full pattern is a view of the array.
+        Records are then ordered by a stable sort on end times, which is skipped when there is no noise since
+        generated events are already sorted.
 
         :param t: float
             The start time for generating the pattern.
         :param pattern: Pattern
             The pattern object containing instructions for generating events.
-        :param last_generated_event: Event, optional
-            The last generated event to start from (default is None).
-        :return: List[Event]
-            A list of events sorted by time.
+        :param last_generated_event: np.void, optional
+            The record of the last generated event to start from (default is None).
+        :return: EventStack
+            The stack of the new records sorted by time.
         """
 
-        t = t + pattern.sample_timeout()
+        if self.batch_size:
+            records, num_noise = self._take_batched_instance(t, pattern)
+            if last_generated_event is not None:
+                records[0] = last_generated_event
+        else:
+            rng = self._rngs.get(pattern.id)
+            t = t + pattern.sample_timeout(rng=rng)
 
-        generated_events = self.parser.instantiate_pattern(pattern.instruction)
+            generated_events = self.parser.run_program(pattern.program, rng=rng)
 
-        pattern_end_time = generated_events[-1].end
-        shifted_generated_events = [event.shifted(t) for event in generated_events]
+            pattern_end_time = generated_events[-1].end
+            noise_events = self._generate_noise_events(pattern.noise, pattern_end_time, len(generated_events), rng)
 
-        noise_events = self._generate_noise_events(pattern.noise, pattern_end_time, len(generated_events))
-        shifted_noise_events = [event.shifted(t) for event in noise_events]
+            num_noise = len(noise_events)
+            encode = self.parser.encode_event
+            records = np.array([self._free_record if last_generated_event is None else last_generated_event.item(),
+                                *[encode(event, t, False, pattern.id) for event in generated_events],
+                                *[encode(event, t, True, pattern.id) for event in noise_events]],
+                               dtype=self.parser.event_dtype)
 
-        pattern.full_pattern = [last_generated_event] if last_generated_event else []
-        pattern.full_pattern += shifted_generated_events
+        num_generated = len(records) - 1 - num_noise
+        first = int(last_generated_event is None)
+        pattern.full_pattern = EventStack(records[first:1 + num_generated], self.parser)
 
-        events_stack = sorted(shifted_noise_events + shifted_generated_events)
-        if self.verbose:
-            print(f"Sampling pattern {events_stack}")
+        records = records[1:]
+        if num_noise:
+            records = records[np.argsort(records["end"], kind="stable")]
+        return EventStack(records, self.parser)
 
-        return events_stack
+    def _sample_pattern_batch(self, pattern):
+        """
+        Samples batch_size instances of a pattern at once, following the same steps as _fill_event_stack:
+        a timeout, the events of the pattern program and a number of noise events ending before the pattern end.
+        The sampled events are stored as records, so that instances are taken without building Event objects.
+
+        :param pattern: Pattern
+            The pattern to sample.
+        :return: PatternBatch
+            The sampled instances.
+        """
+        rng = self._rngs.get(pattern.id)
+        events = self.parser.run_program_batch(pattern.program, self.batch_size, rng=rng)
+        pattern_end_times = np.max([event_batch.end for event_batch in events], axis=0)
+        noise_counts = (np.random if rng is None else rng).binomial(len(events), pattern.noise, self.batch_size)
+        noise = self.parser.make_noise_batch(before=np.repeat(pattern_end_times, noise_counts), rng=rng)
+        events = np.stack([self.parser.encode_event_batch(event_batch) for event_batch in events], axis=1)
+        noise = self.parser.encode_event_batch(noise, is_noise=True)
+        events["pattern_id"] = pattern.id
+        noise["pattern_id"] = pattern.id
+        return PatternBatch(events=events,
+                            noise=noise,
+                            noise_counts=noise_counts,
+                            timeouts=pattern.sample_timeout(self.batch_size, rng=rng))
+
+    def _take_batched_instance(self, t, pattern):
+        """
+        Takes the next pre-sampled instance of a pattern, sampling a new batch once the buffer is used up.
+
+        :param t: float
+            The start time for generating the pattern.
+        :param pattern: Pattern
+            The pattern to take an instance of.
+        :return: tuple
+            The records of the instance shifted to start after t, preceded by a free record, and its number of noise
+            events.
+        """
+        cursor = self._batch_cursors.get(pattern.id, 0)
+        if pattern.id not in self._batches or cursor >= len(self._batches[pattern.id]):
+            self._batches[pattern.id] = self._sample_pattern_batch(pattern)
+            cursor = 0
+        self._batch_cursors[pattern.id] = cursor + 1
+        return self._batches[pattern.id].get_instance(cursor, t)
 
     def next_event(self):
         """
         Retrieves the next event to be processed and updates the event stacks.
-        Also generates signals indicating the state of each pattern.
+        Also generates signals indicating the state of each pattern, as two boolean arrays indexed by pattern ID:
+        satisfied marks the pattern that has just been completely played, and active marks the patterns whose next
+        event has started before the end of the retrieved event, as well as the satisfied pattern.
+
+        Note: The signal arrays are the satisfied and active attributes of the generator, overwritten at each call.
 
         :return: tuple
-            A tuple containing the next event and a signal dictionary.
-        """
-        next_event = Event(e_type="Empty", e_attributes={}, t_start=0, t_end=0)
-        signal = dict()
-        if self.event_stacks:
-            pattern_to_sample_id = min(self.event_stacks,
-                                       key=lambda pattern_id: self.event_stacks[pattern_id][0])
-            pattern_to_sample = self.patterns[pattern_to_sample_id]
-            next_event = self.event_stacks[pattern_to_sample_id].pop(0)
-            if not self.event_stacks[pattern_to_sample_id]:
-                signal = {pattern_to_sample_id: ["satisfied", "active"]}
-                self.event_stacks[pattern_to_sample_id] = self._fill_event_stack(next_event.end,
-                                                                                 pattern_to_sample,
-                                                                                 next_event)
+            A tuple containing the next event and the satisfied and active arrays.
+        """
+        if self.scheduler == "heap":
+            return self._heap_next_event()
+        return self._scan_next_event()
+
+    def _scan_next_event(self):
+        """
+        Retrieves the next event by comparing the next events of all patterns.
+        Patterns whose next event has started before the end of the retrieved event are marked active.
+
+        :return: tuple
+            A tuple containing the next event and the satisfied and active arrays.
+        """
+        satisfied = self.satisfied
+        active = self.active
+        satisfied[:] = False
+        active[:] = False
+        if not self.event_stacks:
+            return Event(e_type="Empty", e_attributes={}, t_start=0, t_end=0), satisfied, active
+
+        pattern_to_sample_id = min(self.event_stacks,
+                                   key=lambda pattern_id: self.event_stacks[pattern_id].next_end())
+        next_event, refilled = self._pop_event(pattern_to_sample_id)
+        if refilled:
+            satisfied[pattern_to_sample_id] = True
+            active[pattern_to_sample_id] = True
+        next_event = self.parser.decode_event(next_event)
+        end = next_event.end
         for pattern_id, stack in self.event_stacks.items():
-            if pattern_id != pattern_to_sample:
-                if next_event.end >= stack[0].start:
-                    signal[pattern_id] = signal.get(pattern_id, []) + ["active"]
+            if end >= stack.next_start():
+                active[pattern_id] = True
+
+        return next_event, satisfied, active
+
+    def _heap_next_event(self):
+        """
+        Retrieves the next event using priority queues, giving the same events and signals as the scan scheduler.
+        The event ending first is found in the queue of end times, while a queue of start times keeps track of the
+        patterns whose next event has started. Since the end of retrieved events never decreases, a started pattern
+        stays active until its next event changes.
+        Queue entries of disabled patterns or outdated events are skipped when they reach the top of the queue.
+
+        :return: tuple
+            A tuple containing the next event and the satisfied and active arrays.
+        """
+        satisfied = self.satisfied
+        active = self.active
+        satisfied[:] = False
+        active[:] = False
+        while self._end_heap:
+            _, pattern_id, version = heapq.heappop(self._end_heap)
+            if self._versions.get(pattern_id) == version:
+                break
+        else:
+            return Event(e_type="Empty", e_attributes={}, t_start=0, t_end=0), satisfied, active
+
+        next_event, refilled = self._pop_event(pattern_id)
+        if refilled:
+            satisfied[pattern_id] = True
+            active[pattern_id] = True
+        self._push_next_event(pattern_id)
+        next_event = self.parser.decode_event(next_event)
+
+        while self._start_heap and self._start_heap[0][0] <= next_event.end:
+            _, started_id, version = heapq.heappop(self._start_heap)
+            if self._versions.get(started_id) == version:
+                self._started.add(started_id)
+        for started_id in self._started:
+            active[started_id] = True
+
+        return next_event, satisfied, active
 
-        return next_event, signal
+    def _push_next_event(self, pattern_id: int):
+        """
+        Registers the next event of a pattern in the priority queues, making previous entries of the pattern outdated.
+
+        :param pattern_id: int
+            The ID of the pattern whose next event changed.
+        """
+        version = self._versions[pattern_id] + 1
+        self._versions[pattern_id] = version
+        self._started.discard(pattern_id)
+        stack = self.event_stacks[pattern_id]
+        heapq.heappush(self._end_heap, (stack.next_end(), pattern_id, version))
+        heapq.heappush(self._start_heap, (stack.next_start(), pattern_id, version))
+
+    def _pop_event(self, pattern_id: int):
+        """
+        Removes the next event from a pattern's stack, by moving the cursor of the stack.
+        Once the stack is exhausted the pattern has been fully played, so the stack is refilled starting at the end
+        of the removed event.
+
+        :param pattern_id: int
+            The ID of the pattern to take the event from.
+        :return: tuple
+            The record of the removed event and a flag indicating if the pattern stack was refilled.
+        """
+        stack = self.event_stacks[pattern_id]
+        next_event = stack.pop()
+        if stack:
+            return next_event, False
+        self.event_stacks[pattern_id] = self._fill_event_stack(next_event["end"].item(),
+                                                               self.patterns[pattern_id],
+                                                               next_event)
+        return next_event, True
 
     def disable_timeline(self, pattern_id: int):
         """
         Disables the timeline for a specific pattern by removing its event stack.
+        With the heap scheduler, the queue entries of the pattern are left in place and skipped once they are reached.
 
         :param pattern_id: int
             The ID of the pattern to disable.
         """
         self.event_stacks.pop(pattern_id, None)
+        self._versions.pop(pattern_id, None)
+        self._started.discard(pattern_id)
 
     def get_timeline(self):
         """
         Returns the current timeline of events.
-        Where timeline refers to the next events to be generated.
+        Where timeline refers to the next events to be generated, which are materialized from their records.
 
         :return: List[Event]
             A list of the next events in each pattern's stack.
         """
         return [event_stack[0] for event_stack in self.event_stacks.values()]
+
+    def attach_tracer(self, tracer):
+        """
+        Notifies a tracer of each taken event and sampled pattern instance, by replacing _pop_event and
+        _fill_event_stack on this instance only.
+
+        :param tracer: Tracer
+            The tracer to notify.
+        """
+        self.detach_tracer()
+        self.tracer = tracer
+        self._pop_event = self._traced_pop_event
+        self._fill_event_stack = self._traced_fill_event_stack
+
+    def detach_tracer(self):
+        """
+        Removes the attached tracer and restores the untraced _pop_event and _fill_event_stack.
+        """
+        if self.tracer is None:
+            return
+        del self._pop_event
+        del self._fill_event_stack
+        self.tracer = None
+
+    def get_state(self):
+        """
+        Returns a snapshot of everything that changes during an episode: the remaining event stacks, the scheduler
+        queues, the pre-sampled batches, the state of the random streams and the duration statistics of the parser.
+        Records and batches are never modified once sampled, so the snapshot holds references to them and the cursor
+        of each stack instead of copies.
+
+        Note: Unseeded generators use the global random generators, whose state is not part of the snapshot.
+        Generators must be seeded for a restored snapshot to reproduce the same events.
+
+        :return: dict
+            The snapshot, which can be pickled.
+        """
+        return {"event_stacks": {pattern_id: (stack.events, stack.cursor)
+                                 for pattern_id, stack in self.event_stacks.items()},
+                "full_patterns": {pattern_id: pattern.full_pattern for pattern_id, pattern in self.patterns.items()},
+                "end_heap": list(self._end_heap),
+                "start_heap": list(self._start_heap),
+                "versions": dict(self._versions),
+                "started": frozenset(self._started),
+                "batches": dict(self._batches),
+                "batch_cursors": dict(self._batch_cursors),
+                "rngs": {pattern_id: rng.bit_generator.state for pattern_id, rng in self._rngs.items()},
+                "min_max_durations": dict(self.parser.min_max_durations)}
+
+    def set_state(self, state):
+        """
+        Restores a snapshot returned by get_state, taken on this generator or on one built from the same patterns.
+        The snapshot is left untouched, so that it can be restored several times.
+
+        :param state: dict
+            The snapshot to restore.
+        """
+        self.event_stacks = {pattern_id: EventStack(events, self.parser, cursor)
+                             for pattern_id, (events, cursor) in state["event_stacks"].items()}
+        for pattern_id, full_pattern in state["full_patterns"].items():
+            self.patterns[pattern_id].full_pattern = full_pattern
+        self._end_heap = list(state["end_heap"])
+        self._start_heap = list(state["start_heap"])
+        self._versions = dict(state["versions"])
+        self._started = set(state["started"])
+        self._batches = dict(state["batches"])
+        self._batch_cursors = dict(state["batch_cursors"])
+        self.parser.min_max_durations = dict(state["min_max_durations"])
+        rngs = dict()
+        for pattern_id, rng_state in state["rngs"].items():
+            rng = self._rngs.get(pattern_id) or np.random.default_rng()
+            rng.bit_generator.state = rng_state
+            rngs[pattern_id] = rng
+        self._rngs = rngs
+
+    def _traced_pop_event(self, pattern_id: int):
+        next_event, refilled = Generator._pop_event(self, pattern_id)
+        self.tracer.event_popped(pattern_id, next_event)
+        return next_event, refilled
+
+    def _traced_fill_event_stack(self, t, pattern, last_generated_event=None):
+        events_stack = Generator._fill_event_stack(self, t, pattern, last_generated_event)
+        self.tracer.pattern_sampled(pattern.id, events_stack)
+        return events_stack
@@ -1,18 +1,20 @@
+from openthechests.src.elements.BoxBank import BoxBank
+
 
 class InteractiveBox:
     """
     An openable box that allows interaction.
     It possesses three state indicators: _open, _ready, and active.
     The box is initialized with a pattern which defines how the box changes states.
+    The states are stored in a BoxBank, possibly shared with other boxes, the box being a view on one of its entries.
+    Environments update all boxes at once through the bank, the box methods being kept for single box use.
 
     Attributes:
     -----------
     id : int
         The identifier of the box.
-    verbose : bool
-        A flag to give details during operations.
     state : dict
-        A dictionary representing the current state of the box.
+        A dictionary representing the current state of the box, read from the bank.
     num_deactivations : int
         A counter for the number of times the box has been deactivated.
 
@@ -46,96 +48,96 @@ class InteractiveBox:
     """
     def __init__(self,
                  id: int,
-                 verbose: bool=True):
+                 bank: BoxBank = None,
+                 index=None):
         """
-        Initializes an InteractiveBox with the given ID and verbosity flag.
+        Initializes an InteractiveBox with the given ID.
+        State changes can be followed by attaching a Tracer to the environment.
 
         :param id: int
             The identifier of the box.
-        :param verbose: bool
-            A flag to give details during operations.
+        :param bank: BoxBank, optional
+            The bank storing the box state (default is None, creating a bank for this box only).
+        :param index: int or tuple, optional
+            The index of the box in the bank arrays (default is the box ID, or 0 for a bank created for this box).
         """
         self.id = id
-        self.verbose = verbose
-        self.state = {"_open": False, "_ready": False, "active": False}
-        self.num_deactivations = 0
+        if bank is None:
+            bank = BoxBank(num_boxes=1)
+            index = 0
+        self._bank = bank
+        self._index = id if index is None else index
+
+    @property
+    def state(self):
+        return {"_open": self.is_open(), "_ready": self.is_ready(), "active": self.is_active()}
+
+    @property
+    def num_deactivations(self):
+        return int(self._bank.num_deactivations[self._index])
 
     def get_state(self):
         return self.state
 
     def is_ready(self):
-        return self.state["_ready"]
+        return bool(self._bank.ready[self._index])
 
     def is_open(self):
-        return self.state["_open"]
+        return bool(self._bank.open[self._index])
 
     def is_active(self):
-        return self.state["active"]
+        return bool(self._bank.active[self._index])
+
+    def _set_state(self, active, ready, open):
+        self._bank.active[self._index] = active
+        self._bank.ready[self._index] = ready
+        self._bank.open[self._index] = open
 
     def reset(self):
         """
         Resets the box to its initial conditions, not opened, not _ready, and active,
         and regenerates its event stack starting at a selected time.
         """
-        self.state = {"_open": False, "_ready": False, "active": False}
-        self.num_deactivations = 0
+        self._set_state(active=False, ready=False, open=False)
+        self._bank.num_deactivations[self._index] = 0
 
     def _open(self):
         """
         Opens the box, deactivates it once it is opened, and marks it as not _ready.
         """
-        assert self.state["active"], "Cannot _open a deactivated box."
-        assert self.state["_ready"], "Cannot _open a box if it isn't _ready first."
+        assert self.is_active(), "Cannot _open a deactivated box."
+        assert self.is_ready(), "Cannot _open a box if it isn't _ready first."
 
-        if self.verbose:
-            print(f"Opening box {self.id}")
-        self.state["_open"] = True
-        self.state["_ready"] = False
-        self.state["active"] = False
+        self._set_state(active=False, ready=False, open=True)
 
     def _activate(self):
         """
         Activates the box, marking it as not _ready and not _open.
         """
-        assert not self.state["_open"], "Cannot _activate an opened box."
-        assert not self.state["_ready"], "Newly activated boxes shouldn't be _ready."
-        assert not self.state["active"], "Trying to _activate a box that is already active."
+        assert not self.is_open(), "Cannot _activate an opened box."
+        assert not self.is_ready(), "Newly activated boxes shouldn't be _ready."
+        assert not self.is_active(), "Trying to _activate a box that is already active."
 
-        if self.verbose:
-            print(f"Activating box {self.id}")
-
-        self.state["active"] = True
-        self.state["_ready"] = False
-        self.state["_open"] = False
+        self._set_state(active=True, ready=False, open=False)
 
     def _deactivate(self):
         """
         Deactivates box, marking it as not _ready and not _open
         """
 
-        assert not self.state["_open"], "Cannot _deactivate an opened box."
-        assert self.state["active"], "A box must first be active to _deactivate it.."
-
-        if self.verbose:
-            print(f"Deactivating box {self.id}")
+        assert not self.is_open(), "Cannot _deactivate an opened box."
+        assert self.is_active(), "A box must first be active to _deactivate it.."
 
-        self.num_deactivations += 1
-        self.state["active"] = False
-        self.state["_ready"] = False
-        self.state["_open"] = False
+        self._bank.num_deactivations[self._index] += 1
+        self._set_state(active=False, ready=False, open=False)
 
     def _ready(self):
         """
         Makes box _ready to _open, removing its active status
         """
-        assert self.state["active"], "Deactivated box cannot be _ready."
-
-        if self.verbose:
-            print(f"Ready box {self.id}")
+        assert self.is_active(), "Deactivated box cannot be _ready."
 
-        self.state["active"] = True
-        self.state["_ready"] = True
-        self.state["_open"] = False
+        self._set_state(active=True, ready=True, open=False)
 
     def press_button(self):
         """
@@ -145,8 +147,8 @@ class InteractiveBox:
         :return: bool
             True if the box is successfully opened, False otherwise.
         """
-        if not self.state["_open"]:  # if the box has not been opened already
-            if self.state["active"] and self.state["_ready"]:  # if the box is active and _ready to _open
+        if not self.is_open():  # if the box has not been opened already
+            if self.is_active() and self.is_ready():  # if the box is active and _ready to _open
                 self._open()
                 return True
         return False  # in all other cases return false
@@ -181,12 +183,12 @@ class InteractiveBox:
         if signal is None:
             signal = []
 
-        if not self.state["_open"]:
-            if self.state["active"]:
+        if not self.is_open():
+            if self.is_active():
                 # if the box has been _ready it should be timed out
-                if self.state["_ready"]:
+                if self.is_ready():
                     self._deactivate()
-            if not self.state["active"]:
+            if not self.is_active():
                 if "active" in signal:
                     self._activate()
             # otherwise, check if pattern has been satisfied
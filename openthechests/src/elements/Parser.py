@@ -2,7 +2,11 @@ import copy
 import random
 from typing import List
 
+import numpy as np
+
 from openthechests.src.elements.Event import Event
+from openthechests.src.elements.EventBatch import EventBatch
+from openthechests.src.elements.Program import Program, INSTANTIATE, RELATE
 from openthechests.src.utils import helper_functions
 from openthechests.src.utils.allen import allen_functions
 
@@ -19,6 +23,8 @@ class Parser:
         It is defined using the set of all preexistent types and attributes.
         Is main goal is the sampling of events on the basis of instructions.
         It also allows to _labelise events, generate noise events when needed, keep statistics on events lengths.
+        Sampling methods draw from the np.random.Generator given as rng, or from the global random generators when
+        rng is None, so that a parser can be shared by environments using their own random streams.
 
         :param all_event_types: List of all possible event types to be used for event generation
         :param all_event_attributes: Dictionary of all attributes and their associated possible values
@@ -42,55 +48,243 @@ class Parser:
             else:
                 self.all_attributes[key] = value
 
+        # integer codes of types and attribute values, the code of a value is its first index in the lists above
+        self.type_codes = dict()
+        for code, e_type in enumerate(self.all_types):
+            self.type_codes.setdefault(e_type, code)
+        self.attribute_codes = {key: dict() for key in self.all_attributes}
+        for key, values in self.all_attributes.items():
+            for code, value in enumerate(values):
+                self.attribute_codes[key].setdefault(value, code)
+        self._event_type_codes = [self.type_codes[e_type] for e_type in all_event_types]
+        self._noise_type_codes = [self.type_codes[e_type] for e_type in all_noise_types]
+        self._noise_attribute_codes = {key: [self.attribute_codes[key][value] for value in values]
+                                       for key, values in all_noise_attributes.items()}
+        # records of the event stacks of generators, missing attributes and unknown patterns are coded with -1
+        self.event_dtype = np.dtype([("start", np.float64),
+                                     ("end", np.float64),
+                                     ("type_code", np.int16),
+                                     *[(f"attr/{attr}", np.int16) for attr in self.all_attributes],
+                                     ("is_noise", np.bool_),
+                                     ("pattern_id", np.int16)])
+        self._attribute_items = list(self.all_attributes.items())
+
+    def copy(self):
+        """
+        Returns a parser sharing the types, attributes and lookup tables of this one, with its own statistics on
+        event durations, so that environments sharing compiled patterns draw unspecified durations independently.
+
+        :return: The new parser.
+        """
+        parser = copy.copy(self)
+        parser.min_max_durations = dict(self.min_max_durations)
+        return parser
+
+    def label(self, event: Event) -> tuple:
+        """
+        Gives the integer codes of the type and attributes of an event.
+        Events generated by the parser already carry their codes, other events are encoded using lookup tables.
+
+        :param event: The event to encode.
+        :return: A tuple (type_code, {'attribute_name': value_code}).
+        """
+        if event.codes is not None:
+            return event.codes
+        return self.type_codes[event.type], \
+            {key: self.attribute_codes[key][value] for key, value in event.attributes.items()}
+
+    def encode_event(self, event: Event, delta: float = 0, is_noise: bool = False, pattern_id: int = -1) -> tuple:
+        """
+        Gives the record of an event as a tuple of the fields of event_dtype.
+
+        :param event: The event to encode.
+        :param delta: The value by which to shift the event.
+        :param is_noise: Flag marking the event as a noise event.
+        :param pattern_id: The ID of the pattern the event is taken from.
+        :return: The fields of the record.
+        """
+        type_code, attribute_codes = self.label(event)
+        return (event.start + delta, event.end + delta, type_code,
+                *[attribute_codes.get(attr, -1) for attr in self.all_attributes],
+                is_noise, pattern_id)
+
+    def encode_event_batch(self, batch: EventBatch, is_noise: bool = False) -> np.ndarray:
+        """
+        Turns a batch of events into records of event_dtype, with the pattern ID left to -1.
+
+        :param batch: The batch to encode, whose codes are either shared or given per instance.
+        :param is_noise: Flag marking all events as noise events.
+        :return: Structured array holding one record per instance.
+        """
+        records = np.empty(len(batch), dtype=self.event_dtype)
+        records["start"] = batch.start
+        records["end"] = batch.end
+        if isinstance(batch.codes, list):
+            records["type_code"] = [type_code for type_code, _ in batch.codes]
+            for attr in self.all_attributes:
+                records[f"attr/{attr}"] = [attribute_codes.get(attr, -1) for _, attribute_codes in batch.codes]
+        else:
+            type_code, attribute_codes = batch.codes
+            records["type_code"] = type_code
+            for attr in self.all_attributes:
+                records[f"attr/{attr}"] = attribute_codes.get(attr, -1)
+        records["is_noise"] = is_noise
+        records["pattern_id"] = -1
+        return records
+
+    def decode_event(self, record) -> Event:
+        """
+        Materializes the event stored in a record of event_dtype.
+
+        :param record: The record of the event.
+        :return: The event, carrying its integer codes.
+        """
+        start, end, type_code, *codes, _, _ = record.item()
+        attributes = dict()
+        attribute_codes = dict()
+        for (attr, attr_values), code in zip(self._attribute_items, codes):
+            if code >= 0:
+                attributes[attr] = attr_values[code]
+                attribute_codes[attr] = code
+        return Event(self.all_types[type_code], attributes, start, end, codes=(type_code, attribute_codes))
+
     def event_to_labelled(self, event: Event) -> Event:
-        label_e_type = self.all_types.index(event.type)
-        label_attributes = {key: self.all_attributes[key].index(value) for key, value in event.attributes.items()}
+        label_e_type, label_attributes = self.label(event)
         return Event(label_e_type, label_attributes, event.start, event.end)
 
     def labelled_to_event(self, event: Event) -> Event:
         e_type = self.all_types[event.type]
         attributes = {key: self.all_attributes[key][value] for key, value in event.attributes.items()}
-        return Event(e_type, attributes, event.start, event.end)
+        return Event(e_type, attributes, event.start, event.end, codes=(event.type, event.attributes))
 
-    def make_noise(self, before: float) -> Event:
+    def make_noise(self, before: float, rng=None) -> Event:
         """
         Generate a random noise event ending before a certain date.
         The types and attributes of this event are taken from the sets given at class initialisation
 
         :param before: Time before which the noise should be generated.
+        :param rng: The random generator to draw from.
         :return: The defined noise event.
         """
-        t1, t2 = random.uniform(0, before), random.uniform(0, before)
+        if rng is None:
+            t1, t2 = random.uniform(0, before), random.uniform(0, before)
+            randrange = random.randrange
+        else:
+            t1, t2 = rng.uniform(0, before, 2).tolist()
+            randrange = rng.integers
         start, end = min(t1, t2), max(t1, t2)
-        e_type = random.choice(self.all_noise_types)
+        type_idx = randrange(len(self.all_noise_types))
         attributes = dict()
+        attribute_codes = dict()
         for attr, attr_values in self.all_noise_attributes.items():
-            if attr not in attributes:
-                attributes[attr] = random.choice(attr_values)
-        return Event(e_type, attributes, start, end)
+            idx = randrange(len(attr_values))
+            attributes[attr] = attr_values[idx]
+            attribute_codes[attr] = self._noise_attribute_codes[attr][idx]
+        return Event(self.all_noise_types[type_idx], attributes, start, end,
+                     codes=(self._noise_type_codes[type_idx], attribute_codes))
 
     def instantiate_pattern(self, instructions: List[dict]) -> List[Event]:
         """
         Generated a pattern of events using a dictionary of commands following a particular format.
         To see exact format refer to examples.instructions.
+        Patterns instantiated many times should be compiled once using compile_instructions and then run using
+        run_program.
 
         :param instructions: The dictionary of commands.
         :return: A list of events that follows the selected instructions.
         """
-        variables = dict()
+        return self.run_program(self.compile_instructions(instructions))
+
+    def compile_instructions(self, instructions: List[dict]) -> Program:
+        """
+        Validates a list of instructions and transforms it into a program that can be executed using run_program.
+        Event types and attributes are checked, durations are recorded, Allen commands are resolved into functions
+        and variable names are replaced by slot indices.
+
+        :param instructions: The dictionary of commands.
+        :return: The compiled program.
+        """
+        slots = dict()
+        steps = []
         for instr_line in instructions:
             if instr_line["command"] == "instantiate":
-                event = self._make_event(*instr_line["parameters"])
-                variables[instr_line["variable_name"]] = event
+                step = self._compile_instantiate(*instr_line["parameters"])
             elif instr_line["command"] in allen_functions.keys():
-                events = (variables[var_name] for var_name in instr_line["parameters"])
-                allen_op = instr_line["command"]
+                for var_name in instr_line["parameters"]:
+                    if var_name not in slots:
+                        raise ValueError("Unknown variable " + str(var_name) + " used by " +
+                                         str(instr_line["command"]) + " before being instantiated")
                 bonus_params = instr_line["other"] if "other" in instr_line else dict()
-                event = allen_functions[allen_op](*events, **bonus_params)
-                variables[instr_line["variable_name"]] = event
+                step = (RELATE,
+                        allen_functions[instr_line["command"]],
+                        tuple(slots[var_name] for var_name in instr_line["parameters"]),
+                        bonus_params)
             else:
                 raise ValueError("Unknown allen command: " + str(instr_line["command"]))
-        return sorted(variables.values())
+            slot = slots.setdefault(instr_line["variable_name"], len(slots))
+            steps.append((step[0], slot) + step[1:])
+        return Program(variable_names=list(slots), steps=steps)
+
+    def run_program(self, program: Program, rng=None) -> List[Event]:
+        """
+        Generates a pattern of events by executing a compiled program.
+
+        :param program: The program produced by compile_instructions.
+        :param rng: The random generator to draw from.
+        :return: A list of events sorted by end time that follows the program instructions.
+        """
+        variables = [None] * program.get_num_slots()
+        for step in program.steps:
+            if step[0] == INSTANTIATE:
+                variables[step[1]] = self._instantiate(*step[2:], rng=rng)
+            else:
+                _, slot, allen_function, argument_slots, bonus_params = step
+                variables[slot] = allen_function(*[variables[arg] for arg in argument_slots], **bonus_params,
+                                                 rng=rng)
+        return sorted(variables)
+
+    def run_program_batch(self, program: Program, size: int, rng=None) -> List[EventBatch]:
+        """
+        Generates several instances of a pattern at once by executing a compiled program on batches of events.
+        Durations, types, attributes and Allen relations are drawn as arrays holding one value per instance.
+
+        :param program: The program produced by compile_instructions.
+        :param size: The number of instances to generate.
+        :param rng: The random generator to draw from.
+        :return: One batch of events per program variable, in slot order.
+        """
+        variables = [None] * program.get_num_slots()
+        for step in program.steps:
+            if step[0] == INSTANTIATE:
+                variables[step[1]] = self._instantiate_batch(*step[2:], size=size, rng=rng)
+            else:
+                _, slot, allen_function, argument_slots, bonus_params = step
+                variables[slot] = allen_function(*[variables[arg] for arg in argument_slots], **bonus_params,
+                                                 rng=rng)
+        return variables
+
+    def make_noise_batch(self, before: np.ndarray, rng=None) -> EventBatch:
+        """
+        Generate random noise events, each one ending before its own date.
+
+        :param before: Array of times before which each noise event should be generated.
+        :param rng: The random generator to draw from.
+        :return: The batch of noise events, with one type and attribute dictionary per event.
+        """
+        randint = np.random.randint if rng is None else rng.integers
+        uniform = np.random.uniform if rng is None else rng.uniform
+        t1, t2 = uniform(0, before), uniform(0, before)
+        type_indices = randint(len(self.all_noise_types), size=len(before))
+        e_types = [self.all_noise_types[idx] for idx in type_indices]
+        attributes = [dict() for _ in range(len(before))]
+        codes = [(self._noise_type_codes[idx], dict()) for idx in type_indices]
+        for attr, attr_values in self.all_noise_attributes.items():
+            value_codes = self._noise_attribute_codes[attr]
+            for event_attributes, event_codes, idx in zip(attributes, codes,
+                                                          randint(len(attr_values), size=len(before))):
+                event_attributes[attr] = attr_values[idx]
+                event_codes[1][attr] = value_codes[idx]
+        return EventBatch(e_types, attributes, np.minimum(t1, t2), np.maximum(t1, t2), codes)
 
     def _make_event(self, e_type: str = None,
                     attributes: dict = None,
@@ -106,24 +300,117 @@ class Parser:
                             for the event using a truncated normal distribution.
         :return: An event with the selected type, attributes and duration.
         """
-        self._check_event_values(e_type=e_type,
-                                 attributes=attributes)
-        if e_type is None:
-            e_type = random.choice(self.all_event_types)
+        return self._instantiate(*self._compile_instantiate(e_type, attributes, duration_distribution)[1:])
+
+    def _compile_instantiate(self, e_type: str = None,
+                             attributes: dict = None,
+                             duration_distribution: dict = None) -> tuple:
+        """
+        Validates the parameters of an event and encodes its attributes.
+        Attributes that are not specified are listed with their possible values and codes to be drawn at
+        instantiation.
 
+        :param e_type: The type of the event. Eiter None or value belonging to @self.all_event_types.
+        :param attributes: Dictionary of attributes.
+                            Either empty or filled with values corresponding to @all_event_attributes.
+        :param duration_distribution: A dictionary {"mu": mu, "sigma": sigma} used to draw a random duration
+                            for the event using a truncated normal distribution.
+        :return: The instantiation step without its slot.
+        """
         if attributes is None:
             attributes = dict()
-        for attr, attr_values in self.all_event_attributes.items():
-            if attr not in attributes:
-                attributes[attr] = random.choice(attr_values)
+        self._check_event_values(e_type=e_type,
+                                 attributes=attributes)
+        attribute_codes = {attr: self.attribute_codes[attr][value] for attr, value in attributes.items()}
+        random_attributes = tuple((attr, attr_values, [self.attribute_codes[attr][value] for value in attr_values])
+                                  for attr, attr_values in self.all_event_attributes.items()
+                                  if attr not in attributes)
 
+        duration = None
         if duration_distribution is not None:
-            self._record_duration(duration_distribution["mu"])
+            assert duration_distribution["mu"] - duration_distribution["sigma"] >= 0, "Allows negative _time durations"
+            duration = (duration_distribution["mu"], duration_distribution["sigma"])
+
+        return INSTANTIATE, e_type, dict(attributes), attribute_codes, random_attributes, duration
+
+    def _instantiate(self, e_type, attributes, attribute_codes, random_attributes, duration, rng=None) -> Event:
+        """
+        Instantiates an event from validated parameters, drawing its unspecified type, attributes and duration.
+
+        :param e_type: The type of the event, or None to draw it at random.
+        :param attributes: Dictionary of fixed attributes, shared by all instantiated events.
+        :param attribute_codes: Dictionary of the codes of the fixed attributes.
+        :param random_attributes: Tuple of (attribute name, possible values, value codes) to draw for each event.
+        :param duration: A tuple (mu, sigma) used to draw the duration, or None to use a random distribution.
+        :param rng: The random generator to draw from.
+        :return: An event with the selected type, attributes and duration.
+        """
+        randrange = random.randrange if rng is None else rng.integers
+        if e_type is None:
+            e_type = random.choice(self.all_event_types) if rng is None \
+                else self.all_event_types[rng.integers(len(self.all_event_types))]
+
+        if random_attributes:
+            attributes = dict(attributes)
+            attribute_codes = dict(attribute_codes)
+            for attr, attr_values, value_codes in random_attributes:
+                idx = randrange(len(attr_values))
+                attributes[attr] = attr_values[idx]
+                attribute_codes[attr] = value_codes[idx]
+
+        if duration is None:
+            duration_instance = helper_functions.my_normal(**self._get_random_duration_dist(), rng=rng)
+        else:
+            self._record_duration(duration[0])
+            duration_instance = helper_functions.my_normal(*duration, rng=rng)
+
+        return Event(e_type, attributes, 0, duration_instance, codes=(self.type_codes[e_type], attribute_codes))
+
+    def _instantiate_batch(self, e_type, attributes, attribute_codes, random_attributes, duration,
+                           size, rng=None) -> EventBatch:
+        """
+        Instantiates several events from validated parameters, drawing their unspecified type, attributes and duration.
+
+        :param e_type: The type of the events, or None to draw it at random for each event.
+        :param attributes: Dictionary of fixed attributes, shared by all instantiated events.
+        :param attribute_codes: Dictionary of the codes of the fixed attributes.
+        :param random_attributes: Tuple of (attribute name, possible values, value codes) to draw for each event.
+        :param duration: A tuple (mu, sigma) used to draw the durations, or None to use a random distribution.
+        :param size: The number of events to instantiate.
+        :param rng: The random generator to draw from.
+        :return: The batch of instantiated events.
+        """
+        randint = np.random.randint if rng is None else rng.integers
+        if e_type is None:
+            type_indices = randint(len(self.all_event_types), size=size)
+            e_type = [self.all_event_types[idx] for idx in type_indices]
+            type_code = [self._event_type_codes[idx] for idx in type_indices]
+        else:
+            type_code = self.type_codes[e_type]
+
+        if random_attributes:
+            attributes = [dict(attributes) for _ in range(size)]
+            attribute_codes = [dict(attribute_codes) for _ in range(size)]
+            for attr, attr_values, value_codes in random_attributes:
+                for event_attributes, event_codes, idx in zip(attributes, attribute_codes,
+                                                              randint(len(attr_values), size=size)):
+                    event_attributes[attr] = attr_values[idx]
+                    event_codes[attr] = value_codes[idx]
+
+        if isinstance(type_code, list) or isinstance(attribute_codes, list):
+            codes = [(type_code[idx] if isinstance(type_code, list) else type_code,
+                      attribute_codes[idx] if isinstance(attribute_codes, list) else attribute_codes)
+                     for idx in range(size)]
+        else:
+            codes = (type_code, attribute_codes)
+
+        if duration is None:
+            durations = helper_functions.my_normal(**self._get_random_duration_dist(), size=size, rng=rng)
         else:
-            duration_distribution = self._get_random_duration_dist()
-        duration_instance = helper_functions.my_normal(**duration_distribution)
+            self._record_duration(duration[0])
+            durations = helper_functions.my_normal(*duration, size=size, rng=rng)
 
-        return Event(e_type, attributes, 0, duration_instance)
+        return EventBatch(e_type, attributes, np.zeros(size), durations, codes)
 
     def _check_event_values(self, e_type: str, attributes: dict):
         assert (e_type is None) or e_type in self.all_event_types, \
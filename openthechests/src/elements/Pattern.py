@@ -1,6 +1,8 @@
 import random
 from typing import List, Dict
 
+import numpy as np
+
 
 class Pattern:
     """
@@ -17,13 +19,20 @@ class Pattern:
         The noise value extracted from the instruction, indicating the noise level for events.
     instruction : List[Dict]
         The list of instructions to generate the stack of events, excluding 'delay' and 'noise' commands.
-    full_pattern : List
-        A list used for GUI purposes to print the full pattern of events.
+    program : Program
+        The compiled form of the instructions, used by the generator to instantiate the pattern.
+    full_pattern : EventStack or List
+        The events of the last sampled instance, preceded by the last event of the previous instance if any, used for
+        GUI purposes to print the full pattern of events. Empty list until an instance is sampled.
 
     Methods:
     --------
-    sample_timeout():
+    compile(parser):
+        Validates the instructions and compiles them into a program using the parser.
+    sample_timeout(size=None, rng=None):
         Returns a random value uniformly sampled between 0 and the timeout.
+    copy():
+        Returns a new pattern sharing the instructions and the compiled program, with its own full pattern.
     reset():
         Resets the pattern and all related information.
     get_timeout():
@@ -34,7 +43,8 @@ class Pattern:
 
     def __init__(self,
                  instruction: List[Dict],
-                 id: int):
+                 id: int,
+                 parser=None):
         """
         Initializes a Pattern object with the given instructions and ID.
         This pattern will be used for generating events in the environment.
@@ -43,6 +53,8 @@ class Pattern:
             The list of instructions used to generate the stack of events.
         :param id: int
             The unique identifier of the pattern.
+        :param parser: Parser, optional
+            The parser used to compile the instructions. If not given, the pattern is compiled by the generator using it.
         """
         self.id = id
 
@@ -59,15 +71,49 @@ class Pattern:
         # used for GUI only to print full patterns
         self.full_pattern = []
 
-    def sample_timeout(self):
+        self.program = None
+        if parser is not None:
+            self.compile(parser)
+
+    def compile(self, parser):
+        """
+        Validates the instructions and compiles them into a program, so that refills only execute the program.
+
+        :param parser: Parser
+            The parser defining all possible event types and attributes.
+        """
+        self.program = parser.compile_instructions(self.instruction)
+
+    def sample_timeout(self, size=None, rng=None):
         """
         Returns a random value uniformly sampled between 0 and the timeout.
 
-        :return: float
-            A random value between 0 and the timeout.
+        :param size: int, optional
+            Number of values to sample at once (default is None, sampling a single value).
+        :param rng: np.random.Generator, optional
+            The random generator to draw from (default is None, using the global random generators).
+        :return: float or np.ndarray
+            A random value between 0 and the timeout, or an array of values when size is given.
         """
+        if rng is not None:
+            return rng.uniform(0, self.timeout, size)
+        if size is not None:
+            return np.random.uniform(0, self.timeout, size)
         return random.uniform(0, self.timeout)
 
+    def copy(self):
+        """
+        Returns a new pattern sharing the instructions and the compiled program, so that several generators can sample
+        the same pattern without compiling it again, each tracking its own full pattern.
+
+        :return: Pattern
+            The new pattern, with an empty full pattern.
+        """
+        pattern = Pattern.__new__(Pattern)
+        pattern.__dict__.update(self.__dict__)
+        pattern.full_pattern = []
+        return pattern
+
     def reset(self):
         """
         Reset pattern and all related information.
@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class PatternBatch:
+    """
+    Several instances of a pattern sampled together, used by the generator to serve refills of the pattern stack.
+    Each instance contains the events generated by the pattern program, its noise events and its timeout, stored as
+    records of Parser.event_dtype in one contiguous block per instance, so that an instance is taken with one copy.
+
+    Attributes:
+    -----------
+    records : np.ndarray
+        The records of all instances, one instance after the other. The block of each instance starts with a free
+        record, left for the last event of the previous instance, followed by its generated events sorted by end time
+        and by its noise events.
+    offsets : np.ndarray
+        The block of instance i is found between offsets[i] and offsets[i + 1].
+    noise_counts : np.ndarray
+        The number of noise events of each instance.
+    timeouts : np.ndarray
+        The timeout sampled for each instance.
+
+    Methods:
+    --------
+    get_instance(idx, t):
+        Returns the block of one instance starting at time t.
+    """
+    def __init__(self,
+                 events: np.ndarray,
+                 noise: np.ndarray,
+                 noise_counts: np.ndarray,
+                 timeouts: np.ndarray):
+        """
+        Initializes a batch of pattern instances.
+
+        :param events: np.ndarray
+            Records of shape (batch size, number of program variables), holding the event of each variable in each
+            instance.
+        :param noise: np.ndarray
+            The records of the noise events of all instances, stored one instance after the other.
+        :param noise_counts: np.ndarray
+            The number of noise events of each instance.
+        :param timeouts: np.ndarray
+            The timeout sampled for each instance.
+        """
+        num_variables = events.shape[1]
+        events = np.take_along_axis(events, np.argsort(events["end"], axis=1, kind="stable"), axis=1)
+        self.offsets = np.concatenate([[0], np.cumsum(noise_counts + num_variables + 1)])
+        self.noise_counts = noise_counts
+        self.timeouts = timeouts
+
+        self.records = np.zeros(self.offsets[-1], dtype=events.dtype)
+        starts = self.offsets[:-1]
+        self.records[((starts + 1)[:, None] + np.arange(num_variables)).ravel()] = events.ravel()
+        noise_starts = np.concatenate([[0], np.cumsum(noise_counts)[:-1]])
+        self.records[np.repeat(starts + 1 + num_variables - noise_starts, noise_counts) + np.arange(len(noise))] = noise
+
+    def __len__(self):
+        return len(self.timeouts)
+
+    def get_instance(self, idx, t):
+        """
+        Returns the block of one instance, shifted so that the instance starts after its timeout following t.
+
+        :param idx: int
+            The index of the instance.
+        :param t: float
+            The time after which the instance starts.
+        :return: tuple
+            A copy of the block of the instance, whose first record is free, and the number of noise events.
+        """
+        delta = t + float(self.timeouts[idx])
+        records = self.records[self.offsets[idx]:self.offsets[idx + 1]].copy()
+        records["start"] += delta
+        records["end"] += delta
+        return records, int(self.noise_counts[idx])
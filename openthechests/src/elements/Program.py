@@ -0,0 +1,57 @@
+from typing import List
+
+# operation codes of the program steps
+INSTANTIATE = 0
+RELATE = 1
+
+
+class Program:
+    """
+    Validated and precompiled form of a pattern instruction list, produced by Parser.compile_instructions.
+    Variables are replaced by slot indices and Allen commands by the corresponding functions, so that the pattern can
+    be instantiated many times without interpreting the instructions again.
+
+    Steps are tuples of one of the following forms:
+        - (INSTANTIATE, slot, e_type, attributes, attribute_codes, random_attributes, duration_distribution)
+          where e_type is None when the type should be drawn at random, attributes is the dictionary of fixed
+          attributes and attribute_codes their integer codes, random_attributes is a tuple of
+          (attribute name, possible values, value codes) to draw from and duration_distribution is a (mu, sigma)
+          tuple or None to use a random distribution.
+        - (RELATE, slot, allen_function, argument_slots, other_parameters)
+
+    Attributes:
+    -----------
+    variable_names : List[str]
+        The name of the variable stored in each slot, in order of first assignment.
+    steps : List[tuple]
+        The list of steps to execute to instantiate the pattern.
+
+    Methods:
+    --------
+    get_num_slots():
+        Returns the number of variables of the program.
+    """
+    __slots__ = ("variable_names", "steps")
+
+    def __init__(self,
+                 variable_names: List[str],
+                 steps: List[tuple]):
+        """
+        Initializes a program with its variables and steps.
+
+        :param variable_names: List[str]
+            The name of the variable stored in each slot.
+        :param steps: List[tuple]
+            The list of steps to execute to instantiate the pattern.
+        """
+        self.variable_names = variable_names
+        self.steps = steps
+
+    def get_num_slots(self):
+        return len(self.variable_names)
+
+    def __str__(self):
+        return f"Program('variables': {self.variable_names}, 'steps': {len(self.steps)})"
+
+    def __repr__(self):
+        return str(self)
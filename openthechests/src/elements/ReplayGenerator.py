@@ -0,0 +1,151 @@
+from typing import List
+
+from openthechests.src.elements.Event import Event
+from openthechests.src.elements.Generator import Generator
+from openthechests.src.elements.Parser import Parser
+from openthechests.src.elements.Pattern import Pattern
+from openthechests.src.utils.event_log import EventLog
+
+
+class ReplayGenerator(Generator):
+    """
+    A generator replaying the events and signals of an event log recorded with EventLogRecorder, without sampling.
+    Each reset starts the next recorded episode, whose rows are then returned one by one by next_event. The log is
+    memory-mapped, so that only the replayed rows are read.
+
+    When the actions of the recording are replayed, the environment goes through the same states as during the
+    recording. With other actions, the events of disabled timelines are skipped, and an "Empty" event is returned
+    once all rows of the episode have been used, as done by the Generator once all timelines are disabled.
+
+    Attributes:
+    -----------
+    event_log : EventLog
+        The replayed event log.
+    next_episode : int
+        The index of the episode started by the next reset.
+
+    Hidden Attributes:
+    ------------------
+    _row : int
+        The index of the next row to replay.
+    _end : int
+        The index following the last row of the current episode.
+    _disabled : set
+        IDs of the patterns whose timeline has been disabled.
+
+    Methods:
+    --------
+    seek(episode):
+        Selects the episode started by the next reset.
+    seed(seed=None):
+        Does nothing, replays being deterministic.
+    reset():
+        Starts replaying the next episode.
+    next_event():
+        Returns the next recorded event and the recorded signals.
+    disable_timeline(pattern_id: int):
+        Skips the following events of a pattern.
+    get_timeline():
+        Returns the next recorded event of each pattern in the current episode.
+    get_state():
+        Returns the position of the replay.
+    set_state(state):
+        Restores a position returned by get_state.
+    """
+    def __init__(self,
+                 event_log: EventLog,
+                 parser: Parser,
+                 patterns: List[Pattern]):
+        """
+        Initializes the replay from the first recorded episode.
+
+        :param event_log: EventLog
+            The event log to replay, recorded from an environment with the same boxes.
+        :param parser: Parser
+            The parser of the environment.
+        :param patterns: List[Pattern]
+            The patterns of the environment, which define the size of the signal arrays.
+        """
+        super().__init__(parser=parser, patterns=patterns)
+        assert event_log.num_patterns == len(self.satisfied), \
+            f"Got an event log of {event_log.num_patterns} patterns while patterns are {len(self.satisfied)}."
+        self.event_log = event_log
+        self.next_episode = 0
+        self._row = 0
+        self._end = 0
+        self._disabled = set()
+
+    def seek(self, episode: int):
+        self.next_episode = episode
+
+    def seed(self, seed=None):
+        pass
+
+    def reset(self):
+        """
+        Starts replaying the next episode of the event log.
+        """
+        assert self.next_episode < len(self.event_log.episode_starts), \
+            f"The event log only holds {len(self.event_log.episode_starts)} episodes."
+        self._row, self._end = self.event_log.get_episode(self.next_episode)
+        self.next_episode += 1
+        self._disabled = set()
+
+    def next_event(self):
+        """
+        Returns the next recorded event of the current episode, skipping the events of disabled timelines.
+        The signal arrays are the recorded ones, which only differ from the ones of the recording when the replayed
+        actions differ.
+
+        :return: tuple
+            A tuple containing the next event and the satisfied and active arrays.
+        """
+        patterns = self.event_log.columns["pattern"]
+        while self._row < self._end:
+            row = self._row
+            self._row += 1
+            if int(patterns[row]) in self._disabled:
+                continue
+            event = self.event_log.get_event(row)
+            if event is None:
+                break
+            self.satisfied[:], self.active[:] = self.event_log.get_signals(row)
+            return event, self.satisfied, self.active
+
+        self.satisfied[:] = False
+        self.active[:] = False
+        return Event(e_type="Empty", e_attributes={}, t_start=0, t_end=0), self.satisfied, self.active
+
+    def disable_timeline(self, pattern_id: int):
+        self._disabled.add(pattern_id)
+
+    def get_timeline(self):
+        """
+        Returns the next recorded event of each enabled pattern in the current episode.
+
+        :return: List[Event]
+            A list of the next events of the patterns.
+        """
+        patterns = self.event_log.columns["pattern"]
+        remaining = set(self.patterns) - self._disabled
+        timeline = []
+        for row in range(self._row, self._end):
+            pattern_id = int(patterns[row])
+            if pattern_id in remaining:
+                remaining.discard(pattern_id)
+                timeline.append(self.event_log.get_event(row))
+                if not remaining:
+                    break
+        return timeline
+
+    def get_state(self):
+        return {"next_episode": self.next_episode,
+                "row": self._row,
+                "end": self._end,
+                "disabled": frozenset(self._disabled)}
+
+    def set_state(self, state):
+        self.next_episode = state["next_episode"]
+        self._row = state["row"]
+        self._end = state["end"]
+        self._disabled = set(state["disabled"])
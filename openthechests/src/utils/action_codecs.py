@@ -0,0 +1,296 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from openthechests.src.utils.helper_functions import boxes_to_discrete
+
+# largest number of bits decoded with a lookup table, larger integers are decoded with bit shifts
+MAX_TABLE_BITS = 16
+
+
+def get_bit_table(num_bits):
+    """
+    Builds the lookup table decoding integers into binary vectors, where the first bit is the most significant one.
+
+    :param num_bits: The number of bits of the integers.
+    :return: Array of shape (2 ** num_bits, num_bits) whose row i holds the bits of i.
+    """
+    shifts = np.arange(num_bits - 1, -1, -1)
+    return ((np.arange(2 ** num_bits)[:, None] >> shifts) & 1).astype(np.int8)
+
+
+class ActionCodec(ABC):
+    """
+    Translates the actions of an action encoding into binary vectors holding 1 for each pressed button, which is the
+    form of actions applied by the environments, and back.
+    Codecs are selected with the action_encoding parameter of the environments, either by name (see ACTION_CODECS)
+    or by giving a codec instance to set its parameters.
+    Subclasses implement get_space, decode_batch and encode_batch, and can override decode and encode to avoid
+    the batch dimension.
+
+    Attributes:
+    -----------
+    name : str
+        The name of the encoding.
+    num_boxes : int
+        The number of boxes of the environment.
+
+    Methods:
+    --------
+    get_space():
+        Returns the gym space of the encoded actions.
+    decode(action):
+        Transforms an encoded action into a binary vector.
+    decode_batch(actions):
+        Transforms encoded actions stacked along a first dimension into binary vectors.
+    encode(pressed):
+        Transforms a binary vector into an encoded action.
+    encode_batch(pressed):
+        Transforms binary vectors stacked along a first dimension into encoded actions.
+    """
+    name = None
+
+    def __init__(self, num_boxes: int):
+        self.num_boxes = num_boxes
+
+    @abstractmethod
+    def get_space(self):
+        pass
+
+    def decode(self, action):
+        return self.decode_batch(np.asarray(action)[None])[0]
+
+    @abstractmethod
+    def decode_batch(self, actions):
+        pass
+
+    def encode(self, pressed):
+        return self.encode_batch(np.asarray(pressed)[None])[0]
+
+    @abstractmethod
+    def encode_batch(self, pressed):
+        pass
+
+
+class MultiBinaryCodec(ActionCodec):
+    """
+    Actions given as binary vectors of size num_boxes, which are applied as they are.
+    """
+    name = "multibinary"
+
+    def get_space(self):
+        # gym is only needed by the gym wrappers, so it is not imported with the environments
+        from gym.spaces import MultiBinary
+        return MultiBinary(self.num_boxes)
+
+    def decode(self, action):
+        return action
+
+    def decode_batch(self, actions):
+        return np.asarray(actions)
+
+    def encode(self, pressed):
+        return np.asarray(pressed).astype(np.int64)
+
+    def encode_batch(self, pressed):
+        return np.asarray(pressed).astype(np.int64)
+
+
+class DiscreteCodec(ActionCodec):
+    """
+    Actions given as integers in [0, 2 ** num_boxes), whose binary representation gives the pressed buttons, the first
+    box corresponding to the most significant bit.
+    Integers are decoded with a lookup table up to MAX_TABLE_BITS boxes and with bit shifts otherwise. The size of
+    the action space grows exponentially with the number of boxes, "multidiscrete" or "sparse" actions should be
+    preferred for many boxes.
+    """
+    name = "discrete"
+
+    def __init__(self, num_boxes: int):
+        assert num_boxes <= 62, f"Cannot use discrete actions with {num_boxes} boxes, the number of actions " \
+                                f"would overflow, please use \"multidiscrete\" or \"sparse\" actions."
+        super().__init__(num_boxes)
+        self._num_actions = boxes_to_discrete(num_boxes)
+        self._table = get_bit_table(num_boxes) if num_boxes <= MAX_TABLE_BITS else None
+        self._shifts = np.arange(num_boxes - 1, -1, -1, dtype=np.int64)
+
+    def get_space(self):
+        from gym.spaces import Discrete
+        return Discrete(self._num_actions)
+
+    def decode(self, action):
+        assert 0 <= action < self._num_actions, f"Got discrete action {action} while actions of {self.num_boxes} " \
+                                                f"boxes must be in [0, {self._num_actions})."
+        if self._table is not None:
+            return self._table[action]
+        return (int(action) >> self._shifts) & 1
+
+    def decode_batch(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        assert ((actions >= 0) & (actions < self._num_actions)).all(), \
+            f"Got discrete actions {actions[(actions < 0) | (actions >= self._num_actions)]} while actions of " \
+            f"{self.num_boxes} boxes must be in [0, {self._num_actions})."
+        if self._table is not None:
+            return self._table[actions]
+        return (actions[:, None] >> self._shifts) & 1
+
+    def encode(self, pressed):
+        return int(np.asarray(pressed, dtype=np.int64) @ (1 << self._shifts))
+
+    def encode_batch(self, pressed):
+        return np.asarray(pressed, dtype=np.int64) @ (1 << self._shifts)
+
+
+class MultiDiscreteCodec(ActionCodec):
+    """
+    Factored actions for many boxes: boxes are split into groups of group_size consecutive boxes, and each action
+    holds one integer per group whose binary representation gives the pressed buttons of the group, the first box of
+    the group corresponding to the most significant bit. The last group can be smaller than the others.
+    Each integer is decoded with a lookup table, so that the number of values of each component stays small whatever
+    the number of boxes.
+
+    Attributes:
+    -----------
+    group_size : int
+        The number of boxes of each group.
+    """
+    name = "multidiscrete"
+
+    def __init__(self, num_boxes: int, group_size: int = 8):
+        """
+        Prepares the lookup table of a group.
+
+        :param num_boxes: int
+            The number of boxes of the environment.
+        :param group_size: int, optional
+            The number of boxes of each group, at most MAX_TABLE_BITS (default is 8).
+        """
+        assert 0 < group_size <= MAX_TABLE_BITS, f"Group size must be between 1 and {MAX_TABLE_BITS}."
+        super().__init__(num_boxes)
+        self.group_size = group_size
+        self._num_groups = -(-num_boxes // group_size)
+        self._group_sizes = [min(group_size, num_boxes - group * group_size) for group in range(self._num_groups)]
+        self._table = get_bit_table(group_size)
+        self._group_ends = np.array([2 ** size for size in self._group_sizes], dtype=np.int64)
+        # bits of the last group are aligned on the most significant bits of the table
+        self._padding = self._num_groups * group_size - num_boxes
+
+    def get_space(self):
+        from gym.spaces import MultiDiscrete
+        return MultiDiscrete(self._group_ends.tolist())
+
+    def decode(self, action):
+        action = np.asarray(action, dtype=np.int64).copy()
+        self._check_range(action)
+        action[-1] <<= self._padding
+        return self._table[action].reshape(-1)[:self.num_boxes]
+
+    def decode_batch(self, actions):
+        actions = np.asarray(actions, dtype=np.int64).copy()
+        self._check_range(actions)
+        actions[:, -1] <<= self._padding
+        return self._table[actions].reshape(len(actions), -1)[:, :self.num_boxes]
+
+    def encode_batch(self, pressed):
+        pressed = np.asarray(pressed, dtype=np.int64)
+        padded = np.zeros((len(pressed), self._num_groups * self.group_size), dtype=np.int64)
+        padded[:, :self.num_boxes] = pressed
+        actions = padded.reshape(len(pressed), self._num_groups, self.group_size) @ \
+            (1 << np.arange(self.group_size - 1, -1, -1))
+        actions[:, -1] >>= self._padding
+        return actions
+
+    def _check_range(self, actions):
+        assert actions.shape[-1] == self._num_groups and (actions >= 0).all() and (actions < self._group_ends).all(), \
+            f"Got multi-discrete actions {actions.tolist()} while actions of {self.num_boxes} boxes must hold " \
+            f"{self._num_groups} non-negative values below {self._group_ends.tolist()}."
+
+
+class SparseCodec(ActionCodec):
+    """
+    Actions given as the list of IDs of the boxes whose button is pressed.
+    To fit a fixed size action space, lists are padded with the value num_boxes, which presses no button, so that
+    actions are vectors of max_presses values in [0, num_boxes]. Lists of any length are accepted by decode.
+
+    Attributes:
+    -----------
+    max_presses : int
+        The number of box IDs of each action.
+    """
+    name = "sparse"
+
+    def __init__(self, num_boxes: int, max_presses: int = None):
+        """
+        Initializes the codec.
+
+        :param num_boxes: int
+            The number of boxes of the environment.
+        :param max_presses: int, optional
+            The number of box IDs of each action in the action space (default is None, using num_boxes).
+        """
+        super().__init__(num_boxes)
+        self.max_presses = max_presses or num_boxes
+
+    def get_space(self):
+        from gym.spaces import MultiDiscrete
+        return MultiDiscrete([self.num_boxes + 1] * self.max_presses)
+
+    def decode(self, action):
+        action = np.asarray(action, dtype=np.int64)
+        self._check_range(action)
+        pressed = np.zeros(self.num_boxes + 1, dtype=np.int8)
+        pressed[action] = 1
+        return pressed[:self.num_boxes]
+
+    def decode_batch(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        self._check_range(actions)
+        pressed = np.zeros((len(actions), self.num_boxes + 1), dtype=np.int8)
+        pressed[np.arange(len(actions))[:, None], actions] = 1
+        return pressed[:, :self.num_boxes]
+
+    def encode(self, pressed):
+        """
+        Lists the pressed buttons, keeping the first max_presses ones.
+
+        :param pressed: np.ndarray
+            The binary vector of pressed buttons.
+        :return: np.ndarray
+            The IDs of the pressed boxes padded with num_boxes.
+        """
+        return self.encode_batch(np.asarray(pressed)[None])[0]
+
+    def encode_batch(self, pressed):
+        pressed = np.asarray(pressed) == 1
+        # pressed boxes are moved first while keeping their order, then replaced by their IDs
+        order = np.argsort(~pressed, axis=1, kind="stable")[:, :self.max_presses]
+        return np.where(np.take_along_axis(pressed, order, axis=1), order, self.num_boxes)
+
+    def _check_range(self, actions):
+        assert ((actions >= 0) & (actions <= self.num_boxes)).all(), \
+            f"Got sparse actions {actions.tolist()} while box IDs must be in [0, {self.num_boxes}], {self.num_boxes} " \
+            f"being the padding value."
+
+
+ACTION_CODECS = {codec.name: codec for codec in [MultiBinaryCodec, DiscreteCodec, MultiDiscreteCodec, SparseCodec]}
+
+
+def make_action_codec(action_encoding, num_boxes, discrete=False):
+    """
+    Returns the codec of an action encoding.
+
+    :param action_encoding: The name of the encoding (see ACTION_CODECS), a codec instance, or None to use
+                            "discrete" or "multibinary" depending on discrete.
+    :param num_boxes: The number of boxes of the environment.
+    :param discrete: Flag used when no encoding is given, selecting integer actions.
+    :return: The codec.
+    """
+    if isinstance(action_encoding, ActionCodec):
+        assert action_encoding.num_boxes == num_boxes, \
+            f"Got an action codec for {action_encoding.num_boxes} boxes while boxes are {num_boxes}."
+        return action_encoding
+    if action_encoding is None:
+        action_encoding = "discrete" if discrete else "multibinary"
+    assert action_encoding in ACTION_CODECS, \
+        f"Unknown action encoding {action_encoding}, please select one of {list(ACTION_CODECS)}."
+    return ACTION_CODECS[action_encoding](num_boxes)
@@ -5,23 +5,39 @@ import numpy as np
 from openthechests.src.elements.Event import Event
 from openthechests.src.utils.helper_functions import my_normal
 
+# Allen functions accept single events as well as batches of events (see EventBatch) whose times are arrays,
+# in which case one value is sampled per instance.
+# Random values are drawn from the np.random.Generator given as rng, or from the global np.random module when rng is
+# None.
 
-def overlapped(second: Event, first: Event):
+
+def _sample_size(event):
+    """
+    Gives the number of values to sample for an event.
+
+    :param event: A single event or a batch of events.
+    :return: None for single events, the number of instances for batches.
+    """
+    return np.shape(event.end) or None
+
+
+def overlapped(second: Event, first: Event, rng=None):
     """
     Allows to define the allen relation "overlaps" between two events.
     The second event is set to begin at a randomly chosen time overlapping with the first one.
 
     :param second: The second event to be placed after the first one.
     :param first: The first event serving as reference to the second one.
+    :param rng: The random generator to draw from.
     :return: The transformed second event
     """
-    second_earliest_start = max(0, first.end - second.start)
-    second_start = np.random.uniform(second_earliest_start, first.end)
+    second_earliest_start = np.maximum(0, first.end - second.start)
+    second_start = (np.random if rng is None else rng).uniform(second_earliest_start, first.end)
     new_event = second.shifted(second_start)
     return new_event
 
 
-def after(second: Event, first: Event, gap_dist: (int, int)):
+def after(second: Event, first: Event, gap_dist: (int, int), rng=None):
     """
     Allows to define the allen relation "after" between two events.
     The second event is placed after the first one, while respecting a certain gap distance.
@@ -29,15 +45,16 @@ def after(second: Event, first: Event, gap_dist: (int, int)):
     :param second: The second event to be placed after the first one.
     :param first: The first event serving as reference to the second one.
     :param gap_dist: The gap to respect, defined using (mu, sigma) and sampled via a gaussian.
+    :param rng: The random generator to draw from.
     :return: The transformed second event
     """
-    gap_duration = my_normal(**gap_dist)
+    gap_duration = my_normal(**gap_dist, size=_sample_size(first), rng=rng)
     second_start = first.end + gap_duration
     new_event = second.shifted(second_start)
     return new_event
 
 
-def during(second: Event, first: Event):
+def during(second: Event, first: Event, rng=None):
     """
     Allows to define the allen relation "during" between two events.
     The second event is placed during the first one,
@@ -45,23 +62,25 @@ def during(second: Event, first: Event):
 
     :param second: the second event to be placed during the first one.
     :param first: The first event to be used as reference.
+    :param rng: The random generator to draw from.
     :return: The transformed second event
     """
-    assert (first.duration >= second.duration), \
+    assert np.all(first.duration >= second.duration), \
         f"An event can be longer than the one containing it! {first.duration} > {second.duration}"
-    gap_size = np.random.uniform(0, first.duration - second.duration)
+    gap_size = (np.random if rng is None else rng).uniform(0, first.duration - second.duration)
     second_start = first.start + gap_size
     new_event = second.shifted(second_start)
     return new_event
 
 
-def met_by(second: Event, first: Event):
+def met_by(second: Event, first: Event, rng=None):
     """
     Allows to define the allen relation "met by" between two events.
     The second event is placed immediately after the end of the first one.
 
     :param second: The second event to be placed right after the first one.
     :param first: The first event serving as reference to the second one.
+    :param rng: Unused, accepted so that all Allen functions share the same interface.
     :return: The transformed second event
     """
     return second.shifted(first.end)
@@ -0,0 +1,178 @@
+"""
+On-disk cache of parsed environment configurations.
+
+Parsing a configuration means parsing the YAML environment file and every pattern file it references, which dominates
+the startup of many workers sharing a filesystem. Parsed and validated configurations are stored as pickle files named
+after a hash of the content of the environment file and of the pattern folder, so that a worker loads its
+configuration by reading the environment file and one cache file, pattern files only being checked with os.stat.
+Caches can be built ahead of a training launch with build_config_cache, or from the repository root with:
+    python -m openthechests.src.utils.config_cache docs/examples/create_env/example_config/multiple_per_box.yaml \
+        --cache-dir .config_cache
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import tempfile
+
+from openthechests.src.elements.Parser import Parser
+from openthechests.src.elements.Pattern import Pattern
+from openthechests.src.utils.helper_functions import load_yaml, parse_config_file
+
+# changes of the format of parsed configurations must increase the version, which invalidates existing caches
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.environ.get("OPENTHECHESTS_CACHE_DIR",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "openthechests"))
+
+
+def _get_pattern_folder(env_config_file, pattern_configs_folder=None):
+    if pattern_configs_folder is None:
+        pattern_configs_folder = "/".join(env_config_file.split("/")[:-1])
+    return pattern_configs_folder
+
+
+def _get_cache_file(env_config_bytes, pattern_configs_folder, cache_dir):
+    digest = hashlib.sha256()
+    digest.update(f"{CACHE_VERSION}\0{os.path.abspath(pattern_configs_folder)}\0".encode())
+    digest.update(env_config_bytes)
+    return os.path.join(cache_dir, f"config_{digest.hexdigest()[:32]}.pkl")
+
+
+def _get_pattern_files(env_config_bytes, pattern_configs_folder):
+    return [pattern_configs_folder + "/" + pattern_conf_file
+            for pattern_conf_file in load_yaml(env_config_bytes)["INSTRUCTIONS"]]
+
+
+def _stat_files(files):
+    return [(os.stat(file).st_size, os.stat(file).st_mtime_ns) for file in files]
+
+
+def _hash_files(files):
+    digest = hashlib.sha256()
+    for file in files:
+        with open(file, "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def validate_config(config):
+    """
+    Checks a parsed configuration by compiling the instructions of all patterns, which raises an error for unknown
+    event types, attributes, variables or commands.
+
+    :param config: The configuration returned by parse_config_file.
+    """
+    parser = Parser(all_event_types=config["all_event_types"],
+                    all_noise_types=config["all_noise_types"],
+                    all_event_attributes=config["all_event_attributes"],
+                    all_noise_attributes=config["all_noise_attributes"])
+    assert len(config["instructions"]) > 0, "The configuration must define at least one pattern."
+    for idx, instructions in enumerate(config["instructions"]):
+        Pattern(instruction=instructions, id=idx, parser=parser)
+
+
+def _write_cache_file(cache_file, entry):
+    # the entry is written to a temporary file then renamed, so that concurrent workers never read a partial file
+    cache_dir = os.path.dirname(cache_file)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except BaseException:
+        os.remove(tmp_file)
+        raise
+
+
+def _read_cache_file(cache_file):
+    # truncated or stale files can raise almost any error while unpickling, they are parsed again in all cases
+    try:
+        with open(cache_file, "rb") as f:
+            entry = pickle.load(f)
+    except Exception:
+        return None
+    return entry if isinstance(entry, dict) and entry.get("version") == CACHE_VERSION else None
+
+
+def _load_config(env_config_file, pattern_configs_folder, cache_dir, refresh=False):
+    pattern_configs_folder = _get_pattern_folder(env_config_file, pattern_configs_folder)
+    with open(env_config_file, "rb") as f:
+        env_config_bytes = f.read()
+    cache_file = _get_cache_file(env_config_bytes, pattern_configs_folder, cache_dir or DEFAULT_CACHE_DIR)
+
+    entry = _read_cache_file(cache_file)
+    if entry is not None:
+        try:
+            if _stat_files(entry["pattern_files"]) == entry["pattern_stats"]:
+                return entry["config"], cache_file
+            if _hash_files(entry["pattern_files"]) == entry["pattern_hash"]:
+                # only build_config_cache refreshes the stats, so that workers starting together do not all rewrite
+                # the same entry
+                if refresh:
+                    entry["pattern_stats"] = _stat_files(entry["pattern_files"])
+                    _write_cache_file(cache_file, entry)
+                return entry["config"], cache_file
+        except OSError:
+            pass
+
+    pattern_files = _get_pattern_files(env_config_bytes, pattern_configs_folder)
+    # stats are taken before parsing, so that files modified during parsing invalidate the entry
+    pattern_stats = _stat_files(pattern_files)
+    pattern_hash = _hash_files(pattern_files)
+    config = parse_config_file(env_config_file=env_config_file, pattern_configs_folder=pattern_configs_folder)
+    validate_config(config)
+    _write_cache_file(cache_file, {"version": CACHE_VERSION,
+                                   "pattern_files": pattern_files,
+                                   "pattern_stats": pattern_stats,
+                                   "pattern_hash": pattern_hash,
+                                   "config": config})
+    return config, cache_file
+
+
+def load_config(env_config_file, pattern_configs_folder=None, cache_dir=None):
+    """
+    Returns the parsed configuration of an environment, read from the cache when an entry matches the content of the
+    environment file and the pattern files, and parsed, validated and added to the cache otherwise.
+    Pattern files whose size and modification time did not change since the entry was written are not read. When they
+    changed, their content is hashed and the entry is reused if the content is the same, without being rewritten:
+    build_config_cache refreshes the recorded sizes and modification times.
+
+    :param env_config_file: The YAML environment configuration file.
+    :param pattern_configs_folder: The folder containing the pattern files.
+                                   By default, the folder of the environment configuration file is used.
+    :param cache_dir: The folder of the cache files, defaults to DEFAULT_CACHE_DIR.
+    :return: Dictionary containing the instructions and all event and noise types and attributes, as returned by
+             parse_config_file.
+    """
+    return _load_config(env_config_file, pattern_configs_folder, cache_dir)[0]
+
+
+def build_config_cache(env_config_files, pattern_configs_folder=None, cache_dir=None):
+    """
+    Parses, validates and caches configurations ahead of a training launch, so that workers only read the cache.
+    Entries whose pattern files were touched without changing their content are rewritten with the new sizes and
+    modification times, so that workers do not hash the pattern files again.
+
+    :param env_config_files: The YAML environment configuration files, or a single file.
+    :param pattern_configs_folder: The folder containing the pattern files of all configurations.
+                                   By default, the folder of each environment configuration file is used.
+    :param cache_dir: The folder of the cache files, defaults to DEFAULT_CACHE_DIR.
+    :return: List of the cache file of each configuration.
+    """
+    if isinstance(env_config_files, str):
+        env_config_files = [env_config_files]
+    return [_load_config(env_config_file, pattern_configs_folder, cache_dir, refresh=True)[1]
+            for env_config_file in env_config_files]
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("env_config_files", nargs="+")
+    arg_parser.add_argument("--pattern-configs-folder", default=None)
+    arg_parser.add_argument("--cache-dir", default=None, help=f"defaults to {DEFAULT_CACHE_DIR}")
+    args = arg_parser.parse_args()
+    for cache_file in build_config_cache(args.env_config_files, pattern_configs_folder=args.pattern_configs_folder,
+                                         cache_dir=args.cache_dir):
+        print(cache_file)
@@ -0,0 +1,263 @@
+"""
+Generation of offline datasets of (observation, action, reward, done) transitions.
+
+Transitions are produced by worker processes, each one stepping an OpenTheChestsVec with a scripted policy, and are
+written as sharded .npz files with a fixed schema derived from the observation and action spaces of
+OpenTheChestsGym. Run from the repository root with, for example:
+    python -m openthechests.src.utils.dataset_generation docs/examples/create_env/example_config/multiple_per_box.yaml \
+        datasets/oracle --transitions 1000000 --policy oracle --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from openthechests.src.OpenTheChestsGym import OpenTheChestsGym
+from openthechests.src.OpenTheChestsVec import OpenTheChestsVec
+from openthechests.src.utils.action_codecs import ACTION_CODECS
+
+SCHEMA_FILE = "schema.json"
+
+
+def get_schema(observation_space, action_space):
+    """
+    Derives the columns of a dataset from the spaces of the environment.
+    Each transition holds the observation, the action, the reward, the done flag, the next observation (the last
+    observation of the episode when done) and the index of the episode.
+
+    :param observation_space: The Dict observation space of OpenTheChestsGym.
+    :param action_space: The action space of OpenTheChestsGym.
+    :return: List of (name, dtype, shape) tuples, shape being the shape of one transition.
+    """
+    observation_columns = [(key, np.dtype(space.dtype).str, tuple(space.shape))
+                           for key, space in observation_space.spaces.items()]
+    return [*[(f"obs/{key}", dtype, shape) for key, dtype, shape in observation_columns],
+            ("action", np.dtype(action_space.dtype).str, tuple(action_space.shape)),
+            ("reward", np.dtype(np.float32).str, ()),
+            ("done", np.dtype(bool).str, ()),
+            *[(f"next_obs/{key}", dtype, shape) for key, dtype, shape in observation_columns],
+            ("episode", np.dtype(np.int64).str, ())]
+
+
+def random_policy(env, rng):
+    """
+    Presses each button with probability 0.5.
+
+    :param env: The OpenTheChestsVec environment.
+    :param rng: The random generator of the worker.
+    :return: The binary actions of all environments.
+    """
+    return rng.integers(0, 2, (env.num_envs, env.get_num_boxes()))
+
+
+def oracle_policy(env, rng):
+    """
+    Presses the buttons of the ready boxes, which gives the highest possible reward, see get_oracle_action.
+
+    :param env: The OpenTheChestsVec environment.
+    :param rng: The random generator of the worker, unused.
+    :return: The binary actions of all environments.
+    """
+    return env.box_bank.ready.astype(np.int64)
+
+
+POLICIES = {"random": random_policy, "oracle": oracle_policy}
+
+
+def _generate_shards(worker_id, num_workers, env_config_file, out_dir, num_transitions, num_envs, shard_size,
+                     policy, seed, env_kwargs):
+    """
+    Generates the transitions of one worker and writes them into shards named shard_<worker>_<index>.npz.
+
+    :param worker_id: The index of the worker.
+    :param num_workers: The number of workers, used to give unique indices to episodes.
+    :param env_config_file: The configuration file of the environments.
+    :param out_dir: The folder of the dataset.
+    :param num_transitions: The number of transitions to generate.
+    :param num_envs: The number of environments stepped together.
+    :param shard_size: The number of transitions of each shard.
+    :param policy: The name of the policy.
+    :param seed: The np.random.SeedSequence of the worker.
+    :param env_kwargs: Other parameters given to OpenTheChestsVec.from_config_file.
+    :return: Dictionary with the number of transitions, episodes and shards written by the worker.
+    """
+    env_seed, policy_seed = seed.spawn(2)
+    rng = np.random.default_rng(policy_seed)
+    env = OpenTheChestsVec.from_config_file(num_envs=num_envs, env_config_file=env_config_file, **env_kwargs)
+    template = OpenTheChestsGym.from_config_file(env_config_file=env_config_file,
+                                                 pattern_configs_folder=env_kwargs.get("pattern_configs_folder"),
+                                                 action_encoding=env.action_codec,
+                                                 config_cache=env_kwargs.get("config_cache"))
+    schema = get_schema(template.observation_space, template.action_space)
+    shard = {name: np.zeros((shard_size,) + shape, dtype=dtype) for name, dtype, shape in schema}
+    obs_keys = list(template.observation_space.spaces)
+
+    episodes = np.arange(num_envs) * num_workers + worker_id
+    num_episodes = num_envs
+    num_written = 0
+    num_shards = 0
+    size = 0
+    obs = env.reset(seed=env_seed)
+    while num_written + size < num_transitions:
+        actions = env.action_codec.encode_batch(POLICIES[policy](env, rng))
+        next_obs, rewards, dones, infos = env.step(actions)
+
+        # observations returned for done environments are the first ones of their next episode
+        final_obs = next_obs
+        if dones.any():
+            final_obs = {key: value.copy() for key, value in next_obs.items()}
+            for env_id in np.flatnonzero(dones):
+                for key, value in infos[env_id]["terminal_observation"].items():
+                    final_obs[key][env_id] = value
+        batch = {**{f"obs/{key}": obs[key] for key in obs_keys},
+                 "action": actions,
+                 "reward": rewards,
+                 "done": dones,
+                 **{f"next_obs/{key}": final_obs[key] for key in obs_keys},
+                 "episode": episodes}
+
+        count = min(num_envs, num_transitions - num_written - size)
+        start = 0
+        while start < count:
+            written = min(count - start, shard_size - size)
+            for name, values in batch.items():
+                shard[name][size:size + written] = values[start:start + written]
+            size += written
+            start += written
+            if size == shard_size:
+                np.savez(os.path.join(out_dir, f"shard_{worker_id:03d}_{num_shards:05d}.npz"), **shard)
+                num_written += size
+                num_shards += 1
+                size = 0
+
+        num_done = np.count_nonzero(dones)
+        episodes = episodes.copy()
+        episodes[dones] = (num_episodes + np.arange(num_done)) * num_workers + worker_id
+        num_episodes += num_done
+        obs = next_obs
+
+    if size:
+        np.savez(os.path.join(out_dir, f"shard_{worker_id:03d}_{num_shards:05d}.npz"),
+                 **{name: values[:size] for name, values in shard.items()})
+        num_written += size
+        num_shards += 1
+    return {"transitions": num_written, "episodes": num_episodes, "shards": num_shards}
+
+
+def generate_dataset(env_config_file: str,
+                     out_dir: str,
+                     num_transitions: int,
+                     policy: str = "oracle",
+                     num_workers: int = None,
+                     num_envs: int = 64,
+                     shard_size: int = 100000,
+                     seed: int = None,
+                     start_method: str = None,
+                     **env_kwargs):
+    """
+    Generates a dataset of transitions in parallel worker processes and writes it into out_dir, along with a
+    schema.json file listing the columns of the shards.
+
+    :param env_config_file: str
+        The YAML configuration file of the environments.
+    :param out_dir: str
+        The folder of the dataset.
+    :param num_transitions: int
+        The total number of transitions, split evenly between the workers.
+    :param policy: str, optional
+        The policy choosing the actions, "oracle" or "random" (default is "oracle").
+    :param num_workers: int, optional
+        The number of worker processes (default is the number of CPUs).
+    :param num_envs: int, optional
+        The number of environments stepped together by each worker (default is 64).
+    :param shard_size: int, optional
+        The number of transitions of each shard (default is 100000).
+    :param seed: int, optional
+        The seed of the dataset (default is None, drawing fresh entropy from the system).
+    :param start_method: str, optional
+        The multiprocessing start method (default is the platform default).
+    :param env_kwargs:
+        Other parameters given to OpenTheChestsVec.from_config_file, for example discrete=True or
+        action_encoding="multidiscrete". With config_cache, the configuration is parsed once and read from the cache
+        by the workers.
+    :return: dict
+        The number of transitions, episodes and shards written, and the throughput in transitions per second.
+    """
+    assert policy in POLICIES, f"Unknown policy {policy}, please select one of {list(POLICIES)}."
+    num_workers = num_workers or multiprocessing.cpu_count()
+    os.makedirs(out_dir, exist_ok=True)
+
+    template = OpenTheChestsGym.from_config_file(env_config_file=env_config_file,
+                                                 pattern_configs_folder=env_kwargs.get("pattern_configs_folder"),
+                                                 discrete=env_kwargs.get("discrete", False),
+                                                 action_encoding=env_kwargs.get("action_encoding"),
+                                                 config_cache=env_kwargs.get("config_cache"))
+    schema = get_schema(template.observation_space, template.action_space)
+    with open(os.path.join(out_dir, SCHEMA_FILE), "w") as file:
+        json.dump({"policy": policy,
+                   "env_config_file": env_config_file,
+                   "columns": [[name, dtype, list(shape)] for name, dtype, shape in schema]}, file, indent=1)
+
+    start = time.perf_counter()
+    worker_seeds = np.random.SeedSequence(seed).spawn(num_workers)
+    args = [(worker_id, num_workers, env_config_file, out_dir, int(worker_transitions), num_envs, shard_size, policy,
+             worker_seeds[worker_id], env_kwargs)
+            for worker_id, worker_transitions in enumerate(np.diff(np.linspace(0, num_transitions, num_workers + 1,
+                                                                               dtype=np.int64)))]
+    if num_workers == 1:
+        results = [_generate_shards(*args[0])]
+    else:
+        with multiprocessing.get_context(start_method).Pool(num_workers) as pool:
+            results = pool.starmap(_generate_shards, args)
+    duration = time.perf_counter() - start
+
+    stats = {key: int(sum(result[key] for result in results)) for key in ["transitions", "episodes", "shards"]}
+    stats["seconds"] = round(duration, 3)
+    stats["transitions_per_s"] = round(stats["transitions"] / duration, 1)
+    return stats
+
+
+def load_dataset(out_dir):
+    """
+    Loads all shards of a dataset and concatenates them.
+
+    :param out_dir: The folder of the dataset.
+    :return: Dictionary mapping each column to its array.
+    """
+    with open(os.path.join(out_dir, SCHEMA_FILE)) as file:
+        columns = [name for name, _, _ in json.load(file)["columns"]]
+    shards = [np.load(os.path.join(out_dir, name)) for name in sorted(os.listdir(out_dir)) if name.endswith(".npz")]
+    return {name: np.concatenate([shard[name] for shard in shards]) for name in columns}
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("env_config_file")
+    arg_parser.add_argument("out_dir")
+    arg_parser.add_argument("--transitions", type=int, default=1000000)
+    arg_parser.add_argument("--policy", default="oracle", choices=list(POLICIES))
+    arg_parser.add_argument("--workers", type=int, default=None)
+    arg_parser.add_argument("--envs", type=int, default=64, help="environments stepped together by each worker")
+    arg_parser.add_argument("--shard-size", type=int, default=100000)
+    arg_parser.add_argument("--seed", type=int, default=None)
+    arg_parser.add_argument("--discrete", action="store_true")
+    arg_parser.add_argument("--action-encoding", default=None, choices=list(ACTION_CODECS))
+    arg_parser.add_argument("--batch-size", type=int, default=None, help="pattern instances sampled at once")
+    arg_parser.add_argument("--config-cache", nargs="?", const=True, default=None,
+                            help="cache the parsed configuration, optionally in the given folder")
+    args = arg_parser.parse_args()
+    print(json.dumps(generate_dataset(env_config_file=args.env_config_file,
+                                      out_dir=args.out_dir,
+                                      num_transitions=args.transitions,
+                                      policy=args.policy,
+                                      num_workers=args.workers,
+                                      num_envs=args.envs,
+                                      shard_size=args.shard_size,
+                                      seed=args.seed,
+                                      discrete=args.discrete,
+                                      action_encoding=args.action_encoding,
+                                      batch_size=args.batch_size,
+                                      config_cache=args.config_cache)))
@@ -1,5 +1,13 @@
+import multiprocessing
+import time
+from functools import partial
+
+import numpy as np
 from numpy import mean, std
 
+from openthechests.src.OpenTheChestsVec import OpenTheChestsVec
+from openthechests.src.utils.oracle import get_oracle_action
+
 
 def evaluate_multiple_times(env, model, repeats=10):
     """
@@ -96,3 +104,168 @@ def evaluate_multiple_times_isolate(env, model, repeats=10):
             best_rewards = per_step_rewards
             best_steps = steps
     return mean(rewards), std(rewards), rewards, best_rewards, best_actions, best_steps
+
+
+def evaluate_oracle(env_config_file, num_episodes=1000, num_envs=256, seed=None, **env_kwargs):
+    """
+    Evaluate the oracle policy on a configuration, giving the distribution of the optimal return used to normalize
+    the results of evaluate_multiple_times.
+    Episodes are run in a batched OpenTheChestsVec environment, each environment running the same number of episodes
+    (up to one) so that short episodes are not favored.
+    Returned information :
+        - The average optimal return
+        - The standard deviation of optimal returns
+        - The array of optimal returns of all episodes
+        - The array of episode lengths
+        - The number of evaluated episodes per second
+
+    :param env_config_file: The configuration file.
+    :param num_episodes: Number of evaluated episodes.
+    :param num_envs: Number of environments stepped together.
+    :param seed: Seed of the environments.
+    :param env_kwargs: Other parameters given to OpenTheChestsVec.from_config_file.
+    :return: Statistics over optimal returns.
+    """
+    num_envs = min(num_envs, num_episodes)
+    env = OpenTheChestsVec.from_config_file(num_envs=num_envs, env_config_file=env_config_file, **env_kwargs)
+    targets = np.array([(num_episodes + idx) // num_envs for idx in range(num_envs)])
+    counts = np.zeros(num_envs, dtype=np.int64)
+    current_returns = np.zeros(num_envs)
+    current_lengths = np.zeros(num_envs, dtype=np.int64)
+    returns = []
+    lengths = []
+
+    start = time.perf_counter()
+    env.reset(seed=seed)
+    while (counts < targets).any():
+        _, rewards, dones, _ = env.step(get_oracle_action(env))
+        current_returns += rewards
+        current_lengths += 1
+        finished = dones & (counts < targets)
+        returns.extend(current_returns[finished].tolist())
+        lengths.extend(current_lengths[finished].tolist())
+        counts += dones
+        current_returns[dones] = 0
+        current_lengths[dones] = 0
+    duration = time.perf_counter() - start
+
+    returns = np.array(returns)
+    return mean(returns), std(returns), returns, np.array(lengths), len(returns) / duration
+
+
+def normalize_score(score, optimal_score, reference_score=0.):
+    """
+    Normalize a score so that the reference score gives 0 and the optimal score gives 1.
+
+    :param score: The score to normalize, for example the average return given by evaluate_multiple_times.
+    :param optimal_score: The average optimal return given by evaluate_oracle.
+    :param reference_score: The score of a reference policy, for example a random policy.
+    :return: The normalized score.
+    """
+    return (score - reference_score) / (optimal_score - reference_score)
+
+
+def evaluate_multiple_times_vec(env_config_file, model, repeats=10, num_envs=64, seed=None, num_workers=1,
+                                start_method=None, **env_kwargs):
+    """
+    Evaluate a model multiple times like evaluate_multiple_times, running the episodes concurrently in a batched
+    OpenTheChestsVec environment, model.predict being called once per step on the observations of all running
+    episodes. Episodes can also be split between several worker processes, the model then needs to be picklable.
+    Each episode is seeded with its own seed spawned from the given seed, so that the results do not depend on the
+    number of environments and workers when the model is deterministic.
+    Returned information, as for evaluate_multiple_times :
+        - The average cumulated reward over all evaluations
+        - The standard deviation of cumulated rewards over all evaluations
+        - The list of obtained cumulated rewards for every evaluation
+        - The rewards per step obtained by the best evaluation
+        - The actions made per step of the best evaluation
+        - The number of steps of the best evaluation
+
+    :param env_config_file: The configuration file used to build the environments.
+    :param model: The model to evaluate.
+    :param repeats: Number of times to repeat evaluation.
+    :param num_envs: Number of episodes run concurrently by each worker.
+    :param seed: Seed of the evaluation.
+    :param num_workers: Number of worker processes, 1 to evaluate in the current process.
+    :param start_method: The multiprocessing start method, used when num_workers is larger than 1.
+    :param env_kwargs: Other parameters given to OpenTheChestsVec.from_config_file.
+    :return: Statistics over evaluations.
+    """
+    episode_seeds = np.random.SeedSequence(seed).spawn(repeats)
+    if num_workers == 1:
+        episodes = evaluate_episodes_vec(env_config_file, model, episode_seeds, num_envs, **env_kwargs)
+    else:
+        bounds = np.linspace(0, repeats, num_workers + 1, dtype=int)
+        shards = [episode_seeds[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+        with multiprocessing.get_context(start_method).Pool(num_workers) as pool:
+            results = pool.starmap(partial(evaluate_episodes_vec, **env_kwargs),
+                                   [(env_config_file, model, shard, num_envs) for shard in shards])
+        episodes = [episode for result in results for episode in result]
+
+    sum_rewards = []
+    best_eval_rewards = None
+    best_eval_actions = None
+    best_eval_steps = None
+    for sum_reward, per_step_rewards, actions, steps in episodes:
+        sum_rewards.append(sum_reward)
+        # if this is the best achieved reward, keep the eval history
+        if max(sum_rewards) <= sum_reward:
+            best_eval_actions = actions
+            best_eval_rewards = per_step_rewards
+            best_eval_steps = steps
+    return mean(sum_rewards), std(sum_rewards), sum_rewards, \
+        best_eval_rewards, best_eval_actions, best_eval_steps
+
+
+def evaluate_episodes_vec(env_config_file, model, episode_seeds, num_envs=64, **env_kwargs):
+    """
+    Evaluate a model on several episodes run concurrently in a batched OpenTheChestsVec environment.
+    Each environment starts a new episode as soon as its episode is done, until all episodes have been run.
+
+    :param env_config_file: The configuration file used to build the environment.
+    :param model: The model to evaluate.
+    :param episode_seeds: The seed of each episode.
+    :param num_envs: Number of episodes run concurrently.
+    :param env_kwargs: Other parameters given to OpenTheChestsVec.from_config_file.
+    :return: For each episode, in order, the cumulated reward, reward per step, action per step and number of steps,
+        as given by evaluate_one_episode.
+    """
+    num_episodes = len(episode_seeds)
+    num_envs = min(num_envs, num_episodes)
+    env = OpenTheChestsVec.from_config_file(num_envs=num_envs, env_config_file=env_config_file, auto_reset=False,
+                                            **env_kwargs)
+    results = [None] * num_episodes
+    # index of the episode run by each environment, -1 once all episodes have been started
+    running = np.arange(num_envs)
+    rewards = [[] for _ in range(num_envs)]
+    actions = [[] for _ in range(num_envs)]
+    next_episode = num_envs
+
+    obs = env.reset(seed=list(episode_seeds[:num_envs]))
+    while (running >= 0).any():
+        action, _ = model.predict(obs, deterministic=True)
+        obs, reward, dones, _ = env.step(action)
+        reward = reward.tolist()
+        for env_id in np.flatnonzero(running >= 0):
+            rewards[env_id].append(reward[env_id])
+            actions[env_id].append(action[env_id])
+
+        done_ids = np.flatnonzero(dones & (running >= 0))
+        if len(done_ids):
+            seeds = [None] * num_envs
+            for env_id in done_ids:
+                results[running[env_id]] = (sum(rewards[env_id]), rewards[env_id], actions[env_id],
+                                            len(rewards[env_id]))
+                rewards[env_id] = []
+                actions[env_id] = []
+                if next_episode < num_episodes:
+                    running[env_id] = next_episode
+                    seeds[env_id] = episode_seeds[next_episode]
+                    next_episode += 1
+                else:
+                    running[env_id] = -1
+            restarted = np.zeros(num_envs, dtype=bool)
+            restarted[[env_id for env_id in done_ids if running[env_id] >= 0]] = True
+            if restarted.any():
+                obs = env.reset(mask=restarted, seed=seeds)
+    return results
@@ -0,0 +1,354 @@
+import json
+import os
+
+import numpy as np
+
+from openthechests.src.elements.Event import Event
+from openthechests.src.utils.tracing import Tracer
+
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+# kind of each row, rows are written at the end of each reset and step, followed by one row per event skipped by
+# macro steps
+RESET = 0
+STEP = 1
+SKIP = 2
+
+
+def get_columns(num_boxes, num_patterns, attributes):
+    """
+    Lists the columns of an event log, each one being stored in its own file of fixed size rows.
+    The signal columns store the satisfied and active arrays sent by the generator, packed into bits.
+
+    :param num_boxes: The number of boxes of the recorded environment.
+    :param num_patterns: The size of the signal arrays of the recorded environment.
+    :param attributes: The names of the event attributes.
+    :return: List of (name, dtype, shape) tuples, shape being the shape of one row.
+    """
+    num_signal_bytes = (num_patterns + 7) // 8
+    return [("kind", "u1", ()),
+            ("action", "u1", (num_boxes,)),
+            ("reward", "<f4", ()),
+            ("done", "u1", ()),
+            ("time", "<f8", ()),
+            ("type", "<i2", ()),
+            *[(f"attr/{attr}", "<i2", ()) for attr in attributes],
+            ("start", "<f8", ()),
+            ("end", "<f8", ()),
+            ("pattern", "<i2", ()),
+            ("noise", "u1", ()),
+            ("satisfied", "u1", (num_signal_bytes,)),
+            ("active", "u1", (num_signal_bytes,))]
+
+
+def get_column_file(path, name):
+    return os.path.join(path, name.replace("/", "__") + ".bin")
+
+
+class EventLogRecorder(Tracer):
+    """
+    Records the events observed by an OpenTheChests environment, along with the actions and rewards, into an event
+    log: a folder holding a JSON description of the log and one append-only binary file per column.
+    The recorder is a tracer attached to the environment with OpenTheChests.attach_tracer, it cannot be attached to
+    an environment that already has a tracer, and the tracer of a recorded environment cannot be changed.
+    One row is written at the end of each reset and step, with the emitted event (type and attribute codes, start,
+    end, the pattern it was taken from and a noise flag), the signals sent to the boxes, the action, reward and done
+    flag. With macro steps, it is followed by one SKIP row per skipped event, without action nor reward, the done flag
+    of the step being written on its last row. Rows are kept in preallocated arrays and appended to the files
+    chunk_size rows at a time.
+
+    Missing attributes are recorded with the code -1. Events taken from no pattern, which are the "Empty" events
+    emitted once all timelines are disabled, are recorded with the type and pattern -1.
+
+    Attributes:
+    -----------
+    path : str
+        The folder of the event log.
+    chunk_size : int
+        The number of rows written to the files at once.
+    num_rows : int
+        The number of rows recorded, including the rows that are not flushed yet.
+
+    Methods:
+    --------
+    attach(env):
+        Starts recording an environment.
+    detach():
+        Stops recording and writes the remaining rows.
+    flush():
+        Writes the buffered rows to the files.
+    close():
+        Stops recording and closes the files.
+    """
+    def __init__(self, path: str, chunk_size: int = 4096):
+        """
+        Prepares a recorder, the files are only opened once an environment is attached.
+        Rows are appended to the event log if it already exists.
+
+        :param path: str
+            The folder of the event log.
+        :param chunk_size: int, optional
+            The number of rows written to the files at once (default is 4096).
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.num_rows = 0
+        self._env = None
+        self._files = None
+        self._buffers = None
+        self._size = 0
+        self._last_event = None
+        self._observed = []
+
+    def attach(self, env):
+        """
+        Starts recording an environment by attaching the recorder as its tracer.
+
+        :param env: OpenTheChests
+            The environment to record, which must not have a tracer.
+        """
+        assert self._env is None, "The recorder is already attached to an environment."
+        assert env.tracer is None, \
+            "Cannot record an environment with an attached tracer, please detach the tracer first."
+        self.close()
+        parser = env.parser
+        self._attributes = list(parser.all_attributes)
+        self._num_patterns = len(env.generator.satisfied)
+        columns = get_columns(env.get_num_boxes(), self._num_patterns, self._attributes)
+        meta = {"version": FORMAT_VERSION,
+                "num_boxes": env.get_num_boxes(),
+                "num_patterns": self._num_patterns,
+                "all_types": parser.all_types,
+                "all_attributes": parser.all_attributes,
+                "all_noise_types": parser.all_noise_types,
+                "columns": [[name, dtype, list(shape)] for name, dtype, shape in columns]}
+
+        os.makedirs(self.path, exist_ok=True)
+        meta_file = os.path.join(self.path, META_FILE)
+        if os.path.exists(meta_file):
+            with open(meta_file) as file:
+                existing_meta = json.load(file)
+            if existing_meta != meta:
+                raise ValueError(f"Event log {self.path} was recorded from a different environment.")
+            # rows that were only partly written are dropped
+            self.num_rows = min(os.path.getsize(get_column_file(self.path, name)) // int(np.prod(shape, dtype=int))
+                                // np.dtype(dtype).itemsize for name, dtype, shape in columns)
+            for name, dtype, shape in columns:
+                with open(get_column_file(self.path, name), "r+b") as file:
+                    file.truncate(self.num_rows * int(np.prod(shape, dtype=int)) * np.dtype(dtype).itemsize)
+        else:
+            with open(meta_file, "w") as file:
+                json.dump(meta, file, indent=1)
+
+        self._files = {name: open(get_column_file(self.path, name), "ab") for name, _, _ in columns}
+        self._buffers = {name: np.zeros((self.chunk_size,) + shape, dtype=dtype) for name, dtype, shape in columns}
+        self._size = 0
+        self._env = env
+        env.attach_tracer(self)
+
+    def detach(self):
+        """
+        Stops recording, removes the recorder from the tracer of the environment and writes the remaining rows.
+        """
+        if self._env is not None and self._env.tracer is self:
+            profiling = self._env._suspend_profiling()
+            self._env._remove_tracer()
+            if profiling:
+                self._env.enable_profiling()
+        self._env = None
+        self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered rows to the files.
+        """
+        if self._files is None:
+            return
+        for name, file in self._files.items():
+            file.write(self._buffers[name][:self._size].tobytes())
+            file.flush()
+        self._size = 0
+
+    def close(self):
+        """
+        Stops recording and closes the files.
+        """
+        self.detach()
+        if self._files is not None:
+            for file in self._files.values():
+                file.close()
+            self._files = None
+
+    def reset_started(self):
+        self._last_event = None
+        self._observed = []
+
+    def reset_done(self, observation):
+        self._append_observed(RESET, None, 0, False)
+
+    def step_started(self, action):
+        self._last_event = None
+        self._observed = []
+
+    def event_popped(self, pattern_id, record):
+        self._last_event = record
+
+    def event_observed(self, event, satisfied, active, time):
+        # the signal arrays are overwritten by the next event, so they are packed right away
+        self._observed.append((self._last_event, time, np.packbits(satisfied), np.packbits(active)))
+        self._last_event = None
+
+    def step_done(self, observation, reward, done):
+        self._append_observed(STEP, self._env._action, reward, done)
+
+    def _append_observed(self, kind, action, reward, done):
+        last = len(self._observed) - 1
+        for idx, (record, time, satisfied, active) in enumerate(self._observed):
+            if idx == 0:
+                self._append(kind, action, reward, done and idx == last, record, time, satisfied, active)
+            else:
+                self._append(SKIP, None, 0, done and idx == last, record, time, satisfied, active)
+        self._observed = []
+
+    def _append(self, kind, action, reward, done, record, time, satisfied, active):
+        buffers = self._buffers
+        row = self._size
+        buffers["kind"][row] = kind
+        buffers["action"][row] = 0 if action is None else action
+        buffers["reward"][row] = reward
+        buffers["done"][row] = done
+        buffers["time"][row] = time
+        buffers["satisfied"][row] = satisfied
+        buffers["active"][row] = active
+        if record is None:
+            buffers["type"][row] = -1
+            for attr in self._attributes:
+                buffers[f"attr/{attr}"][row] = -1
+            buffers["start"][row] = 0
+            buffers["end"][row] = 0
+            buffers["pattern"][row] = -1
+            buffers["noise"][row] = False
+        else:
+            # records of the generator stacks already hold the codes, with -1 for missing attributes
+            start, end, type_code, *attribute_codes, is_noise, pattern_id = record.item()
+            buffers["type"][row] = type_code
+            for attr, code in zip(self._attributes, attribute_codes):
+                buffers[f"attr/{attr}"][row] = code
+            buffers["start"][row] = start
+            buffers["end"][row] = end
+            buffers["pattern"][row] = pattern_id
+            buffers["noise"][row] = is_noise
+        self._size += 1
+        self.num_rows += 1
+        if self._size == self.chunk_size:
+            self.flush()
+
+
+class EventLog:
+    """
+    Read access to an event log written by EventLogRecorder.
+    Columns are memory-mapped, so that logs larger than the memory can be scanned without being loaded.
+
+    Attributes:
+    -----------
+    path : str
+        The folder of the event log.
+    meta : dict
+        The description of the log: number of boxes and patterns, types, attributes and columns.
+    columns : dict
+        Array of each column, with one entry per row.
+    num_boxes : int
+        The number of boxes of the recorded environment.
+    num_patterns : int
+        The size of the signal arrays of the recorded environment.
+    episode_starts : np.ndarray
+        The index of the reset row of each episode.
+
+    Methods:
+    --------
+    get_event(row):
+        Returns the event of a row.
+    get_signals(row):
+        Returns the satisfied and active arrays of a row.
+    get_episode(episode):
+        Returns the first and last rows of an episode.
+    """
+    def __init__(self, path: str):
+        """
+        Opens an event log.
+
+        :param path: str
+            The folder of the event log.
+        """
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as file:
+            self.meta = json.load(file)
+        assert self.meta["version"] == FORMAT_VERSION, f"Unknown event log version {self.meta['version']}."
+        self.num_boxes = self.meta["num_boxes"]
+        self.num_patterns = self.meta["num_patterns"]
+        self._all_types = self.meta["all_types"]
+        self._all_attributes = self.meta["all_attributes"]
+
+        row_sizes = {name: int(np.prod(shape, dtype=int)) * np.dtype(dtype).itemsize
+                     for name, dtype, shape in self.meta["columns"]}
+        num_rows = min(os.path.getsize(get_column_file(path, name)) // row_sizes[name] for name in row_sizes)
+        self.columns = dict()
+        for name, dtype, shape in self.meta["columns"]:
+            if num_rows == 0:
+                self.columns[name] = np.zeros((0,) + tuple(shape), dtype=dtype)
+            else:
+                self.columns[name] = np.memmap(get_column_file(path, name), dtype=dtype, mode="r",
+                                               shape=(num_rows,) + tuple(shape))
+        self.episode_starts = np.flatnonzero(self.columns["kind"] == RESET)
+
+    def __len__(self):
+        return len(self.columns["kind"])
+
+    def get_event(self, row: int):
+        """
+        Returns the event of a row, carrying its integer codes.
+
+        :param row: int
+            The index of the row.
+        :return: Event
+            The event, or None for rows recording an "Empty" event.
+        """
+        type_code = int(self.columns["type"][row])
+        if type_code < 0:
+            return None
+        attributes = dict()
+        codes = dict()
+        for attr, values in self._all_attributes.items():
+            code = int(self.columns[f"attr/{attr}"][row])
+            if code >= 0:
+                attributes[attr] = values[code]
+                codes[attr] = code
+        return Event(self._all_types[type_code], attributes,
+                     float(self.columns["start"][row]), float(self.columns["end"][row]),
+                     codes=(type_code, codes))
+
+    def get_signals(self, row: int):
+        """
+        Returns the signals sent to the boxes after the event of a row.
+
+        :param row: int
+            The index of the row.
+        :return: tuple
+            The satisfied and active boolean arrays.
+        """
+        satisfied = np.unpackbits(self.columns["satisfied"][row], count=self.num_patterns).astype(bool)
+        active = np.unpackbits(self.columns["active"][row], count=self.num_patterns).astype(bool)
+        return satisfied, active
+
+    def get_episode(self, episode: int):
+        """
+        Returns the rows of an episode, which starts with its reset row.
+
+        :param episode: int
+            The index of the episode.
+        :return: tuple
+            The index of the first row of the episode and the index following its last row.
+        """
+        start = int(self.episode_starts[episode])
+        end = int(self.episode_starts[episode + 1]) if episode + 1 < len(self.episode_starts) else len(self)
+        return start, end
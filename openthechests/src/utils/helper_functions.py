@@ -1,7 +1,11 @@
+import os
 import random
 
 import numpy as np
-import yaml
+
+# YAML files are parsed with the C loader of libyaml when PyYAML was built with it, unless
+# OPENTHECHESTS_YAML_C_LOADER=0 is set or this flag is changed
+USE_C_YAML_LOADER = os.environ.get("OPENTHECHESTS_YAML_C_LOADER", "1") != "0"
 
 
 def bug_print(something="", msg=""):
@@ -24,20 +28,41 @@ def boxes_to_discrete(num_boxes):
     return 2 ** num_boxes
 
 
-def my_normal(mu, sigma):
+def my_normal(mu, sigma, size=None, rng=None):
     """
     Clipped normal distribution that makes sure no negative _time durations are generated.
     :param mu: Mean used for normal distribution.
     :param sigma: Variance used for normal distribution.
+    :param size: Number of values to sample at once, or None to sample a single value.
+    :param rng: The np.random.Generator to draw from, or None to use the global random generators.
     :return: A sampled duration of minimal value (mu - sigma) and maximal value (mu + sigma.
+             When size is given, an array of sampled durations is returned.
     """
     assert mu - sigma >= 0, "Allows negative _time durations"
-    res = random.normalvariate(mu, sigma)
+    if size is not None:
+        return np.clip((np.random if rng is None else rng).normal(mu, sigma, size), mu - sigma, mu + sigma)
+    res = random.normalvariate(mu, sigma) if rng is None else rng.normal(mu, sigma)
     res = max((mu - sigma), res)
     res = min((mu + sigma), res)
     return res
 
 
+def load_yaml(stream, c_loader=None):
+    """
+    Safely parses a YAML document, optionally using the C loader of libyaml, which is much faster than the pure
+    Python loader. The pure Python loader is used when PyYAML was built without libyaml.
+    yaml is imported on first use, so that the environments can be imported with NumPy only.
+
+    :param stream: The content of the document or an open file.
+    :param c_loader: Use the C loader when available, defaults to USE_C_YAML_LOADER.
+    :return: The parsed document.
+    """
+    import yaml
+    if c_loader is None:
+        c_loader = USE_C_YAML_LOADER
+    return yaml.load(stream, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader) if c_loader else yaml.SafeLoader)
+
+
 # TODO (priority 3) can this be more general?
 def to_stb3_obs_format(observation: dict):
     """
@@ -75,7 +100,7 @@ def parse_yaml_file(filename):
     """
     instructions = []
     with open(filename, "r") as f:
-        conf = yaml.safe_load(f)
+        conf = load_yaml(f)
     instructions.append({"command": "delay", "parameters": conf["GENERAL"]["delay"]})
     instructions.append({"command": "noise", "parameters": conf["GENERAL"]["noise"]})
     for event in conf["INSTANTIATE"]:
@@ -95,3 +120,40 @@ def parse_yaml_file(filename):
                      "other": other_params}
             instructions.append(instr)
     return instructions
+
+
+def parse_config_file(env_config_file, pattern_configs_folder=None):
+    """
+    Allows to parse a YAML environment configuration file and all the pattern files it references.
+    The result can be given directly as keyword arguments to the environment constructors.
+
+    :param env_config_file: The YAML environment configuration file to parse.
+    :param pattern_configs_folder: The folder containing the pattern files.
+                                   By default, the folder of the environment configuration file is used.
+    :return: Dictionary containing the instructions and all event and noise types and attributes.
+    """
+    with open(env_config_file, "r") as f:
+        conf = load_yaml(f)
+
+    all_event_types = conf["EVENT_TYPES"]["NORMAL"]
+    all_event_attributes = conf["EVENT_ATTRIBUTES"]["NORMAL"]
+
+    all_noise_types = []
+    if "NOISE" in conf["EVENT_TYPES"]:
+        all_noise_types = conf["EVENT_TYPES"]["NOISE"]
+    all_noise_attributes = []
+    if "NOISE" in conf["EVENT_ATTRIBUTES"]:
+        all_noise_attributes = conf["EVENT_ATTRIBUTES"]["NOISE"]
+
+    all_instructions = []
+    if pattern_configs_folder is None:
+        pattern_configs_folder = "/".join(env_config_file.split("/")[:-1])
+    for pattern_conf_file in conf["INSTRUCTIONS"]:
+        instr = parse_yaml_file(pattern_configs_folder + "/" + pattern_conf_file)
+        all_instructions.append(instr)
+
+    return {"instructions": all_instructions,
+            "all_event_types": all_event_types,
+            "all_event_attributes": all_event_attributes,
+            "all_noise_types": all_noise_types,
+            "all_noise_attributes": all_noise_attributes}
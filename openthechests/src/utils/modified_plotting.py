@@ -1,13 +1,12 @@
-from typing import Callable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
 
 import numpy as np
-import pandas as pd
 
+# pandas and stable_baselines3 are imported on first use, plots are drawn on matplotlib axes given by the caller
 # import matplotlib
 # matplotlib.use('TkAgg')  # Can change to 'Agg' for non-interactive mode
-from matplotlib import pyplot as plt
-
-from stable_baselines3.common.monitor import load_results
+if TYPE_CHECKING:
+    import pandas as pd
 
 X_TIMESTEPS = "timesteps"
 X_EPISODES = "episodes"
@@ -42,7 +41,7 @@ def window_func(var_1: np.ndarray, var_2: np.ndarray, window: int, func: Callabl
     return var_1[window - 1 :], function_on_var2
 
 
-def ts2xy(data_frame: pd.DataFrame, x_axis: str) -> Tuple[np.ndarray, np.ndarray]:
+def ts2xy(data_frame: "pd.DataFrame", x_axis: str) -> Tuple[np.ndarray, np.ndarray]:
     """
     Decompose a data frame variable to x ans ys
     :param data_frame: the input data
@@ -107,6 +106,8 @@ def plot_results(
     :param figsize: Size of the figure (width, height)
     """
 
+    from stable_baselines3.common.monitor import load_results
+
     data_frames = []
     for folder in dirs:
         data_frame = load_results(folder)
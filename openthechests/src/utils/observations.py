@@ -0,0 +1,217 @@
+import numpy as np
+
+
+class ObservationBuffer:
+    """
+    Preallocated arrays holding the Stable Baselines 3 observation of an environment.
+    The arrays follow the keys, shapes and dtypes of OpenTheChestsGym.observation_space and are updated in place at
+    each step, so that producing an observation allocates no new arrays.
+
+    Note: When returned without copy, the observation is overwritten by the next step or reset.
+    Observations that must be kept, for example terminal observations stored by vectorized environments,
+    should be copied or the buffer should be created with copy=True.
+
+    Attributes:
+    -----------
+    observation : dict
+        Dictionary of arrays following the Stable Baselines 3 format:
+            - "active", "open": int8 arrays of shape (num_boxes,)
+            - "e_type" and one entry per attribute: int64 arrays of shape ()
+            - "start", "end", "duration": float32 arrays of shape (1,)
+    copy : bool
+        Flag to return a copy of the arrays instead of the arrays themselves.
+
+    Methods:
+    --------
+    write(box_bank, context, labels):
+        Writes the box states and context into the arrays.
+    get():
+        Returns the current observation.
+    """
+    def __init__(self,
+                 all_attributes: dict,
+                 num_boxes: int,
+                 copy: bool = False):
+        """
+        Allocates the observation arrays.
+
+        :param all_attributes: dict
+            Dictionary of all attributes and their possible values, as given by Parser.all_attributes.
+        :param num_boxes: int
+            The number of boxes in the environment.
+        :param copy: bool, optional
+            Flag to return a copy of the arrays instead of the arrays themselves (default is False).
+        """
+        self.copy = copy
+        self.observation = {"active": np.zeros(num_boxes, dtype=np.int8),
+                            "open": np.zeros(num_boxes, dtype=np.int8),
+                            "e_type": np.zeros((), dtype=np.int64),
+                            **{attr: np.zeros((), dtype=np.int64) for attr in all_attributes},
+                            "start": np.zeros(1, dtype=np.float32),
+                            "end": np.zeros(1, dtype=np.float32),
+                            "duration": np.zeros(1, dtype=np.float32)}
+        self._attributes = [(attr, self.observation[attr]) for attr in all_attributes]
+
+    def write(self, box_bank, context, labels):
+        """
+        Writes the box states and the labelled context into the arrays.
+        Attributes that are not defined for the context are set to 0.
+
+        :param box_bank: BoxBank
+            The states of the environment boxes.
+        :param context: Event
+            The last observed event.
+        :param labels: tuple
+            The codes of the context type and attributes, as given by Parser.label.
+        :return: dict
+            The updated observation.
+        """
+        self.observation["active"][:] = box_bank.active
+        self.observation["open"][:] = box_bank.open
+
+        e_type, attributes = labels
+        self.observation["e_type"][()] = e_type
+        for attr, value in self._attributes:
+            value[()] = attributes.get(attr, 0)
+
+        self.observation["start"][0] = context.start
+        self.observation["end"][0] = context.end
+        self.observation["duration"][0] = context.end - context.start
+        return self.get()
+
+    def get(self):
+        """
+        Returns the current observation, copied if the copy flag is set.
+
+        :return: dict
+            The observation arrays.
+        """
+        if self.copy:
+            return {key: value.copy() for key, value in self.observation.items()}
+        return self.observation
+
+
+class FlatObservationBuffer:
+    """
+    Preallocated float32 vector holding a flat observation of an environment, suited for MLP policies.
+    The vector is written directly from the box states and the context codes, and updated in place at each step.
+
+    The vector is made of the following consecutive blocks, whose positions are given by the layout attribute:
+        - "active", "open": one value per box, 1 when the box is active or open
+        - "e_type": the context type, one-hot encoded over all types or given as its integer code
+        - one block per attribute: the context attribute value, one-hot encoded or given as its integer code
+        - "start", "end", "duration": the context times
+    Attributes that are not defined for the context are encoded as zeros.
+
+    Note: When returned without copy, the observation is overwritten by the next step or reset.
+
+    Attributes:
+    -----------
+    observation : np.ndarray
+        The flat observation vector.
+    layout : dict
+        Dictionary mapping each block name to its slice in the observation vector.
+    high : np.ndarray
+        The largest possible value of each entry of the observation vector.
+    encoding : str
+        The encoding of the type and attributes, "onehot" or "integer".
+    copy : bool
+        Flag to return a copy of the vector instead of the vector itself.
+
+    Methods:
+    --------
+    write(box_bank, context, labels):
+        Writes the box states and context into the vector.
+    get():
+        Returns the current observation.
+    """
+    def __init__(self,
+                 all_types: list,
+                 all_attributes: dict,
+                 num_boxes: int,
+                 encoding: str = "onehot",
+                 copy: bool = False):
+        """
+        Computes the layout of the flat observation and allocates the vector.
+
+        :param all_types: list
+            List of all event and noise types, as given by Parser.all_types.
+        :param all_attributes: dict
+            Dictionary of all attributes and their possible values, as given by Parser.all_attributes.
+        :param num_boxes: int
+            The number of boxes in the environment.
+        :param encoding: str, optional
+            The encoding of the type and attributes, "onehot" or "integer" (default is "onehot").
+        :param copy: bool, optional
+            Flag to return a copy of the vector instead of the vector itself (default is False).
+        """
+        assert encoding in ["onehot", "integer"], f"Unknown encoding {encoding}, please select \"onehot\" or \"integer\"."
+        self.encoding = encoding
+        self.copy = copy
+
+        block_sizes = {"active": (num_boxes, 1), "open": (num_boxes, 1)}
+        for key, num_values in [("e_type", len(all_types))] + [(attr, len(values))
+                                                               for attr, values in all_attributes.items()]:
+            block_sizes[key] = (num_values, 1) if encoding == "onehot" else (1, num_values - 1)
+        block_sizes.update({"start": (1, np.inf), "end": (1, np.inf), "duration": (1, np.inf)})
+
+        self.layout = dict()
+        highs = []
+        offset = 0
+        for key, (size, high) in block_sizes.items():
+            self.layout[key] = slice(offset, offset + size)
+            highs.append(np.full(size, high, dtype=np.float32))
+            offset += size
+        self.high = np.concatenate(highs)
+        self.observation = np.zeros(offset, dtype=np.float32)
+
+        self._active = self.observation[self.layout["active"]]
+        self._open = self.observation[self.layout["open"]]
+        self._codes = [(attr, self.observation[self.layout[attr]]) for attr in all_attributes]
+        self._type = self.observation[self.layout["e_type"]]
+        self._times = self.observation[self.layout["start"].start:self.layout["duration"].stop]
+
+    def write(self, box_bank, context, labels):
+        """
+        Writes the box states and the labelled context into the vector.
+
+        :param box_bank: BoxBank
+            The states of the environment boxes.
+        :param context: Event
+            The last observed event.
+        :param labels: tuple
+            The codes of the context type and attributes, as given by Parser.label.
+        :return: np.ndarray
+            The updated observation.
+        """
+        self._active[:] = box_bank.active
+        self._open[:] = box_bank.open
+
+        e_type, attributes = labels
+        if self.encoding == "onehot":
+            self._type[:] = 0
+            self._type[e_type] = 1
+            for attr, block in self._codes:
+                block[:] = 0
+                if attr in attributes:
+                    block[attributes[attr]] = 1
+        else:
+            self._type[0] = e_type
+            for attr, block in self._codes:
+                block[0] = attributes.get(attr, 0)
+
+        self._times[0] = context.start
+        self._times[1] = context.end
+        self._times[2] = context.end - context.start
+        return self.get()
+
+    def get(self):
+        """
+        Returns the current observation, copied if the copy flag is set.
+
+        :return: np.ndarray
+            The observation vector.
+        """
+        if self.copy:
+            return self.observation.copy()
+        return self.observation
@@ -0,0 +1,48 @@
+
+def get_oracle_action(env):
+    """
+    Computes the optimal action of an environment from its box bank: pressing the buttons of the ready boxes.
+    A ready box gives +1 when pressed and -1 when ignored, pressing any other button gives -1, and opening a box only
+    disables the timeline of its own pattern, so pressing exactly the ready boxes gives the highest return.
+
+    :param env: OpenTheChests, OpenTheChestsGym or OpenTheChestsVec
+        The environment, batched environments giving one action per environment.
+    :return: np.ndarray or int
+        The action, encoded by the action codec of the environment.
+    """
+    # gym wrappers hold the environment in env, checked without importing gym
+    if not hasattr(env, "box_bank"):
+        env = env.env
+    ready = env.box_bank.ready
+    if ready.ndim == 2:
+        return env.action_codec.encode_batch(ready)
+    return env.action_codec.encode(ready)
+
+
+class OraclePolicy:
+    """
+    Policy taking the optimal action of an environment, read from its box bank.
+    It follows the predict interface of Stable Baselines 3 models, so that it can be evaluated with the functions of
+    evaluators, for example evaluate_multiple_times(env, OraclePolicy(env)).
+
+    Attributes:
+    -----------
+    env : OpenTheChests, OpenTheChestsGym or OpenTheChestsVec
+        The environment whose boxes are read, which must be the evaluated environment.
+
+    Methods:
+    --------
+    predict(observation, state=None, episode_start=None, deterministic=True):
+        Returns the optimal action of the current step.
+    """
+    def __init__(self, env):
+        self.env = env
+
+    def predict(self, observation, state=None, episode_start=None, deterministic=True):
+        """
+        Returns the optimal action of the current step, the observation being ignored.
+
+        :return: tuple
+            The action and None, the policy having no hidden state.
+        """
+        return get_oracle_action(self.env), None
@@ -0,0 +1,157 @@
+import time
+
+# phases timed by the profiler, with the object and method they correspond to
+PHASES = {"step": ("env", "step"),
+          "apply_action": ("env", "_apply_action"),
+          "next_event": ("generator", "next_event"),
+          "fill_event_stack": ("generator", "_fill_event_stack"),
+          "update_boxes": ("env", "_update_boxes"),
+          "get_observations": ("env", "get_observations"),
+          "check_end": ("env", "check_end")}
+
+
+class StepProfiler:
+    """
+    Counters accumulating the wall time and number of calls of each phase of a step, as well as the number of
+    generated events, noise events and refills of each box.
+    A profiler is enabled with OpenTheChests.enable_profiling, which replaces the methods of the phases by timed
+    versions on the environment instance only. Environments without profiler run the untimed methods and pay no cost.
+
+    Note: When a tracer is also used, it should be attached before enabling profiling and detached after disabling
+    it, since both replace some of the same methods.
+
+    Phases:
+        - "step": the whole step, including the other phases.
+        - "apply_action": OpenTheChests._apply_action.
+        - "next_event": Generator.next_event, including the refills it triggers.
+        - "fill_event_stack": Generator._fill_event_stack, sampling a new pattern instance (refills and resets).
+        - "update_boxes": OpenTheChests._update_boxes.
+        - "get_observations": OpenTheChests.get_observations (building stb3, buffer or flat observations).
+        - "check_end": OpenTheChests.check_end.
+
+    Attributes:
+    -----------
+    times : dict
+        The accumulated wall time of each phase, in nanoseconds.
+    calls : dict
+        The number of calls of each phase.
+    num_events : int
+        The number of pattern events generated.
+    num_noise_events : int
+        The number of noise events generated.
+    refills : list
+        The number of refills of each box, made each time its pattern has been fully played.
+
+    Methods:
+    --------
+    attach(env):
+        Replaces the methods of the environment phases by timed versions.
+    detach():
+        Restores the methods replaced by attach.
+    is_attached():
+        Returns whether the profiler is attached to an environment.
+    clear():
+        Sets all counters to zero.
+    summary():
+        Returns the counters as a dictionary.
+    """
+    def __init__(self, num_boxes: int):
+        """
+        Initializes the counters to zero.
+
+        :param num_boxes: int
+            The number of boxes of the profiled environment.
+        """
+        self._num_boxes = num_boxes
+        self._replaced = []
+        self.times = dict.fromkeys(PHASES, 0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.clear()
+
+    def clear(self):
+        # the dictionaries are updated in place since the timed methods hold references to them
+        for phase in PHASES:
+            self.times[phase] = 0
+            self.calls[phase] = 0
+        self.num_events = 0
+        self.num_noise_events = 0
+        self.refills = [0] * self._num_boxes
+
+    def attach(self, env):
+        """
+        Replaces the methods of the environment phases by timed versions, on the given instances only.
+        Does nothing if the profiler is already attached.
+
+        :param env: OpenTheChests
+            The environment to profile.
+        """
+        if self.is_attached():
+            return
+        owners = {"env": env, "generator": env.generator}
+        for phase, (owner, name) in PHASES.items():
+            obj = owners[owner]
+            method = getattr(obj, name)
+            timed = self._timed_fill(method) if phase == "fill_event_stack" else self._timed(phase, method)
+            self._replaced.append((obj, name, obj.__dict__.get(name)))
+            setattr(obj, name, timed)
+
+    def detach(self):
+        """
+        Restores the methods replaced by attach.
+        """
+        for obj, name, previous in reversed(self._replaced):
+            if previous is None:
+                obj.__dict__.pop(name, None)
+            else:
+                setattr(obj, name, previous)
+        self._replaced = []
+
+    def is_attached(self):
+        return bool(self._replaced)
+
+    def _timed(self, phase, method):
+        times = self.times
+        calls = self.calls
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter_ns()
+            result = method(*args, **kwargs)
+            times[phase] += time.perf_counter_ns() - start
+            calls[phase] += 1
+            return result
+        return timed
+
+    def _timed_fill(self, method):
+        times = self.times
+        calls = self.calls
+
+        def timed_fill(t, pattern, last_generated_event=None):
+            start = time.perf_counter_ns()
+            stack = method(t, pattern, last_generated_event)
+            times["fill_event_stack"] += time.perf_counter_ns() - start
+            calls["fill_event_stack"] += 1
+            # full_pattern holds the generated events, preceded by the last event of the previous instance if any
+            num_events = len(pattern.full_pattern) - (last_generated_event is not None)
+            self.num_events += num_events
+            self.num_noise_events += len(stack) - num_events
+            if last_generated_event is not None:
+                self.refills[pattern.id] += 1
+            return stack
+        return timed_fill
+
+    def summary(self):
+        """
+        Returns the counters as a dictionary, with for each phase its number of calls, total time in milliseconds and
+        mean time per call in microseconds.
+
+        :return: dict
+            The counters of the phases and of the generated events.
+        """
+        phases = {phase: {"calls": self.calls[phase],
+                          "total_ms": self.times[phase] / 1e6,
+                          "mean_us": self.times[phase] / 1e3 / self.calls[phase] if self.calls[phase] else 0.}
+                  for phase in PHASES}
+        return {"phases": phases,
+                "num_events": self.num_events,
+                "num_noise_events": self.num_noise_events,
+                "refills": list(self.refills)}
@@ -0,0 +1,229 @@
+class Tracer:
+    """
+    Hook receiving the internal evolution of an environment, for debugging.
+    A tracer is attached with OpenTheChests.attach_tracer, which replaces the environment methods by traced versions
+    calling the hooks below. Environments without tracer run the untraced methods and pay no cost for tracing.
+    Every hook does nothing by default, subclasses only override the ones they need.
+
+    Methods:
+    --------
+    attached(env):
+        Called when the tracer is attached to an environment.
+    reset_started():
+        Called at the beginning of a reset.
+    reset_done(observation):
+        Called at the end of a reset.
+    step_started(action):
+        Called at the beginning of a step with the action given by the user.
+    action_applied(action, reward):
+        Called once the action has been applied to the boxes.
+    internal_step_started(timeline):
+        Called before advancing the timeline, with the next event of each pattern.
+    event_observed(event, satisfied, active, time):
+        Called once the next event has been retrieved, with the signal arrays sent to the boxes.
+    box_transition(box_id, transition):
+        Called for each change of state of a box, "open", "deactivate", "activate" or "ready".
+    event_popped(pattern_id, record):
+        Called each time the generator takes the next event of a pattern, with its record of Parser.event_dtype.
+    pattern_sampled(pattern_id, events):
+        Called each time a new instance of a pattern is sampled.
+    step_done(observation, reward, done):
+        Called at the end of a step.
+    """
+    def attached(self, env):
+        pass
+
+    def reset_started(self):
+        pass
+
+    def reset_done(self, observation):
+        pass
+
+    def step_started(self, action):
+        pass
+
+    def action_applied(self, action, reward):
+        pass
+
+    def internal_step_started(self, timeline):
+        pass
+
+    def event_observed(self, event, satisfied, active, time):
+        pass
+
+    def box_transition(self, box_id, transition):
+        pass
+
+    def event_popped(self, pattern_id, record):
+        pass
+
+    def pattern_sampled(self, pattern_id, events):
+        pass
+
+    def step_done(self, observation, reward, done):
+        pass
+
+
+class PrintTracer(Tracer):
+    """
+    Tracer printing the evolution of the environment, used when the environment is created with verbose=True.
+    """
+    def attached(self, env):
+        print(f"All event types : {env.parser.all_event_types}")
+        print(f"All noise types : {env.parser.all_noise_types}")
+        print(f"All event attributes : {env.parser.all_event_attributes}")
+        print(f"All noise attributes : {env.parser.all_noise_attributes}")
+        print(f"Initialising {env.get_num_boxes()} boxes with patterns")
+
+    def reset_started(self):
+        print("Starting Reset")
+
+    def reset_done(self, observation):
+        print("Reset Done")
+
+    def step_started(self, action):
+        print("\nStart Step")
+
+    def action_applied(self, action, reward):
+        print(f"Applying action {action}")
+
+    def internal_step_started(self, timeline):
+        print("Making one internal step to get context and advance timeline")
+        print(f"Active timeline {timeline}")
+
+    def event_observed(self, event, satisfied, active, time):
+        print(f"Finding closes end value {time}")
+        print(f"Advancing _time to {time}")
+        print(f"Observing context {event}")
+
+    def box_transition(self, box_id, transition):
+        print({"open": "Opening", "deactivate": "Deactivating", "activate": "Activating", "ready": "Ready"}[transition]
+              + f" box {box_id}")
+
+    def pattern_sampled(self, pattern_id, events):
+        print(f"Sampling pattern {list(events)}")
+
+    def step_done(self, observation, reward, done):
+        print("Step Done \n")
+
+
+class RecordingTracer(Tracer):
+    """
+    Tracer keeping one record per reset and step, to be inspected offline.
+
+    Each record is a dictionary with the following entries:
+        - "kind": "reset" or "step"
+        - "action": the action given by the user (None for resets)
+        - "reward", "done": the results of the step (None for resets)
+        - "time": the environment time after the step
+        - "event": the observed event
+        - "signal": the signal sent to the boxes, as a dictionary mapping pattern IDs to lists of "satisfied"
+          and "active" flags
+        - "transitions": list of (box_id, transition) tuples, in order
+        - "sampled": list of (pattern_id, events) tuples for the pattern instances sampled during the step
+
+    Attributes:
+    -----------
+    records : list
+        The list of records, in order.
+    max_records : int
+        The maximum number of records kept, older records being dropped first, or None to keep all records.
+
+    Methods:
+    --------
+    clear():
+        Removes all records.
+    """
+    def __init__(self, max_records: int = None):
+        """
+        Initializes an empty recording.
+
+        :param max_records: int, optional
+            The maximum number of records kept (default is None, keeping all records).
+        """
+        self.records = []
+        self.max_records = max_records
+        self._current = None
+
+    def clear(self):
+        self.records = []
+        self._current = None
+
+    def _start_record(self, kind, action):
+        self._current = {"kind": kind, "action": action, "reward": None, "done": None, "time": None,
+                         "event": None, "signal": None, "transitions": [], "sampled": []}
+        self.records.append(self._current)
+        if self.max_records is not None and len(self.records) > self.max_records:
+            del self.records[0]
+
+    def reset_started(self):
+        self._start_record("reset", None)
+
+    def step_started(self, action):
+        self._start_record("step", action)
+
+    def event_observed(self, event, satisfied, active, time):
+        self._current["event"] = event
+        self._current["signal"] = get_signal_dict(satisfied, active)
+        self._current["time"] = time
+
+    def box_transition(self, box_id, transition):
+        self._current["transitions"].append((box_id, transition))
+
+    def pattern_sampled(self, pattern_id, events):
+        if self._current is not None:
+            self._current["sampled"].append((pattern_id, list(events)))
+
+    def step_done(self, observation, reward, done):
+        self._current["reward"] = reward
+        self._current["done"] = done
+
+
+def get_signal_dict(satisfied, active):
+    """
+    Turns the signal arrays sent by the Generator into a readable dictionary.
+
+    :param satisfied: Boolean array indicating which patterns are satisfied.
+    :param active: Boolean array indicating which patterns are active.
+    :return: Dictionary mapping the ID of each signaled pattern to its list of "satisfied" and "active" flags.
+    """
+    signal = dict()
+    for pattern_id in (satisfied | active).nonzero()[0].tolist():
+        signal[pattern_id] = ["satisfied"] * bool(satisfied[pattern_id]) + ["active"] * bool(active[pattern_id])
+    return signal
+
+
+def get_box_states(box_bank):
+    """
+    Returns a summary of the box states used to find box transitions.
+
+    :param box_bank: The BoxBank storing the states of the environment boxes.
+    :return: List of (active, ready, open, num_deactivations) tuples.
+    """
+    return list(zip(box_bank.active.tolist(), box_bank.ready.tolist(), box_bank.open.tolist(),
+                    box_bank.num_deactivations.tolist()))
+
+
+def get_box_transitions(before, after):
+    """
+    Finds the transitions a box went through between two states, in the order in which InteractiveBox applies them.
+    A box can be deactivated, activated and made ready during the same update, so the number of deactivations is
+    used to detect transitions that leave the state unchanged.
+
+    :param before: The (active, ready, open, num_deactivations) state of the box before the change.
+    :param after: The (active, ready, open, num_deactivations) state of the box after the change.
+    :return: The list of transitions among "open", "deactivate", "activate" and "ready".
+    """
+    was_active, was_ready, was_open, deactivations_before = before
+    active, ready, open, deactivations_after = after
+    transitions = []
+    if open and not was_open:
+        transitions.append("open")
+    deactivated = deactivations_after > deactivations_before
+    if deactivated:
+        transitions.append("deactivate")
+    if active and (deactivated or not was_active):
+        transitions.append("activate")
+    if ready and (deactivated or not was_ready):
+        transitions.append("ready")
+    return transitions
@@ -0,0 +1,23 @@
+import pytest
+
+from openthechests.src.utils.helper_functions import parse_config_file
+
+CONFIG_FILE = "docs/examples/create_env/example_config/multiple_per_box.yaml"
+
+
+@pytest.fixture(params=["durations", "missing_durations"])
+def config(request):
+    """
+    The parsed example configuration. With missing_durations, events not related by during have no duration, so that
+    their durations are drawn from the range of the durations instantiated so far by the parser.
+    """
+    config = parse_config_file(CONFIG_FILE)
+    if request.param == "missing_durations":
+        for instructions in config["instructions"]:
+            # events related by during keep their durations so that the contained event stays the shortest
+            contained = {name for command in instructions if command["command"] == "during"
+                         for name in command["parameters"]}
+            for command in instructions:
+                if command["command"] == "instantiate" and command["variable_name"] not in contained:
+                    command["parameters"] = command["parameters"][:2] + (None,)
+    return config
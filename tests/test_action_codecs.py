@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from openthechests.src.utils.action_codecs import ACTION_CODECS, ActionCodec, DiscreteCodec, MultiDiscreteCodec, \
+    SparseCodec
+
+
+@pytest.mark.parametrize("name", list(ACTION_CODECS))
+@pytest.mark.parametrize("num_boxes", [1, 3, 9, 20])
+def test_round_trip(name, num_boxes):
+    codec = ACTION_CODECS[name](num_boxes)
+    pressed = np.random.default_rng(0).integers(0, 2, (50, num_boxes))
+    assert (codec.decode_batch(codec.encode_batch(pressed)) == pressed).all()
+    for row in pressed[:5]:
+        assert (codec.decode(codec.encode(row)) == row).all()
+
+
+def test_discrete_bit_order():
+    assert DiscreteCodec(3).decode(4).tolist() == [1, 0, 0]
+    assert DiscreteCodec(20).decode(1).tolist() == [0] * 19 + [1]
+
+
+@pytest.mark.parametrize("num_boxes, action", [(3, -1), (3, -2), (3, 2 ** 3), (20, -1), (20, 2 ** 20)])
+def test_discrete_out_of_range(num_boxes, action):
+    codec = DiscreteCodec(num_boxes)
+    with pytest.raises(AssertionError):
+        codec.decode(action)
+    with pytest.raises(AssertionError):
+        codec.decode_batch([0, action])
+
+
+@pytest.mark.parametrize("action", [[-1], [4], [0, 4, 3]])
+def test_sparse_out_of_range(action):
+    codec = SparseCodec(3)
+    with pytest.raises(AssertionError):
+        codec.decode(action)
+    with pytest.raises(AssertionError):
+        codec.decode_batch([action])
+
+
+@pytest.mark.parametrize("action", [[-1, 0], [256, 0], [0, 8], [0]])
+def test_multidiscrete_out_of_range(action):
+    codec = MultiDiscreteCodec(11)
+    with pytest.raises(AssertionError):
+        codec.decode(action)
+
+
+def test_incomplete_codec():
+    class IncompleteCodec(ActionCodec):
+        def get_space(self):
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteCodec(3)
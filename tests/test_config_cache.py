@@ -0,0 +1,71 @@
+import os
+import shutil
+
+from openthechests.src.utils.config_cache import build_config_cache, load_config
+from openthechests.src.utils.helper_functions import load_yaml, parse_config_file
+
+CONFIG_FOLDER = "docs/examples/create_env/example_config"
+
+
+def copy_config(tmp_path):
+    shutil.copytree(CONFIG_FOLDER, tmp_path / "config")
+    return str(tmp_path / "config" / "multiple_per_box.yaml")
+
+
+def get_pattern_file(config_file):
+    return os.path.join(os.path.dirname(config_file), "multiple_per_box", "A.yaml")
+
+
+def test_cached_config(tmp_path):
+    config_file = copy_config(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    expected = parse_config_file(config_file)
+    (cache_file,) = build_config_cache(config_file, cache_dir=cache_dir)
+    assert os.listdir(cache_dir) == [os.path.basename(cache_file)]
+    assert load_config(config_file, cache_dir=cache_dir) == expected
+
+
+def test_touched_pattern_file(tmp_path):
+    config_file = copy_config(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    (cache_file,) = build_config_cache(config_file, cache_dir=cache_dir)
+    os.utime(get_pattern_file(config_file), ns=(1, 1))
+    modified = os.stat(cache_file).st_mtime_ns
+
+    # loading does not rewrite the entry, building the cache does
+    assert load_config(config_file, cache_dir=cache_dir) == parse_config_file(config_file)
+    assert os.stat(cache_file).st_mtime_ns == modified
+    build_config_cache(config_file, cache_dir=cache_dir)
+    assert os.stat(cache_file).st_mtime_ns != modified
+
+
+def test_modified_pattern_file(tmp_path):
+    config_file = copy_config(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    build_config_cache(config_file, cache_dir=cache_dir)
+    with open(get_pattern_file(config_file)) as file:
+        content = file.read()
+    with open(get_pattern_file(config_file), "w") as file:
+        file.write(content.replace("delay: 10", "delay: 11"))
+    assert load_config(config_file, cache_dir=cache_dir)["instructions"][0][0] == {"command": "delay",
+                                                                                   "parameters": 11}
+
+
+def test_corrupted_cache_file(tmp_path):
+    config_file = copy_config(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    (cache_file,) = build_config_cache(config_file, cache_dir=cache_dir)
+    with open(cache_file, "rb") as file:
+        content = file.read()
+    # a truncated file, and a pickle referencing a missing class
+    for corrupted in [content[:len(content) // 2], b"\x80\x04\x95\x1a\x00\x00\x00\x00\x00\x00\x00\x8c\x08builtins"
+                                                   b"\x94\x8c\x0cMissingClass\x94\x93\x94."]:
+        with open(cache_file, "wb") as file:
+            file.write(corrupted)
+        assert load_config(config_file, cache_dir=cache_dir) == parse_config_file(config_file)
+
+
+def test_yaml_loaders():
+    with open(os.path.join(CONFIG_FOLDER, "multiple_per_box.yaml")) as file:
+        content = file.read()
+    assert load_yaml(content, c_loader=True) == load_yaml(content, c_loader=False)
@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from openthechests.src.OpenTheChestsGym import OpenTheChestsGym
+from openthechests.src.utils.event_log import SKIP, EventLog, EventLogRecorder
+from openthechests.src.utils.tracing import RecordingTracer
+
+CONFIG_FILE = "docs/examples/create_env/example_config/multiple_per_box.yaml"
+
+
+def make_env(**kwargs):
+    return OpenTheChestsGym.from_config_file(env_config_file=CONFIG_FILE, **kwargs).env
+
+
+def play(env, num_steps, seed=0):
+    """
+    Plays an episode pressing the ready boxes and some random buttons, resetting the environment when it is done.
+
+    :return: The list of actions, None marking resets, and the list of (reward, done) results.
+    """
+    rng = np.random.default_rng(seed)
+    actions = []
+    results = []
+    env.reset(seed=seed)
+    for _ in range(num_steps):
+        action = (env.box_bank.ready | (rng.random(env.get_num_boxes()) < 0.1)).astype(int)
+        _, reward, done, _ = env.step(action)
+        actions.append(action)
+        results.append((reward, done))
+        if done:
+            env.reset()
+            actions.append(None)
+            results.append(None)
+    return actions, results
+
+
+def test_recorder_refuses_attached_tracer(tmp_path):
+    env = make_env()
+    env.attach_tracer(RecordingTracer())
+    with pytest.raises(AssertionError):
+        EventLogRecorder(str(tmp_path)).attach(env)
+
+    env.detach_tracer()
+    recorder = EventLogRecorder(str(tmp_path))
+    recorder.attach(env)
+    play(env, 20)
+    recorder.close()
+    assert len(EventLog(str(tmp_path))) == recorder.num_rows > 0
+
+
+def test_tracer_refused_while_recording(tmp_path):
+    env = make_env()
+    recorder = EventLogRecorder(str(tmp_path))
+    recorder.attach(env)
+    with pytest.raises(AssertionError):
+        env.attach_tracer(RecordingTracer())
+    with pytest.raises(AssertionError):
+        env.detach_tracer()
+    play(env, 20)
+    recorder.close()
+    assert env.tracer is None
+    assert len(EventLog(str(tmp_path))) == recorder.num_rows > 0
+
+    tracer = RecordingTracer()
+    env.attach_tracer(tracer)
+    env.reset()
+    env.step([0, 0, 0])
+    assert [record["kind"] for record in tracer.records] == ["reset", "step"]
+    assert len(EventLog(str(tmp_path))) == recorder.num_rows
+
+
+def test_recording_while_profiling(tmp_path):
+    env = make_env()
+    env.enable_profiling()
+    recorder = EventLogRecorder(str(tmp_path))
+    recorder.attach(env)
+    play(env, 50)
+    recorder.close()
+    assert env.get_profile()["phases"]["step"]["calls"] == 50
+    assert len(EventLog(str(tmp_path))) == recorder.num_rows > 50
+
+
+def test_replay(tmp_path):
+    env = make_env()
+    recorder = EventLogRecorder(str(tmp_path))
+    recorder.attach(env)
+    actions, results = play(env, 500)
+    recorder.close()
+
+    replayed = make_env()
+    replayed.replay(str(tmp_path))
+    replayed.reset()
+    for action, result in zip(actions, results):
+        if action is None:
+            replayed.reset()
+        else:
+            _, reward, done, _ = replayed.step(action)
+            assert (reward, done) == result
+
+
+def test_replay_macro_steps(tmp_path):
+    env = make_env(macro_step=True)
+    recorder = EventLogRecorder(str(tmp_path))
+    recorder.attach(env)
+    actions, results = play(env, 300)
+    recorder.close()
+    log = EventLog(str(tmp_path))
+    assert len(log) > len(actions) + 1
+
+    replayed = make_env(macro_step=True)
+    replayed.replay(str(tmp_path))
+    replayed.reset()
+    for action, result in zip(actions, results):
+        if action is None:
+            replayed.reset()
+        else:
+            _, reward, done, info = replayed.step(action)
+            assert (reward, done) == result
+
+
+def test_skip_rows_match_skipped_events(tmp_path):
+    env = make_env(macro_step=True)
+    recorder = EventLogRecorder(str(tmp_path))
+    recorder.attach(env)
+    rng = np.random.default_rng(0)
+    env.reset(seed=0)
+    skipped_events = env.reset_skipped_events
+    for _ in range(300):
+        _, _, done, info = env.step(env.box_bank.ready | (rng.random(env.get_num_boxes()) < 0.1))
+        skipped_events += info["skipped_events"]
+        if done:
+            env.reset()
+            skipped_events += env.reset_skipped_events
+    recorder.close()
+    assert skipped_events > 0
+    assert np.count_nonzero(EventLog(str(tmp_path)).columns["kind"] == SKIP) == skipped_events
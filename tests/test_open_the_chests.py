@@ -0,0 +1,91 @@
+import pickle
+import random
+
+import numpy as np
+import pytest
+
+from openthechests.src.OpenTheChestsGym import OpenTheChestsGym
+
+CONFIG_FILE = "docs/examples/create_env/example_config/multiple_per_box.yaml"
+
+
+def test_rewards_are_ints():
+    env = OpenTheChestsGym.from_config_file(env_config_file=CONFIG_FILE).env
+    rng = np.random.default_rng(0)
+    env.reset(seed=0)
+    for _ in range(200):
+        _, reward, done, _ = env.step(rng.integers(0, 2, env.get_num_boxes()))
+        assert type(reward) is int
+        if done:
+            env.reset()
+
+
+def make_env(**kwargs):
+    return OpenTheChestsGym.from_config_file(env_config_file=CONFIG_FILE, **kwargs).env
+
+
+def make_actions(num_steps, seed=0):
+    return np.random.default_rng(seed).integers(0, 2, (num_steps, 3))
+
+
+def as_lists(obs):
+    return {key: np.asarray(value).tolist() for key, value in obs.items()}
+
+
+def rollout(env, actions):
+    """
+    Steps the environment with the given actions, resetting it when it is done.
+
+    :return: The list of (observation, reward, done) results, observations being converted to lists.
+    """
+    trajectory = []
+    for action in actions:
+        obs, reward, done, _ = env.step(action)
+        if done:
+            obs = env.reset()
+        trajectory.append((as_lists(obs), reward, done))
+    return trajectory
+
+
+def test_heap_scheduler_matches_scan():
+    actions = make_actions(1000)
+    scan = make_env()
+    heap = make_env(scheduler="heap")
+    assert as_lists(heap.reset(seed=3)) == as_lists(scan.reset(seed=3))
+    trajectory = rollout(scan, actions)
+    assert sum(done for _, _, done in trajectory) >= 3
+    assert rollout(heap, actions) == trajectory
+
+
+def test_seeded_reset_is_reproducible():
+    actions = make_actions(500)
+    env = make_env()
+    first_obs = as_lists(env.reset(seed=5))
+    trajectory = rollout(env, actions)
+
+    # the global random generators are not used by seeded environments
+    random.seed(1)
+    np.random.seed(1)
+    other = make_env()
+    assert as_lists(other.reset(seed=5)) == first_obs
+    assert rollout(other, actions) == trajectory
+    env.reset(seed=6)
+    assert rollout(env, actions) != trajectory
+
+
+@pytest.mark.parametrize("scheduler", ["scan", "heap"])
+@pytest.mark.parametrize("num_steps", [5, 137])
+def test_restored_snapshot_continues_identically(config, scheduler, num_steps):
+    env = OpenTheChestsGym(**config, scheduler=scheduler).env
+    env.reset(seed=3)
+    rollout(env, make_actions(num_steps, seed=1))
+    state = env.get_state()
+    actions = make_actions(300, seed=2)
+    continuation = rollout(env, actions)
+    assert sum(done for _, _, done in continuation) >= 1
+
+    env.set_state(pickle.loads(pickle.dumps(state)))
+    assert rollout(env, actions) == continuation
+    fresh = OpenTheChestsGym(**config, scheduler=scheduler).env
+    fresh.set_state(pickle.loads(pickle.dumps(state)))
+    assert rollout(fresh, actions) == continuation
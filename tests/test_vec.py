@@ -0,0 +1,41 @@
+import numpy as np
+
+from openthechests.src.OpenTheChestsGym import OpenTheChestsGym
+from openthechests.src.OpenTheChestsVec import OpenTheChestsVec
+
+
+def assert_same_observation(vec_obs, idx, obs):
+    assert vec_obs.keys() == obs.keys()
+    for key, value in obs.items():
+        assert np.array_equal(vec_obs[key][idx], value), key
+
+
+def test_vec_matches_scalar_envs(config):
+    num_envs = 4
+    seed = 11
+    vec = OpenTheChestsVec(num_envs, **config)
+    envs = [OpenTheChestsGym(**config, stb3=True) for _ in range(num_envs)]
+
+    vec_obs = vec.reset(seed=seed)
+    for idx, (env, env_seed) in enumerate(zip(envs, np.random.SeedSequence(seed).spawn(num_envs))):
+        assert_same_observation(vec_obs, idx, env.reset(seed=env_seed))
+
+    rng = np.random.default_rng(0)
+    num_resets = np.zeros(num_envs, dtype=int)
+    for _ in range(1000):
+        actions = rng.integers(0, 2, (num_envs, vec.get_num_boxes()))
+        vec_obs, vec_rewards, vec_dones, _ = vec.step(actions)
+        for idx, env in enumerate(envs):
+            obs, reward, done, _ = env.step(actions[idx])
+            if done:
+                # the vectorized environment returns the first observation of the next episode
+                obs = env.reset()
+                num_resets[idx] += 1
+            assert (reward, done) == (vec_rewards[idx], vec_dones[idx])
+            assert_same_observation(vec_obs, idx, obs)
+    assert (num_resets >= 3).all()
+
+    # each environment keeps the full patterns of its own generator
+    for env, generator in zip(envs, vec.generators):
+        for pattern_id, pattern in env.env.generator.patterns.items():
+            assert np.array_equal(generator.patterns[pattern_id].full_pattern.events, pattern.full_pattern.events)